@@ -3,27 +3,140 @@
 
 let currentTable = '';
 let currentLimit = 1000;
+let currentColumns = [];
+let currentRows = [];
+let currentFormat = 'rows';
+let nextCursor = null;
+let currentFilters = [];
+let currentOrderColumn = null;
+let tailSource = null;
+
+// 虚拟滚动：只为可见区域（上下各多渲染 VIRTUAL_OVERSCAN 行）创建 <tr>，滚动时复用这些 <tr>
+// 行高固定（单元格不换行），第一次渲染后按实际高度校准
+const VIRTUAL_OVERSCAN = 10;
+const DEFAULT_ROW_HEIGHT = 46;
+const virtualTable = {
+    columns: [],
+    data: [],
+    format: 'rows',
+    rowHeight: DEFAULT_ROW_HEIGHT,
+    measured: false,
+    rows: [],           // 正在复用的 <tr>
+    topSpacer: null,    // 可见区域上方的占位行
+    bottomSpacer: null, // 可见区域下方的占位行
+    frame: 0
+};
+
+// 查询结果的 ETag 缓存：请求参数 -> { etag, result }，服务器返回 304 时直接使用上次的结果
+const ETAG_CACHE_SIZE = 20;
+const etagCache = new Map();
+
+// 查询结果的本地持久缓存（IndexedDB）：表 + 排序字段 + 过滤条件 + 行数 -> 上次的结果
+// 再次打开时先显示缓存，再用 since 参数只查询比缓存最新一行更新的数据
+const RESULT_DB_NAME = 'db-viewer';
+const RESULT_STORE = 'results';
+const RESULT_CACHE_ENTRIES = 20;
+// 增量查询只能发现新插入的行，看不到修改和删除；缓存超过这个时间后仍然先显示，但重新完整查询一次
+const RESULT_CACHE_MAX_AGE = 10 * 60 * 1000;
+const RESULT_CACHE_MAX_ROWS = 10000;
+const LAST_VIEW_KEY = 'db-viewer:last-view';
+let resultDbPromise = null;
 
 // 页面加载完成后初始化
 document.addEventListener('DOMContentLoaded', function() {
     console.log('页面加载完成，开始初始化...');
     
-    // 加载表列表
-    loadTables();
+    // 加载表列表，然后恢复上次查看的表（本地有缓存时立即显示）
+    loadTables().then(restoreLastView);
     
     // 绑定查询按钮事件
     document.getElementById('queryBtn').addEventListener('click', function() {
         queryData();
     });
     
-    // 绑定回车键查询
-    document.getElementById('limitInput').addEventListener('keypress', function(e) {
-        if (e.key === 'Enter') {
-            queryData();
+    // 绑定加载更多按钮事件
+    document.getElementById('loadMoreBtn').addEventListener('click', function() {
+        loadMore();
+    });
+    
+    // 切换表时加载可过滤的字段
+    document.getElementById('tableSelect').addEventListener('change', function(e) {
+        loadFilterColumns(e.target.value);
+    });
+    
+    // 滚动时只重新填充可见的行
+    document.getElementById('tableContainer').addEventListener('scroll', scheduleVirtualRender, { passive: true });
+    window.addEventListener('resize', scheduleVirtualRender);
+    
+    // 实时追踪开关
+    document.getElementById('tailCheckbox').addEventListener('change', function(e) {
+        if (e.target.checked) {
+            startTail();
+        } else {
+            stopTail();
         }
     });
+    
+    // 绑定回车键查询
+    ['limitInput', 'filterValue'].forEach(id => {
+        document.getElementById(id).addEventListener('keypress', function(e) {
+            if (e.key === 'Enter') {
+                queryData();
+            }
+        });
+    });
 });
 
+/**
+ * 加载表的字段列表到过滤字段下拉框
+ */
+async function loadFilterColumns(table) {
+    const select = document.getElementById('filterColumn');
+    select.innerHTML = '<option value="">不过滤</option>';
+    currentOrderColumn = null;
+    
+    if (!table) {
+        return;
+    }
+    
+    try {
+        const response = await fetch(`/api/table-info/${encodeURIComponent(table)}`);
+        const result = await response.json();
+        
+        if (result.success) {
+            currentOrderColumn = result.order_plan ? result.order_plan.column : null;
+            result.columns.forEach(col => {
+                const option = document.createElement('option');
+                option.value = col;
+                option.textContent = col;
+                select.appendChild(option);
+            });
+        }
+    } catch (error) {
+        console.error('加载字段列表失败:', error);
+    }
+}
+
+/**
+ * 根据过滤输入框生成 filters 参数
+ */
+function buildFilters() {
+    const column = document.getElementById('filterColumn').value;
+    const op = document.getElementById('filterOp').value;
+    const value = document.getElementById('filterValue').value.trim();
+    
+    if (!column || value === '') {
+        return [];
+    }
+    
+    if (op === 'in') {
+        const values = value.split(',').map(v => v.trim()).filter(v => v !== '');
+        return [{ column: column, op: op, value: values }];
+    }
+    
+    return [{ column: column, op: op, value: value }];
+}
+
 /**
  * 加载所有表列表
  */
@@ -76,8 +189,11 @@ async function queryData() {
     }
     
     // 保存当前状态
+    stopTail();
     currentTable = table;
     currentLimit = limit;
+    currentFilters = buildFilters();
+    saveLastView(table, limit, currentFilters);
     
     // 显示加载状态
     queryBtn.disabled = true;
@@ -86,31 +202,83 @@ async function queryData() {
     const startTime = Date.now();
     
     try {
-        const response = await fetch('/api/query', {
-            method: 'POST',
-            headers: {
-                'Content-Type': 'application/json'
-            },
-            body: JSON.stringify({
-                table: table,
-                limit: limit
-            })
-        });
+        // 流式加载：边接收边渲染
+        if (document.getElementById('streamCheckbox').checked) {
+            const result = await queryDataStream(table, limit, currentFilters, startTime);
+            const queryTime = Date.now() - startTime;
+            currentColumns = result.columns;
+            currentRows = result.rows;
+            currentFormat = 'rows';
+            if (result.rows.length === 0) {
+                displayData(result.columns, [], 0, queryTime);
+            }
+            updateStats(result.rows.length, result.columns.length, queryTime);
+            updatePagination(result.end);
+            showStatus('success', `查询成功！返回 ${result.rows.length} 行数据，耗时 ${queryTime}ms`);
+            startTail();
+            return;
+        }
         
-        const result = await response.json();
+        // 本地有缓存时先显示缓存，再只查询比缓存更新的行
+        const cacheKey = currentOrderColumn ? resultCacheKey(table, currentOrderColumn, currentFilters, limit) : null;
+        const cached = cacheKey ? await loadCachedResult(cacheKey) : null;
+        if (cached) {
+            showCachedResult(cached, Date.now() - startTime);
+            showStatus('info', '已显示本地缓存，正在获取新数据...');
+            
+            const refreshed = await fetchCachedDelta(cached, table, limit, currentFilters);
+            if (refreshed) {
+                const queryTime = Date.now() - startTime;
+                if (refreshed.added > 0) {
+                    showCachedResult(refreshed, queryTime);
+                } else {
+                    updateStats(countRows(refreshed.data, 'columnar'), refreshed.columns.length, queryTime);
+                }
+                saveCachedResult(refreshed);
+                showStatus('success', `已显示本地缓存，新增 ${refreshed.added} 行数据，耗时 ${queryTime}ms`);
+                startTail();
+                return;
+            }
+        }
+        
+        const result = await postQuery({
+            table: table,
+            limit: limit,
+            filters: currentFilters,
+            format: 'columnar'
+        });
         const queryTime = Date.now() - startTime;
         
         if (result.success) {
-            // 显示数据
-            displayData(result.columns, result.data, result.returned, queryTime);
+            // 显示数据（列式结构）
+            currentColumns = result.columns;
+            currentRows = result.data;
+            currentFormat = result.format || 'rows';
+            displayData(result.columns, result.data, result.returned, queryTime, currentFormat);
+            updatePagination(result);
             showStatus('success', `查询成功！返回 ${result.returned} 行数据，耗时 ${queryTime}ms`);
+            if (cacheKey && result.order_column === currentOrderColumn) {
+                saveCachedResult({
+                    key: cacheKey,
+                    columns: result.columns,
+                    data: result.data,
+                    order_column: result.order_column,
+                    has_more: result.has_more,
+                    next_cursor: result.next_cursor,
+                    fetchedAt: Date.now(),
+                    usedAt: Date.now()
+                });
+            }
+            startTail();
         } else {
+            updatePagination(null);
             showStatus('error', '查询失败: ' + result.error);
             clearTable();
         }
     } catch (error) {
         console.error('查询失败:', error);
         showStatus('error', '查询失败: ' + error.message);
+        updatePagination(null);
         clearTable();
     } finally {
         queryBtn.disabled = false;
@@ -118,10 +286,475 @@ async function queryData() {
     }
 }
 
+/**
+ * 发送 /api/query 请求，带上上次同一请求的 ETag
+ * 表没有变化时服务器返回 304（没有响应体），直接使用缓存的结果
+ */
+async function postQuery(payload) {
+    const key = JSON.stringify(payload);
+    const cached = etagCache.get(key);
+    const headers = {
+        'Content-Type': 'application/json'
+    };
+    if (cached) {
+        headers['If-None-Match'] = cached.etag;
+    }
+    
+    const response = await fetch('/api/query', {
+        method: 'POST',
+        headers: headers,
+        body: key
+    });
+    
+    if (response.status === 304 && cached) {
+        // 移到末尾，按最近使用淘汰
+        etagCache.delete(key);
+        etagCache.set(key, cached);
+        return cached.result;
+    }
+    
+    const result = await response.json();
+    const etag = response.headers.get('ETag');
+    if (result.success && etag) {
+        etagCache.delete(key);
+        etagCache.set(key, { etag: etag, result: result });
+        if (etagCache.size > ETAG_CACHE_SIZE) {
+            etagCache.delete(etagCache.keys().next().value);
+        }
+    }
+    return result;
+}
+
+/**
+ * 本地缓存的键：表 + 排序字段 + 过滤条件 + 行数
+ */
+function resultCacheKey(table, orderColumn, filters, limit) {
+    return JSON.stringify([table, orderColumn, filters, limit]);
+}
+
+/**
+ * 打开本地缓存数据库（只打开一次）
+ */
+function openResultDB() {
+    if (!resultDbPromise) {
+        resultDbPromise = new Promise((resolve, reject) => {
+            if (!window.indexedDB) {
+                reject(new Error('浏览器不支持 IndexedDB'));
+                return;
+            }
+            const request = indexedDB.open(RESULT_DB_NAME, 1);
+            request.onupgradeneeded = function() {
+                const store = request.result.createObjectStore(RESULT_STORE, { keyPath: 'key' });
+                store.createIndex('usedAt', 'usedAt');
+            };
+            request.onsuccess = () => resolve(request.result);
+            request.onerror = () => reject(request.error);
+        });
+    }
+    return resultDbPromise;
+}
+
+/**
+ * 读取本地缓存的查询结果，没有或读取失败时返回 null
+ */
+async function loadCachedResult(key) {
+    try {
+        const db = await openResultDB();
+        return await new Promise((resolve, reject) => {
+            const request = db.transaction(RESULT_STORE, 'readonly').objectStore(RESULT_STORE).get(key);
+            request.onsuccess = () => resolve(request.result || null);
+            request.onerror = () => reject(request.error);
+        });
+    } catch (error) {
+        console.warn('读取本地缓存失败:', error);
+        return null;
+    }
+}
+
+/**
+ * 保存查询结果到本地缓存，超过 RESULT_CACHE_ENTRIES 条时删除最久没用过的
+ * 写入失败（隐私模式、超出配额等）只记录日志，不影响页面
+ */
+async function saveCachedResult(record) {
+    try {
+        const db = await openResultDB();
+        const transaction = db.transaction(RESULT_STORE, 'readwrite');
+        const store = transaction.objectStore(RESULT_STORE);
+        store.put(record);
+        
+        const countRequest = store.count();
+        countRequest.onsuccess = function() {
+            let excess = countRequest.result - RESULT_CACHE_ENTRIES;
+            if (excess <= 0) {
+                return;
+            }
+            store.index('usedAt').openCursor().onsuccess = function(e) {
+                const cursor = e.target.result;
+                if (cursor && excess > 0) {
+                    cursor.delete();
+                    excess--;
+                    cursor.continue();
+                }
+            };
+        };
+        
+        await new Promise((resolve, reject) => {
+            transaction.oncomplete = resolve;
+            transaction.onerror = () => reject(transaction.error);
+            transaction.onabort = () => reject(transaction.error);
+        });
+    } catch (error) {
+        console.warn('保存本地缓存失败:', error);
+    }
+}
+
+/**
+ * 显示本地缓存的结果（列式结构）
+ */
+function showCachedResult(record, queryTime) {
+    currentColumns = record.columns;
+    currentRows = record.data;
+    currentFormat = 'columnar';
+    displayData(record.columns, record.data, countRows(record.data, 'columnar'), queryTime, 'columnar');
+    updatePagination(record);
+}
+
+/**
+ * 只查询比缓存最新一行更新的数据，合并到缓存的结果前面
+ * 缓存太旧、新增行超过一页、表结构变化或请求失败时返回 null，由调用方完整查询
+ */
+async function fetchCachedDelta(cached, table, limit, filters) {
+    if (Date.now() - cached.fetchedAt > RESULT_CACHE_MAX_AGE) {
+        return null;
+    }
+    const index = cached.columns.indexOf(cached.order_column);
+    if (index < 0 || countRows(cached.data, 'columnar') === 0) {
+        return null;
+    }
+    
+    try {
+        const result = await postQuery({
+            table: table,
+            limit: limit,
+            filters: filters,
+            format: 'columnar',
+            since: cached.data[index][0]
+        });
+        if (!result.success || result.has_more
+                || JSON.stringify(result.columns) !== JSON.stringify(cached.columns)) {
+            return null;
+        }
+        
+        // 新行（最新的在前）放在缓存的行前面；原来的下一页游标仍然指向缓存最后一行之后
+        const data = result.returned > 0 ? mergeData(result.data, cached.data, 'columnar') : cached.data;
+        if (countRows(data, 'columnar') > RESULT_CACHE_MAX_ROWS) {
+            return null;
+        }
+        return Object.assign({}, cached, { data: data, usedAt: Date.now(), added: result.returned });
+    } catch (error) {
+        console.warn('增量查询失败:', error);
+        return null;
+    }
+}
+
+/**
+ * 记住最后查看的表、行数和过滤条件
+ */
+function saveLastView(table, limit, filters) {
+    try {
+        localStorage.setItem(LAST_VIEW_KEY, JSON.stringify({ table: table, limit: limit, filters: filters }));
+    } catch (error) {
+        console.warn('保存查看记录失败:', error);
+    }
+}
+
+/**
+ * 恢复上次查看的表；本地有该查询的缓存时自动查询（先显示缓存，再取增量）
+ */
+async function restoreLastView() {
+    let view = null;
+    try {
+        view = JSON.parse(localStorage.getItem(LAST_VIEW_KEY));
+    } catch (error) {
+        return;
+    }
+    
+    const tableSelect = document.getElementById('tableSelect');
+    if (!view || !Array.from(tableSelect.options).some(option => option.value === view.table)) {
+        return;
+    }
+    
+    tableSelect.value = view.table;
+    document.getElementById('limitInput').value = view.limit;
+    await loadFilterColumns(view.table);
+    
+    const filter = view.filters && view.filters[0];
+    if (filter) {
+        document.getElementById('filterColumn').value = filter.column;
+        document.getElementById('filterOp').value = filter.op;
+        document.getElementById('filterValue').value = Array.isArray(filter.value) ? filter.value.join(',') : filter.value;
+    }
+    
+    if (currentOrderColumn && await loadCachedResult(resultCacheKey(view.table, currentOrderColumn, buildFilters(), view.limit))) {
+        queryData();
+    }
+}
+
+/**
+ * 流式查询：读取 NDJSON 响应，每收到一批行就刷新表格（只渲染可见的行）
+ */
+async function queryDataStream(table, limit, filters, startTime) {
+    const response = await fetch('/api/query', {
+        method: 'POST',
+        headers: {
+            'Content-Type': 'application/json'
+        },
+        body: JSON.stringify({
+            table: table,
+            limit: limit,
+            filters: filters,
+            stream: true
+        })
+    });
+    
+    // 参数错误等情况服务器仍返回普通 JSON
+    const contentType = response.headers.get('Content-Type') || '';
+    if (!contentType.includes('application/x-ndjson')) {
+        const result = await response.json();
+        throw new Error(result.error || ('HTTP ' + response.status));
+    }
+    
+    const reader = response.body.getReader();
+    const decoder = new TextDecoder();
+    let buffer = '';
+    let columns = [];
+    let rows = [];
+    let end = null;
+    
+    while (true) {
+        const { done, value } = await reader.read();
+        if (done) {
+            break;
+        }
+        
+        buffer += decoder.decode(value, { stream: true });
+        const lines = buffer.split('\n');
+        buffer = lines.pop();
+        
+        const received = rows.length;
+        for (const line of lines) {
+            if (!line) {
+                continue;
+            }
+            const message = JSON.parse(line);
+            if (message.type === 'meta') {
+                columns = message.columns;
+                displayData(columns, [], 0, Date.now() - startTime);
+            } else if (message.type === 'row') {
+                rows.push(message.data);
+            } else if (message.type === 'end') {
+                end = message;
+            } else if (message.type === 'error') {
+                throw new Error(message.error);
+            }
+        }
+        if (rows.length > received) {
+            setVirtualData(columns, rows, 'rows');
+        }
+        updateStats(rows.length, columns.length, Date.now() - startTime);
+    }
+    
+    if (!end) {
+        throw new Error('数据流意外中断');
+    }
+    
+    return { columns, rows, end };
+}
+
+/**
+ * 开始实时追踪（勾选了“实时追踪”并且已经查询过时）
+ * 服务器每隔几秒查询一次比当前第一行更新的数据，通过 SSE 推送，插入到表格顶部
+ */
+function startTail() {
+    stopTail();
+    if (!document.getElementById('tailCheckbox').checked || !currentTable) {
+        return;
+    }
+    
+    const params = new URLSearchParams({ interval: 2 });
+    if (currentFilters.length > 0) {
+        params.set('filters', JSON.stringify(currentFilters));
+    }
+    // 从当前显示的最新一行之后开始，避免查询和追踪之间插入的数据被漏掉
+    const newest = firstValue(currentOrderColumn);
+    if (newest !== null && newest !== undefined) {
+        params.set('after', newest);
+    }
+    
+    tailSource = new EventSource(`/api/tail/${encodeURIComponent(currentTable)}?${params}`);
+    tailSource.addEventListener('rows', function(e) {
+        prependRows(JSON.parse(e.data).rows);
+    });
+    tailSource.addEventListener('db_error', function(e) {
+        showStatus('error', '实时追踪失败: ' + JSON.parse(e.data).error);
+    });
+    tailSource.onerror = function() {
+        // 连接断开时 EventSource 会带上 Last-Event-ID 自动重连；参数错误等情况不再重试
+        if (tailSource && tailSource.readyState === EventSource.CLOSED) {
+            showStatus('error', '实时追踪已断开');
+            stopTail();
+        }
+    };
+}
+
+/**
+ * 停止实时追踪
+ */
+function stopTail() {
+    if (tailSource) {
+        tailSource.close();
+        tailSource = null;
+    }
+}
+
+/**
+ * 当前数据第一行（最新一行）某一列的值
+ */
+function firstValue(column) {
+    if (!column || countRows(currentRows, currentFormat) === 0) {
+        return null;
+    }
+    if (currentFormat === 'columnar') {
+        const index = currentColumns.indexOf(column);
+        return index >= 0 ? currentRows[index][0] : null;
+    }
+    return currentRows[0][column];
+}
+
+/**
+ * 把实时追踪推送的新行（最新的在前）插入到表格顶部
+ */
+function prependRows(rows) {
+    if (!rows || rows.length === 0) {
+        return;
+    }
+    
+    const hadRows = countRows(currentRows, currentFormat) > 0;
+    if (currentFormat === 'columnar') {
+        const incoming = currentColumns.map(col => rows.map(row => row[col]));
+        currentRows = hadRows ? incoming.map((values, i) => values.concat(currentRows[i])) : incoming;
+    } else {
+        currentRows = rows.concat(currentRows);
+    }
+    
+    const total = countRows(currentRows, currentFormat);
+    if (!hadRows) {
+        // 原来是“表中没有数据”的提示，重新渲染
+        displayData(currentColumns, currentRows, total, 0, currentFormat);
+    } else {
+        // 已经向下滚动时保持当前看到的行不动
+        const container = document.getElementById('tableContainer');
+        const shift = container.scrollTop > 0 ? rows.length * virtualTable.rowHeight : 0;
+        setVirtualData(currentColumns, currentRows, currentFormat);
+        container.scrollTop += shift;
+        document.getElementById('rowCount').textContent = total.toLocaleString();
+    }
+    showStatus('success', `实时追踪：新增 ${rows.length} 行`);
+}
+
+/**
+ * 更新统计信息
+ */
+function updateStats(rowCount, colCount, queryTime) {
+    document.getElementById('statsContainer').classList.remove('hidden');
+    document.getElementById('rowCount').textContent = rowCount.toLocaleString();
+    document.getElementById('colCount').textContent = colCount;
+    document.getElementById('queryTime').textContent = queryTime + 'ms';
+}
+
+/**
+ * 加载下一页数据（游标分页），追加到当前表格
+ */
+async function loadMore() {
+    if (!nextCursor || !currentTable) {
+        return;
+    }
+    
+    const loadMoreBtn = document.getElementById('loadMoreBtn');
+    loadMoreBtn.disabled = true;
+    loadMoreBtn.innerHTML = '<span class="loading"></span> 加载中...';
+    
+    const startTime = Date.now();
+    
+    try {
+        const result = await postQuery({
+            table: currentTable,
+            limit: currentLimit,
+            cursor: nextCursor,
+            filters: currentFilters,
+            format: currentFormat
+        });
+        const queryTime = Date.now() - startTime;
+        
+        if (result.success) {
+            currentRows = mergeData(currentRows, result.data, currentFormat);
+            const total = countRows(currentRows, currentFormat);
+            // 只更新数据，保留滚动位置
+            setVirtualData(currentColumns, currentRows, currentFormat);
+            updateStats(total, currentColumns.length, queryTime);
+            updatePagination(result);
+            showStatus('success', `加载成功！新增 ${result.returned} 行数据，耗时 ${queryTime}ms`);
+        } else {
+            showStatus('error', '加载失败: ' + result.error);
+        }
+    } catch (error) {
+        console.error('加载失败:', error);
+        showStatus('error', '加载失败: ' + error.message);
+    } finally {
+        loadMoreBtn.disabled = false;
+        loadMoreBtn.innerHTML = '⬇️ 加载更多';
+    }
+}
+
+/**
+ * 根据查询结果更新分页状态
+ */
+function updatePagination(result) {
+    const container = document.getElementById('loadMoreContainer');
+    nextCursor = result && result.has_more ? result.next_cursor : null;
+    
+    if (nextCursor) {
+        container.classList.remove('hidden');
+    } else {
+        container.classList.add('hidden');
+    }
+}
+
+/**
+ * 数据行数：rows 格式为数组长度，columnar 格式为任意一列的长度
+ */
+function countRows(data, format) {
+    if (!data || data.length === 0) {
+        return 0;
+    }
+    return format === 'columnar' ? data[0].length : data.length;
+}
+
+/**
+ * 合并两页数据
+ */
+function mergeData(current, next, format) {
+    if (format === 'columnar') {
+        return current.map((values, i) => values.concat(next[i] || []));
+    }
+    return current.concat(next);
+}
+
 /**
  * 显示数据表格
+ * format 为 'columnar' 时 data[列序号][行序号]，否则 data 为行对象数组
  */
-function displayData(columns, data, returned, queryTime) {
+function displayData(columns, data, returned, queryTime, format = 'rows') {
     const headerRow = document.getElementById('headerRow');
     const tableBody = document.getElementById('tableBody');
     const statsContainer = document.getElementById('statsContainer');
@@ -132,13 +765,16 @@ function displayData(columns, data, returned, queryTime) {
     // 清空表格
     headerRow.innerHTML = '';
     tableBody.innerHTML = '';
+    resetVirtualTable();
     
     if (!columns || columns.length === 0) {
         tableBody.innerHTML = '<tr><td class="p-8 text-center text-gray-500">表没有列</td></tr>';
         return;
     }
     
-    if (!data || data.length === 0) {
+    const rowCount = countRows(data, format);
+    
+    if (rowCount === 0) {
         tableBody.innerHTML = '<tr><td class="p-8 text-center text-gray-500">表中没有数据</td></tr>';
         // 显示表头
         columns.forEach(col => {
@@ -162,33 +798,9 @@ function displayData(columns, data, returned, queryTime) {
         headerRow.appendChild(th);
     });
     
-    // 创建数据行
-    data.forEach((row, rowIndex) => {
-        const tr = document.createElement('tr');
-        tr.className = 'table-row';
-        
-        columns.forEach(col => {
-            const td = document.createElement('td');
-            let value = row[col];
-            
-            // 处理不同类型的值
-            if (value === null || value === undefined) {
-                td.textContent = '';
-                td.style.color = '#999';
-            } else if (typeof value === 'object') {
-                td.textContent = JSON.stringify(value);
-            } else {
-                td.textContent = String(value);
-            }
-            
-            // 添加标题（鼠标悬停显示完整内容）
-            td.title = td.textContent;
-            
-            tr.appendChild(td);
-        });
-        
-        tableBody.appendChild(tr);
-    });
+    // 只创建可见区域的数据行
+    document.getElementById('tableContainer').scrollTop = 0;
+    setVirtualData(columns, data, format);
     
     // 显示统计信息
     statsContainer.classList.remove('hidden');
@@ -199,6 +811,170 @@ function displayData(columns, data, returned, queryTime) {
     console.log(`✓ 显示数据: ${returned} 行, ${columns.length} 列, 耗时 ${queryTime}ms`);
 }
 
+/**
+ * 清空虚拟滚动状态（表格内容已被清空时调用）
+ */
+function resetVirtualTable() {
+    if (virtualTable.frame) {
+        cancelAnimationFrame(virtualTable.frame);
+    }
+    virtualTable.columns = [];
+    virtualTable.data = [];
+    virtualTable.rows = [];
+    virtualTable.topSpacer = null;
+    virtualTable.bottomSpacer = null;
+    virtualTable.measured = false;
+    virtualTable.frame = 0;
+    document.querySelector('#tableContainer table').style.tableLayout = '';
+}
+
+/**
+ * 设置要显示的数据并渲染可见区域；data 与 displayData 的格式相同
+ */
+function setVirtualData(columns, data, format) {
+    virtualTable.columns = columns;
+    virtualTable.data = data;
+    virtualTable.format = format;
+    
+    if (!virtualTable.topSpacer) {
+        const tableBody = document.getElementById('tableBody');
+        tableBody.innerHTML = '';
+        virtualTable.topSpacer = createSpacerRow(columns.length);
+        virtualTable.bottomSpacer = createSpacerRow(columns.length);
+        tableBody.appendChild(virtualTable.topSpacer);
+        tableBody.appendChild(virtualTable.bottomSpacer);
+    }
+    renderVirtualTable();
+}
+
+/**
+ * 滚动事件合并到下一帧处理
+ */
+function scheduleVirtualRender() {
+    if (virtualTable.topSpacer && !virtualTable.frame) {
+        virtualTable.frame = requestAnimationFrame(renderVirtualTable);
+    }
+}
+
+/**
+ * 根据滚动位置计算可见的行，复用已有的 <tr> 填充新的值，上下用占位行撑开滚动高度
+ */
+function renderVirtualTable() {
+    virtualTable.frame = 0;
+    if (!virtualTable.topSpacer) {
+        return;
+    }
+    
+    const container = document.getElementById('tableContainer');
+    const { columns, data, format, rows } = virtualTable;
+    const rowHeight = virtualTable.rowHeight;
+    const total = countRows(data, format);
+    const windowSize = Math.ceil(container.clientHeight / rowHeight) + VIRTUAL_OVERSCAN * 2;
+    const first = Math.floor(container.scrollTop / rowHeight) - VIRTUAL_OVERSCAN;
+    const start = Math.max(0, Math.min(first, total - windowSize));
+    const end = Math.min(total, start + windowSize);
+    
+    // 行数不够时补充，多余的移除；其余的 <tr> 直接复用
+    while (rows.length < end - start) {
+        const tr = createRowElement(new Array(columns.length).fill(null));
+        virtualTable.bottomSpacer.before(tr);
+        rows.push(tr);
+    }
+    while (rows.length > end - start) {
+        rows.pop().remove();
+    }
+    
+    for (let i = start; i < end; i++) {
+        fillRowElement(rows[i - start], getRowValues(i));
+    }
+    virtualTable.topSpacer.firstChild.style.height = (start * rowHeight) + 'px';
+    virtualTable.bottomSpacer.firstChild.style.height = ((total - end) * rowHeight) + 'px';
+    
+    // 第一次渲染后按实际行高校准，并固定列宽（避免滚动时列宽随内容跳动）
+    if (!virtualTable.measured && rows.length > 0) {
+        virtualTable.measured = true;
+        freezeColumnWidths();
+        const measured = rows[0].getBoundingClientRect().height;
+        if (measured > 0 && Math.abs(measured - rowHeight) > 0.5) {
+            virtualTable.rowHeight = measured;
+            renderVirtualTable();
+        }
+    }
+}
+
+/**
+ * 按当前表头宽度固定列宽
+ */
+function freezeColumnWidths() {
+    const headers = document.querySelectorAll('#headerRow th');
+    const widths = Array.from(headers, th => th.getBoundingClientRect().width);
+    headers.forEach((th, i) => {
+        th.style.width = widths[i] + 'px';
+    });
+    document.querySelector('#tableContainer table').style.tableLayout = 'fixed';
+}
+
+/**
+ * 第 index 行按列顺序排列的值
+ */
+function getRowValues(index) {
+    const { columns, data, format } = virtualTable;
+    if (format === 'columnar') {
+        return data.map(values => values[index]);
+    }
+    const row = data[index];
+    return columns.map(col => row[col]);
+}
+
+/**
+ * 占位行：只用来撑开高度
+ */
+function createSpacerRow(colCount) {
+    const tr = document.createElement('tr');
+    tr.className = 'virtual-spacer';
+    const td = document.createElement('td');
+    td.colSpan = colCount;
+    tr.appendChild(td);
+    return tr;
+}
+
+/**
+ * 根据按列顺序排列的值创建 <tr>
+ */
+function createRowElement(values) {
+    const tr = document.createElement('tr');
+    tr.className = 'table-row';
+    
+    values.forEach(() => {
+        tr.appendChild(document.createElement('td'));
+    });
+    fillRowElement(tr, values);
+    
+    return tr;
+}
+
+/**
+ * 把一行的值填入已有的 <tr>（滚动时复用）
+ */
+function fillRowElement(tr, values) {
+    const cells = tr.children;
+    values.forEach((value, i) => {
+        const td = cells[i];
+        
+        // 处理不同类型的值
+        if (value === null || value === undefined) {
+            td.textContent = '';
+            td.style.color = '#999';
+        } else {
+            td.textContent = typeof value === 'object' ? JSON.stringify(value) : String(value);
+            td.style.color = '';
+        }
+        
+        // 添加标题（鼠标悬停显示完整内容）
+        td.title = td.textContent;
+    });
+}
+
 /**
  * 清空表格
  */
@@ -208,6 +984,7 @@ function clearTable() {
     const statsContainer = document.getElementById('statsContainer');
     
     headerRow.innerHTML = '<th>加载中...</th>';
+    resetVirtualTable();
     tableBody.innerHTML = '<tr><td class="p-8 text-center text-gray-500">查询失败</td></tr>';
     statsContainer.classList.add('hidden');
 }
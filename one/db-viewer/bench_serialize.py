@@ -0,0 +1,150 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+"""
+行数据序列化微基准
+对比旧版逐单元格 isinstance 转换与按列预编译转换表（build_converters），两者使用相同的 JSON 编码器，
+编码器（标准库 json / orjson）的影响单独比较，两项提速不混在一起
+不需要连接数据库，使用随机生成的行数据
+
+用法: python bench_serialize.py [行数] [重复次数]
+"""
+
+import sys
+import json
+import time
+import random
+from datetime import datetime, timedelta
+from decimal import Decimal
+
+from pymysql.constants import FIELD_TYPE
+
+import db_server_fixed as server
+
+
+class FakeCursor:
+    """只提供 description 的游标，模拟 DictCursor 执行后的状态"""
+
+    def __init__(self, description):
+        self.description = description
+
+
+# 模拟一张视频表：整数、字符串、时间、DECIMAL、二进制混合
+DESCRIPTION = [
+    ('id', FIELD_TYPE.LONGLONG),
+    ('device_id', FIELD_TYPE.VAR_STRING),
+    ('title', FIELD_TYPE.VAR_STRING),
+    ('url', FIELD_TYPE.VAR_STRING),
+    ('duration', FIELD_TYPE.LONG),
+    ('size', FIELD_TYPE.LONGLONG),
+    ('price', FIELD_TYPE.NEWDECIMAL),
+    ('status', FIELD_TYPE.TINY),
+    ('md5', FIELD_TYPE.STRING),
+    ('create_at', FIELD_TYPE.DATETIME),
+    ('update_at', FIELD_TYPE.DATETIME)
+]
+
+
+def make_rows(count):
+    """生成 count 行随机数据"""
+    base = datetime(2024, 1, 1)
+    rows = []
+    for i in range(count):
+        rows.append({
+            'id': i,
+            'device_id': f"device_{random.randint(1, 500)}",
+            'title': f"video title {i}",
+            'url': f"https://example.com/video/{i}.mp4",
+            'duration': random.randint(1, 3600),
+            'size': random.randint(1, 1 << 32),
+            'price': Decimal(random.randint(0, 99999)) / 100,
+            'status': random.randint(0, 3),
+            'md5': bytes(random.getrandbits(8) for _ in range(16)),
+            'create_at': base + timedelta(seconds=i),
+            'update_at': base + timedelta(seconds=i * 2)
+        })
+    return rows
+
+
+def encode_stdlib(obj):
+    """标准库 json（旧版使用的编码器）"""
+    return json.dumps(obj, default=str).encode('utf-8')
+
+
+def legacy_convert(rows):
+    """旧版实现：每个单元格都做 isinstance 检查"""
+    data_list = []
+    for row in rows:
+        row_dict = {}
+        for key, value in row.items():
+            if isinstance(value, datetime):
+                row_dict[key] = value.isoformat()
+            elif isinstance(value, (bytes, bytearray)):
+                row_dict[key] = value.hex() if value else None
+            else:
+                row_dict[key] = value
+        data_list.append(row_dict)
+    return data_list
+
+
+def compiled_convert(rows, columns, data_format):
+    """新版实现：每次查询生成一次转换表，只转换需要转换的列"""
+    converters = server.build_converters(FakeCursor(DESCRIPTION))
+    if data_format == 'columnar':
+        return server.convert_columnar(rows, columns, converters)
+    return server.convert_rows(rows, columns, converters)
+
+
+def bench(name, func, count, repeat):
+    """运行 repeat 次，返回最好的一次耗时（毫秒）和输出大小"""
+    best = None
+    size = 0
+    for _ in range(repeat):
+        rows = make_rows(count)  # convert_rows 会原地修改，每次使用新数据
+        start = time.perf_counter()
+        body = func(rows)
+        elapsed = (time.perf_counter() - start) * 1000
+        size = len(body)
+        best = elapsed if best is None else min(best, elapsed)
+    print(f"  {name:<28} {best:8.1f} ms   {size / 1024:8.1f} KB")
+    return best
+
+
+def main():
+    count = int(sys.argv[1]) if len(sys.argv) > 1 else 10000
+    repeat = int(sys.argv[2]) if len(sys.argv) > 2 else 5
+    columns = [field[0] for field in DESCRIPTION]
+
+    print(f"\n序列化 {count} 行 x {len(columns)} 列，取 {repeat} 次中最快的一次\n")
+
+    encoders = [('json', encode_stdlib)]
+    if server.orjson is not None:
+        encoders.append(('orjson', server.dumps_json))
+
+    results = {}
+    for encoder_name, encode in encoders:
+        results[encoder_name] = (
+            bench(f'旧版 isinstance + {encoder_name}', lambda r: encode({'data': legacy_convert(r)}), count, repeat),
+            bench(f'转换表 rows + {encoder_name}',
+                  lambda r: encode({'data': compiled_convert(r, columns, 'rows')}), count, repeat),
+            bench(f'转换表 columnar + {encoder_name}',
+                  lambda r: encode({'data': compiled_convert(r, columns, 'columnar')}), count, repeat)
+        )
+
+    print()
+    # 转换表的提速：同一个编码器下比较
+    for encoder_name, (legacy, rows, columnar) in results.items():
+        print(f"  转换表（{encoder_name}）: rows 提速 {legacy / rows:.1f}x，columnar 提速 {legacy / columnar:.1f}x")
+    # 编码器的提速：同一种转换方式下比较
+    if 'orjson' in results:
+        labels = ('旧版', 'rows', 'columnar')
+        speedups = '，'.join(f"{label} {stdlib / fast:.1f}x"
+                            for label, stdlib, fast in zip(labels, results['json'], results['orjson']))
+        print(f"  orjson 替换 json: {speedups}")
+    else:
+        print("  未安装 orjson，不比较编码器")
+    print()
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,397 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+"""
+数据库后端
+db_server_fixed.py 中与具体数据库有关的操作都通过后端对象完成：
+    connect(autocommit=True)                  新建连接（字典行的 DB-API 连接，错误类型为 pymysql.Error）
+    list_tables(cursor)                       表名列表
+    schema_rows(cursor, table_names)          列和索引信息（字段与 information_schema 查询结果相同）
+    select_sql(...)                           带排序和 LIMIT 的查询语句
+    count_rows(cursor, table)                 精确行数
+    estimated_row_count(cursor, table)        估算行数（不扫描表）
+    fingerprint(cursor, table, order_column)  变更探测，返回 {'max_value', 'update_time'}
+    kill_query(thread_id)                     终止另一个连接上正在执行的查询
+    typed_values                              返回的值是否与声明的 MySQL 类型一致
+                                              （SQLite 按类型亲和性存储，DECIMAL 读出来是 REAL、DATETIME 是 TEXT）
+MySQLBackend 为默认实现；SQLiteBackend 用于离线压测和回归测试（数据由 gen_sqlite_data.py 生成）
+"""
+
+import os
+import sqlite3
+import threading
+import itertools
+import weakref
+
+import pymysql
+
+# 表结构查询（information_schema，与表的数量无关），参数为 (数据库名,)
+SCHEMA_COLUMNS_SQL = (
+    "SELECT TABLE_NAME AS table_name, COLUMN_NAME AS column_name, DATA_TYPE AS data_type "
+    "FROM information_schema.COLUMNS WHERE TABLE_SCHEMA = %s "
+    "ORDER BY TABLE_NAME, ORDINAL_POSITION"
+)
+SCHEMA_INDEXES_SQL = (
+    "SELECT TABLE_NAME AS table_name, INDEX_NAME AS index_name, NON_UNIQUE AS non_unique, "
+    "COLUMN_NAME AS column_name "
+    "FROM information_schema.STATISTICS WHERE TABLE_SCHEMA = %s "
+    "ORDER BY TABLE_NAME, INDEX_NAME, SEQ_IN_INDEX"
+)
+
+# 估算行数，参数为 (数据库名, 表名)
+ESTIMATED_ROWS_SQL = (
+    "SELECT TABLE_ROWS AS table_rows FROM information_schema.TABLES "
+    "WHERE TABLE_SCHEMA = %s AND TABLE_NAME = %s"
+)
+
+
+# MySQL 8 默认缓存 information_schema.TABLES 的统计信息（information_schema_stats_expiry，默认 86400 秒），
+# UPDATE_TIME 在缓存期间不变，修改/删除非最大值的行探测不到；变更探测的连接关闭这个缓存
+# MySQL 5.7 没有这个变量（错误 1193），UPDATE_TIME 本来就是实时的
+STATS_EXPIRY_SQL = "SET SESSION information_schema_stats_expiry = 0"
+UNKNOWN_VARIABLE_ERROR = 1193
+
+
+def build_fingerprint_sql(table, order_column):
+    """MySQL 变更探测 SQL，参数为 (数据库名, 表名)"""
+    max_expr = f"(SELECT MAX(`{order_column}`) FROM `{table}`)" if order_column else "NULL"
+    return (f"SELECT {max_expr} AS max_value, "
+            "(SELECT UPDATE_TIME FROM information_schema.TABLES "
+            "WHERE TABLE_SCHEMA = %s AND TABLE_NAME = %s) AS update_time")
+
+
+def build_select_sql(table, select_columns, clauses, order_by, limit, hint=""):
+    """拼接 SELECT 语句（列名和表名都已校验，值通过参数绑定）"""
+    sql = f"SELECT {hint}{', '.join(f'`{col}`' for col in select_columns)} FROM `{table}`"
+    if clauses:
+        sql += " WHERE " + " AND ".join(clauses)
+    if order_by:
+        sql += f" ORDER BY {order_by}"
+    return sql + f" LIMIT {limit}"
+
+
+# ==================== MySQL ====================
+
+class MySQLBackend:
+    """MySQL（pymysql）"""
+
+    name = 'mysql'
+    supports_explain = True
+    typed_values = True
+
+    def __init__(self, config):
+        self.config = config
+        self.stats_expiry_supported = True          # 服务器是否有 information_schema_stats_expiry（5.7 没有）
+        self.fresh_stats_connections = weakref.WeakSet()  # 已关闭统计信息缓存的连接
+
+    def describe(self):
+        """启动日志中显示的连接信息"""
+        return [
+            f"服务器: {self.config['host']}:{self.config['port']}",
+            f"用户: {self.config['user']}",
+            f"数据库: {self.config['database']}"
+        ]
+
+    def connect(self, autocommit=True):
+        # 连接池中的连接使用 autocommit，避免复用连接时读到旧的事务快照
+        return pymysql.connect(**dict(self.config, autocommit=autocommit))
+
+    def list_tables(self, cursor):
+        cursor.execute("SHOW TABLES")
+        tables = cursor.fetchall()
+        if tables and isinstance(tables[0], dict):
+            return [list(table.values())[0] for table in tables]
+        return [table[0] for table in tables]
+
+    def schema_rows(self, cursor, table_names):
+        """只查询 information_schema.COLUMNS 和 STATISTICS 两次，与表的数量无关"""
+        cursor.execute(SCHEMA_COLUMNS_SQL, (self.config['database'],))
+        column_rows = cursor.fetchall()
+        cursor.execute(SCHEMA_INDEXES_SQL, (self.config['database'],))
+        index_rows = cursor.fetchall()
+        return column_rows, index_rows
+
+    def select_sql(self, table, select_columns, clauses, order_by, limit, max_execution_ms=None):
+        """max_execution_ms: 加上 MAX_EXECUTION_TIME 提示（MySQL 5.7.8+），超时由服务端终止"""
+        hint = f"/*+ MAX_EXECUTION_TIME({int(max_execution_ms)}) */ " if max_execution_ms else ""
+        return build_select_sql(table, select_columns, clauses, order_by, limit, hint)
+
+    def count_rows(self, cursor, table):
+        cursor.execute(f"SELECT COUNT(*) AS count FROM `{table}`")
+        return cursor.fetchone()['count']
+
+    def estimated_row_count(self, cursor, table):
+        """information_schema.TABLES 中的估算值（InnoDB 统计信息，不扫描表）"""
+        cursor.execute(ESTIMATED_ROWS_SQL, (self.config['database'], table))
+        result = cursor.fetchone()
+        return int(result['table_rows'] or 0) if result else 0
+
+    def fingerprint(self, cursor, table, order_column):
+        """
+        MAX(排序字段) + information_schema.TABLES.UPDATE_TIME，一次往返完成
+        每个连接第一次探测前先关闭统计信息缓存（多一次往返），否则 UPDATE_TIME 最长一天不变
+        """
+        if self.needs_fresh_stats(cursor.connection):
+            try:
+                cursor.execute(STATS_EXPIRY_SQL)
+                self.fresh_stats_connections.add(cursor.connection)
+            except pymysql.err.Error as e:
+                self.stats_expiry_failed(e)
+        cursor.execute(build_fingerprint_sql(table, order_column), (self.config['database'], table))
+        return cursor.fetchone()
+
+    def needs_fresh_stats(self, connection):
+        """连接还没有关闭统计信息缓存（异步版本的连接也使用这里的记录）"""
+        return self.stats_expiry_supported and connection not in self.fresh_stats_connections
+
+    def stats_expiry_failed(self, error):
+        """服务器没有这个变量（MySQL 5.7）时不再设置，其他错误照常抛出"""
+        if error.args and error.args[0] == UNKNOWN_VARIABLE_ERROR:
+            self.stats_expiry_supported = False
+            return
+        raise error
+
+    def kill_query(self, thread_id):
+        """用一条独立的连接执行 KILL QUERY（连接池满时也能执行）"""
+        connection = pymysql.connect(**self.config)
+        try:
+            with connection.cursor() as cursor:
+                cursor.execute("KILL QUERY %s", (thread_id,))
+        finally:
+            connection.close()
+
+
+# ==================== SQLite ====================
+
+def translate_sqlite_error(error):
+    """sqlite3 异常 -> pymysql 异常，调用方只需要处理 pymysql.Error；被中断的查询使用 MySQL 的错误码 1317"""
+    message = str(error)
+    if isinstance(error, sqlite3.OperationalError):
+        if 'interrupted' in message:
+            return pymysql.err.OperationalError(1317, 'Query execution was interrupted')
+        if 'locked' in message or 'busy' in message:
+            return pymysql.err.OperationalError(1205, message)
+        return pymysql.err.ProgrammingError(1064, message)
+    if isinstance(error, sqlite3.IntegrityError):
+        return pymysql.err.IntegrityError(1062, message)
+    return pymysql.err.DatabaseError(1105, message)
+
+
+def sqlite_affinity(declared_type):
+    """按 SQLite 的规则由声明的类型得到类型亲和性：integer / text / blob / real / numeric"""
+    declared = (declared_type or '').upper()
+    if 'INT' in declared:
+        return 'integer'
+    if any(name in declared for name in ('CHAR', 'CLOB', 'TEXT')):
+        return 'text'
+    if 'BLOB' in declared or not declared:
+        return 'blob'
+    if any(name in declared for name in ('REAL', 'FLOA', 'DOUB')):
+        return 'real'
+    return 'numeric'
+
+
+class SQLiteCursor:
+    """返回字典行的游标，接口与 pymysql 的 DictCursor 一致（%s 占位符）"""
+
+    def __init__(self, connection):
+        self._cursor = connection.cursor()
+        self.description = None
+        self.rowcount = -1
+
+    def execute(self, sql, params=None):
+        try:
+            self._cursor.execute(sql.replace('%s', '?'), tuple(params) if params else ())
+        except sqlite3.Error as e:
+            raise translate_sqlite_error(e) from e
+        self.description = self._cursor.description
+        self.rowcount = self._cursor.rowcount
+        return self.rowcount
+
+    def _to_dicts(self, rows):
+        names = [column[0] for column in self.description or ()]
+        return [dict(zip(names, row)) for row in rows]
+
+    def fetchone(self):
+        try:
+            row = self._cursor.fetchone()
+        except sqlite3.Error as e:
+            raise translate_sqlite_error(e) from e
+        return self._to_dicts([row])[0] if row is not None else None
+
+    def fetchmany(self, size=None):
+        try:
+            rows = self._cursor.fetchmany(size or self._cursor.arraysize)
+        except sqlite3.Error as e:
+            raise translate_sqlite_error(e) from e
+        return self._to_dicts(rows)
+
+    def fetchall(self):
+        try:
+            rows = self._cursor.fetchall()
+        except sqlite3.Error as e:
+            raise translate_sqlite_error(e) from e
+        return self._to_dicts(rows)
+
+    def __iter__(self):
+        while True:
+            rows = self.fetchmany(1000)
+            if not rows:
+                return
+            yield from rows
+
+    def close(self):
+        self._cursor.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+
+class SQLiteConnection:
+    """sqlite3 连接的包装，提供连接池和看门狗用到的 pymysql 连接接口"""
+
+    def __init__(self, connection, connection_id):
+        self._connection = connection
+        self._id = connection_id
+        self.open = True
+
+    def cursor(self, cursor_class=None):
+        # SQLite 的游标本身就是逐行读取的，不区分普通游标和服务端游标
+        return SQLiteCursor(self._connection)
+
+    def thread_id(self):
+        return self._id
+
+    def ping(self, reconnect=False):
+        pass
+
+    def interrupt(self):
+        self._connection.interrupt()
+
+    def commit(self):
+        self._connection.commit()
+
+    def rollback(self):
+        self._connection.rollback()
+
+    def close(self):
+        if self.open:
+            self.open = False
+            self._connection.close()
+
+
+class SQLiteBackend:
+    """SQLite（标准库 sqlite3），离线压测用"""
+
+    name = 'sqlite'
+    supports_explain = False
+    typed_values = False
+
+    def __init__(self, path):
+        self.path = path
+        self._ids = itertools.count(1)
+        self._connections = weakref.WeakValueDictionary()  # thread_id -> 连接，用于终止查询
+        self._lock = threading.Lock()
+
+    def describe(self):
+        return [f"SQLite 数据库: {self.path}"]
+
+    def connect(self, autocommit=True):
+        """autocommit=False 时开启读事务，之后的查询读到同一个快照（导出时使用）"""
+        if not os.path.exists(self.path):
+            raise pymysql.err.OperationalError(2003, f"SQLite 数据库文件不存在: {self.path}（先运行 gen_sqlite_data.py）")
+        try:
+            connection = sqlite3.connect(self.path, check_same_thread=False, isolation_level=None)
+            if not autocommit:
+                connection.execute('BEGIN')
+        except sqlite3.Error as e:
+            raise translate_sqlite_error(e) from e
+
+        with self._lock:
+            wrapped = SQLiteConnection(connection, next(self._ids))
+            self._connections[wrapped.thread_id()] = wrapped
+        return wrapped
+
+    def list_tables(self, cursor):
+        cursor.execute("SELECT name FROM sqlite_master WHERE type = 'table' AND name NOT LIKE 'sqlite_%' "
+                       "ORDER BY name")
+        return [row['name'] for row in cursor.fetchall()]
+
+    def schema_rows(self, cursor, table_names):
+        """用 PRAGMA 读取列、主键和索引，整理成与 information_schema 查询相同的行"""
+        column_rows, index_rows = [], []
+        for table in table_names:
+            cursor.execute(f"PRAGMA table_info(`{table}`)")
+            primary_key = []
+            for column in cursor.fetchall():
+                # 声明类型如 VARCHAR(64)，只保留类型名
+                data_type = (column['type'] or 'text').split('(')[0].strip().lower() or 'text'
+                column_rows.append({'table_name': table, 'column_name': column['name'], 'data_type': data_type})
+                if column['pk']:
+                    primary_key.append((column['pk'], column['name']))
+            for _, name in sorted(primary_key):
+                index_rows.append({'table_name': table, 'index_name': 'PRIMARY', 'non_unique': 0, 'column_name': name})
+
+            cursor.execute(f"PRAGMA index_list(`{table}`)")
+            for index in cursor.fetchall():
+                if index['origin'] == 'pk':
+                    continue
+                cursor.execute(f"PRAGMA index_info(`{index['name']}`)")
+                for column in sorted(cursor.fetchall(), key=lambda row: row['seqno']):
+                    index_rows.append({
+                        'table_name': table,
+                        'index_name': index['name'],
+                        'non_unique': 0 if index['unique'] else 1,
+                        'column_name': column['name']
+                    })
+        return column_rows, index_rows
+
+    def select_sql(self, table, select_columns, clauses, order_by, limit, max_execution_ms=None):
+        """SQLite 没有执行时间提示，超时由看门狗调用 interrupt() 终止"""
+        return build_select_sql(table, select_columns, clauses, order_by, limit)
+
+    def count_rows(self, cursor, table):
+        cursor.execute(f"SELECT COUNT(*) AS count FROM `{table}`")
+        return cursor.fetchone()['count']
+
+    def estimated_row_count(self, cursor, table):
+        """MAX(rowid) 只读 B 树的一端，只追加的表上与实际行数一致；WITHOUT ROWID 表返回 0"""
+        try:
+            cursor.execute(f"SELECT MAX(rowid) AS table_rows FROM `{table}`")
+        except pymysql.err.ProgrammingError:
+            return 0
+        result = cursor.fetchone()
+        return int(result['table_rows'] or 0) if result else 0
+
+    def fingerprint(self, cursor, table, order_column):
+        """MAX(排序字段) + 数据库文件（含 WAL 文件）的修改时间"""
+        max_value = None
+        if order_column:
+            cursor.execute(f"SELECT MAX(`{order_column}`) AS max_value FROM `{table}`")
+            max_value = cursor.fetchone()['max_value']
+
+        update_time = 0
+        for path in (self.path, self.path + '-wal'):
+            try:
+                update_time = max(update_time, os.stat(path).st_mtime_ns)
+            except OSError:
+                pass
+        return {'max_value': max_value, 'update_time': update_time}
+
+    def kill_query(self, thread_id):
+        """sqlite3 的 interrupt() 可以在其他线程调用，正在执行的语句抛出 interrupted"""
+        connection = self._connections.get(thread_id)
+        if connection is not None and connection.open:
+            connection.interrupt()
+
+
+def create_backend(name, mysql_config, sqlite_path):
+    """按名称创建后端：mysql / sqlite"""
+    if name == 'mysql':
+        return MySQLBackend(mysql_config)
+    if name == 'sqlite':
+        return SQLiteBackend(sqlite_path)
+    raise ValueError(f"不支持的数据库后端: {name}（可选 mysql / sqlite）")
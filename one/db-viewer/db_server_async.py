@@ -0,0 +1,767 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+"""
+数据库查看工具 - 异步版本（ASGI）
+与 db_server_fixed.py 提供相同的接口（/api/export 除外）：
+    /api/tables、/api/query、/api/table-info/<table>、/api/tail/<table>、
+    /api/profile/<table>、/api/slow-queries、/api/health、/metrics
+数据库访问使用 aiomysql 连接池，等待 MySQL 时不占用线程，单进程可以同时挂起数百个慢查询
+只支持 MySQL（DB_BACKEND=sqlite 只用于同步版本）
+多进程运行（uvicorn --workers N）时可以开启 REDIS_CACHE=redis，worker 之间共享表结构和查询结果
+参数校验、SQL 生成、分页游标、数据转换和结果缓存直接复用 db_server_fixed 中的实现
+
+依赖: pip install starlette uvicorn aiomysql
+启动: python db_server_async.py
+ 或: uvicorn db_server_async:app --host localhost --port 8889
+"""
+
+import asyncio
+import json
+import time
+from contextlib import asynccontextmanager
+
+import aiomysql
+from pymysql import Error
+from starlette.applications import Starlette
+from starlette.middleware import Middleware
+from starlette.middleware.cors import CORSMiddleware
+from starlette.requests import Request
+from starlette.responses import FileResponse, JSONResponse, PlainTextResponse, Response, StreamingResponse
+from starlette.routing import Route
+
+import db_server_fixed as base
+from db_server_fixed import cache, log_info, log_success, log_error, log_warning
+from db_backends import (
+    build_fingerprint_sql, ESTIMATED_ROWS_SQL, SCHEMA_COLUMNS_SQL, SCHEMA_INDEXES_SQL, STATS_EXPIRY_SQL
+)
+
+# ==================== 异步连接池配置 ====================
+ASYNC_POOL_CONFIG = {
+    'minsize': 1,       # 启动时建立的连接数
+    'maxsize': 50,      # 最大连接数（同时执行的查询数上限）
+    'pool_recycle': 300  # 连接使用超过该秒数后重建
+}
+
+SERVER_PORT = 8889
+
+pool = None
+
+
+def aiomysql_config():
+    """把 DB_CONFIG 转换为 aiomysql 的参数"""
+    config = dict(base.DB_CONFIG)
+    config.pop('cursorclass', None)
+    config['db'] = config.pop('database')
+    config['cursorclass'] = aiomysql.DictCursor
+    config['autocommit'] = True
+    return config
+
+
+def error_response(message, status, **extra):
+    """错误响应，格式与 Flask 版本一致"""
+    return JSONResponse(dict({'success': False, 'error': message}, **extra), status_code=status)
+
+
+# ==================== 数据库初始化 ====================
+
+async def init_database():
+    """创建连接池并一次性加载所有表结构"""
+    global pool
+    try:
+        if base.db_backend.name != 'mysql':
+            raise RuntimeError(f"异步版本只支持 MySQL 后端（当前 DB_BACKEND={base.db_backend.name}）")
+        log_info("正在连接数据库...")
+        log_info(f"服务器: {base.DB_CONFIG['host']}:{base.DB_CONFIG['port']}")
+        log_info(f"数据库: {base.DB_CONFIG['database']}")
+
+        pool = await aiomysql.create_pool(**aiomysql_config(), **ASYNC_POOL_CONFIG)
+        log_success("数据库连接成功！")
+
+        # 其他 worker 进程已加载过的表结构直接从共享缓存读取
+        start_time = time.time()
+        shared_schema = await shared_cache_call('get_schema')
+        if shared_schema is not None:
+            table_names, schema = shared_schema
+            log_success("表结构来自共享缓存")
+        else:
+            async with pool.acquire() as connection:
+                async with connection.cursor() as cursor:
+                    await cursor.execute("SHOW TABLES")
+                    table_names = [list(row.values())[0] for row in await cursor.fetchall()]
+
+                    await cursor.execute(SCHEMA_COLUMNS_SQL, (base.DB_CONFIG['database'],))
+                    column_rows = await cursor.fetchall()
+                    await cursor.execute(SCHEMA_INDEXES_SQL, (base.DB_CONFIG['database'],))
+                    index_rows = await cursor.fetchall()
+            schema = base.build_schema(table_names, column_rows, index_rows)
+            await shared_cache_call('put_schema', table_names, schema)
+
+        cache['tables'] = table_names
+        base.register_schema(schema)
+        log_success(f"{len(cache['table_columns'])} 个表的列信息已加载，"
+                    f"耗时 {int((time.time() - start_time) * 1000)}ms")
+
+        cache['connected'] = True
+        log_success("数据库初始化完成")
+
+    except Exception as e:
+        log_error(f"数据库连接失败: {e}")
+        cache['connected'] = False
+        cache['error_message'] = str(e)
+
+
+async def shared_cache_call(method, *args):
+    """调用共享缓存（redis 客户端是阻塞的，放到线程中执行）；没有开启时返回 None"""
+    if base.shared_cache is None:
+        return None
+    return await asyncio.to_thread(getattr(base.shared_cache, method), *args)
+
+
+async def close_database():
+    """关闭连接池"""
+    if pool is not None:
+        pool.close()
+        await pool.wait_closed()
+
+
+@asynccontextmanager
+async def lifespan(app):
+    await init_database()
+    yield
+    await close_database()
+
+
+async def fetch_one(sql, params=None):
+    """执行查询并返回第一行"""
+    async with pool.acquire() as connection:
+        async with connection.cursor() as cursor:
+            await cursor.execute(sql, params)
+            return await cursor.fetchone()
+
+
+async def probe_table_fingerprint(table, order_column):
+    """执行变更探测；与 MySQLBackend.fingerprint 相同，连接第一次探测前关闭统计信息缓存"""
+    backend = base.db_backend
+    async with pool.acquire() as connection:
+        async with connection.cursor() as cursor:
+            if backend.needs_fresh_stats(connection):
+                try:
+                    await cursor.execute(STATS_EXPIRY_SQL)
+                    backend.fresh_stats_connections.add(connection)
+                except Error as e:
+                    backend.stats_expiry_failed(e)
+            await cursor.execute(build_fingerprint_sql(table, order_column), (base.DB_CONFIG['database'], table))
+            return await cursor.fetchone()
+
+
+async def get_table_fingerprint(table, order_column):
+    """异步版本的表变更探测，探测结果与 Flask 版本共用同一份缓存"""
+    fingerprint = base.get_cached_fingerprint(table)
+    if fingerprint is not None:
+        return fingerprint
+
+    try:
+        row, _ = await probe_flight.do(table, lambda: probe_table_fingerprint(table, order_column))
+    except Error as e:
+        log_warning(f"表 '{table}' 变更探测失败: {e}")
+        return None
+
+    return base.store_fingerprint(table, row)
+
+
+# ==================== 查询超时与取消 ====================
+
+class QueryInterrupted(Exception):
+    """查询因超时（timeout）或客户端断开（disconnect）被终止"""
+
+    def __init__(self, reason):
+        super().__init__(reason)
+        self.reason = reason
+
+
+async def kill_query(thread_id):
+    """用一条独立的连接执行 KILL QUERY（连接池满时也能执行）"""
+    try:
+        connection = await aiomysql.connect(**aiomysql_config())
+        try:
+            async with connection.cursor() as cursor:
+                await cursor.execute("KILL QUERY %s", (thread_id,))
+        finally:
+            connection.close()
+    except Exception as e:
+        log_error(f"KILL QUERY {thread_id} 失败: {e}")
+
+
+async def execute_with_deadline(request, connection, cursor, plan):
+    """
+    执行查询，超过 timeout_ms（加上宽限时间）或客户端断开时 KILL QUERY 并抛出 QueryInterrupted
+    MAX_EXECUTION_TIME 提示已经在 SQL 里，这里是 MariaDB 等不支持提示时的兜底
+    """
+    task = asyncio.ensure_future(cursor.execute(plan['sql'], plan['params']))
+    deadline = time.time() + (plan['timeout_ms'] + base.QUERY_TIMEOUT_CONFIG['kill_grace_ms']) / 1000
+    interval = base.QUERY_TIMEOUT_CONFIG['check_interval']
+
+    reason = None
+    while True:
+        done, _ = await asyncio.wait({task}, timeout=interval)
+        if done:
+            break
+        if time.time() >= deadline:
+            reason = 'timeout'
+        elif await request.is_disconnected():
+            reason = 'disconnect'
+        else:
+            continue
+
+        log_warning(f"终止查询 (连接 {connection.thread_id()}): "
+                    f"{'执行超时' if reason == 'timeout' else '客户端已断开'}")
+        await kill_query(connection.thread_id())
+        break
+
+    try:
+        await task
+    except Error as e:
+        if reason is not None or base.is_query_interrupted(e):
+            raise QueryInterrupted(reason or 'timeout') from e
+        raise
+    if reason is not None:
+        raise QueryInterrupted(reason)
+
+
+def interrupted_response(reason, plan, start_time, record=True):
+    """超时返回 504，客户端断开返回 408，格式与 Flask 版本一致"""
+    elapsed_ms = int((time.time() - start_time) * 1000)
+    log_warning(f"查询中断: 表={plan['table']}, 原因={reason}, 耗时={elapsed_ms}ms")
+    if record:
+        record_slow_query(plan, elapsed_ms, 0, 'stream' if plan['stream'] else 'query', interrupted=reason)
+    if reason == 'disconnect':
+        return error_response('客户端已断开，查询已取消', 408, elapsed_ms=elapsed_ms)
+    return error_response(f"查询超时（超过 {plan['timeout_ms']}ms），已终止", 504,
+                          timeout_ms=plan['timeout_ms'], elapsed_ms=elapsed_ms, killed=True)
+
+
+# ==================== 请求合并 ====================
+
+class AsyncSingleFlight:
+    """
+    base.SingleFlight 的 asyncio 版本：同一个 key 同时只执行一次，等待者共享结果
+    执行放在独立的任务里，发起请求被取消（客户端断开）不会影响正在等待的其他请求
+    """
+
+    def __init__(self):
+        self._tasks = {}
+        self._stats = {'executions': 0, 'shared': 0, 'retries': 0}
+
+    async def do(self, key, factory, retry=None):
+        """
+        执行 await factory() 或等待正在执行的相同调用，返回 (结果, 是否共享了其他请求的执行)
+        retry(error): 为 True 的异常只属于执行者本身，等待者重新执行
+        """
+        while True:
+            task = self._tasks.get(key)
+            shared = task is not None
+            if task is None:
+                task = asyncio.ensure_future(factory())
+                self._tasks[key] = task
+                task.add_done_callback(lambda done, key=key: self._forget(key, done))
+                self._stats['executions'] += 1
+
+            try:
+                result = await asyncio.shield(task)
+            except Exception as e:
+                if shared and retry is not None and retry(e):
+                    self._stats['retries'] += 1
+                    continue
+                raise
+
+            if shared:
+                self._stats['shared'] += 1
+            return result, shared
+
+    def _forget(self, key, task):
+        if self._tasks.get(key) is task:
+            del self._tasks[key]
+
+    def stats(self):
+        return dict(self._stats, in_flight=len(self._tasks))
+
+
+query_flight = AsyncSingleFlight()
+probe_flight = AsyncSingleFlight()  # 变更探测，不计入 /api/query 的统计
+
+
+# ==================== 慢查询 ====================
+
+async def explain_slow_query(entry):
+    """后台任务：执行 EXPLAIN FORMAT=JSON，完成后写入慢查询日志"""
+    try:
+        row = await fetch_one(f"EXPLAIN FORMAT=JSON {entry['sql']}", entry['params'] or None)
+        base.finish_slow_query(entry, json.loads(list(row.values())[0]))
+    except Exception as e:
+        log_warning(f"慢查询 EXPLAIN 失败: {e}")
+        base.finish_slow_query(entry, error=str(e))
+
+
+def record_slow_query(plan, elapsed_ms, rows, kind, interrupted=None):
+    """记录慢查询（规则与 Flask 版本相同），EXPLAIN 在事件循环中执行"""
+    return base.record_slow_query(
+        plan, elapsed_ms, rows, kind, interrupted=interrupted,
+        submit=lambda entry: asyncio.get_running_loop().create_task(explain_slow_query(entry))
+    )
+
+
+# ==================== 路由 ====================
+
+async def index(request):
+    """提供 HTML 文件"""
+    return FileResponse('index.html')
+
+
+async def app_js(request):
+    """提供 JS 文件"""
+    return FileResponse('app.js', media_type='application/javascript')
+
+
+async def get_tables(request):
+    """获取所有表"""
+    if not cache['connected']:
+        return error_response('数据库未连接', 500, details=cache['error_message'])
+
+    return JSONResponse({
+        'success': True,
+        'tables': cache['tables'],
+        'count': len(cache['tables'])
+    })
+
+
+async def query_data(request: Request):
+    """查询表数据，参数和返回格式与 db_server_fixed.query_data 相同"""
+    if not cache['connected']:
+        return error_response('数据库未连接', 500, details=cache['error_message'])
+
+    start_time = time.time()
+
+    try:
+        data = await request.json()
+    except ValueError:
+        data = None
+
+    try:
+        plan = base.prepare_query(data)
+    except base.QueryError as e:
+        return error_response(str(e), e.status)
+
+    table = plan['table']
+    log_info(f"执行查询: {plan['sql']}" + (f" 参数: {plan['params']}" if plan['params'] else ""))
+
+    if plan['stream']:
+        return await stream_query(request, plan, start_time)
+
+    # 表指纹未变化时返回 304 或缓存的响应体（ETag 和压缩规则与 Flask 版本相同）
+    encoding = base.negotiate_encoding(request.headers.get('accept-encoding'))
+    cache_key = plan['cache_key'] + (encoding,)
+    etag = None
+    fingerprint = await get_table_fingerprint(table, plan['order_column'])
+    if fingerprint is not None:
+        etag = base.make_etag(plan['cache_key'], fingerprint)
+        if base.etag_matches(request.headers.get('if-none-match'), etag):
+            log_success(f"未变化 (304): 表={table}, 行数={plan['limit']}")
+            base.observe_query(table, 'not_modified', start_time)
+            return Response(status_code=304, headers=base.cached_response_headers(etag, None, 'NOT-MODIFIED'))
+
+        cached = base.result_cache.get(cache_key, fingerprint)
+        if cached is not None:
+            body, body_encoding, returned = cached
+            log_success(f"缓存命中: 表={table}, 行数={plan['limit']}")
+            base.observe_query(table, 'hit', start_time, returned)
+            return Response(body, media_type='application/json',
+                            headers=base.cached_response_headers(etag, body_encoding, 'HIT'))
+
+        # 本进程未命中时查询共享缓存（其他 worker 进程的结果），命中后放入本进程缓存
+        cached = await shared_cache_call('get_result', plan['cache_key'], fingerprint, encoding)
+        if cached is not None:
+            body, body_encoding, returned = cached
+            base.result_cache.put(cache_key, fingerprint, body, body_encoding, returned)
+            log_success(f"共享缓存命中: 表={table}, 行数={plan['limit']}")
+            base.observe_query(table, 'redis', start_time, returned)
+            return Response(body, media_type='application/json',
+                            headers=base.cached_response_headers(etag, body_encoding, 'REDIS'))
+
+    # 同时到达的相同查询只执行一次（规则与 Flask 版本相同）
+    try:
+        (body, returned), shared = await query_flight.do(
+            base.query_flight_key(plan),
+            lambda: execute_query(request, plan, start_time),
+            retry=lambda e: isinstance(e, QueryInterrupted) and e.reason == 'disconnect'
+        )
+    except QueryInterrupted as e:
+        # 慢查询已由执行者记录
+        return interrupted_response(e.reason, plan, start_time, record=False)
+    except Error as e:
+        log_error(f"数据库查询失败: {e}")
+        return error_response(f'数据库查询失败: {str(e)}', 500)
+
+    # 压缩是 CPU 密集操作，放到线程中执行，不阻塞事件循环上的其他请求
+    body, body_encoding = await asyncio.to_thread(base.compress_body, body, encoding)
+    cache_status = 'SHARED' if shared else 'MISS'
+    if shared:
+        log_success(f"合并查询: 表={table}, 行数={plan['limit']}")
+    base.observe_query(table, cache_status.lower(), start_time, returned)
+
+    if fingerprint is not None:
+        base.result_cache.put(cache_key, fingerprint, body, body_encoding, returned)
+        await shared_cache_call('put_result', plan['cache_key'], fingerprint, encoding, body, body_encoding, returned)
+
+    return Response(body, media_type='application/json',
+                    headers=base.cached_response_headers(etag, body_encoding, cache_status))
+
+
+async def execute_query(request, plan, start_time):
+    """执行查询并序列化（不压缩），返回 (响应体, 行数)；与 base.execute_query 相同"""
+    table = plan['table']
+    async with pool.acquire() as connection:
+        async with connection.cursor() as cursor:
+            db_start = time.perf_counter()
+            try:
+                await execute_with_deadline(request, connection, cursor, plan)
+            except QueryInterrupted as e:
+                record_slow_query(plan, (time.time() - start_time) * 1000, 0, 'query', interrupted=e.reason)
+                raise
+            rows = await cursor.fetchall()
+            db_elapsed = time.perf_counter() - db_start
+            base.query_latency.observe((table, 'db'), db_elapsed)
+            record_slow_query(plan, db_elapsed * 1000, len(rows), 'query')
+            converters = base.build_converters(cursor)
+
+    # 转换和序列化最多 10000 行是 CPU 密集操作，放到线程中执行，不阻塞事件循环
+    serialize_start = time.perf_counter()
+    body, returned = await asyncio.to_thread(build_body, plan, rows, converters, start_time)
+    base.query_latency.observe((table, 'serialize'), time.perf_counter() - serialize_start)
+    return body, returned
+
+
+def build_body(plan, rows, converters, start_time):
+    """分页并序列化响应体（在线程中执行），返回 (响应体, 行数)"""
+    rows, has_more, next_cursor = base.paginate_rows(list(rows), plan)
+    return base.build_query_body(plan, rows, converters, has_more, next_cursor, start_time), len(rows)
+
+
+async def stream_query(request, plan, start_time):
+    """
+    流式查询：aiomysql 的 SSDictCursor 逐行读取，输出 NDJSON（格式同 Flask 版本）
+    客户端断开时关闭连接，不再读取剩余结果
+    """
+    connection = await pool.acquire()
+    try:
+        cursor = await connection.cursor(aiomysql.SSDictCursor)
+        execute_start = time.perf_counter()
+        await execute_with_deadline(request, connection, cursor, plan)
+        execute_ms = (time.perf_counter() - execute_start) * 1000
+    except QueryInterrupted as e:
+        connection.close()
+        pool.release(connection)
+        return interrupted_response(e.reason, plan, start_time)
+    except Error as e:
+        connection.close()
+        pool.release(connection)
+        log_error(f"数据库查询失败: {e}")
+        return error_response(f'数据库查询失败: {str(e)}', 500)
+
+    converters = base.build_converters(cursor)
+    columns = plan['columns']
+
+    async def generate():
+        pager = base.StreamPager(plan)
+        completed = False
+        try:
+            yield base.ndjson_line({'type': 'meta', 'columns': columns, 'requested': plan['limit']})
+
+            while True:
+                row = await cursor.fetchone()
+                if row is None:
+                    break
+                action = pager.accept(row)
+                if action == pager.SKIP:
+                    continue
+                if action == pager.STOP:
+                    break
+
+                base.convert_rows([row], columns, converters)
+                yield base.ndjson_line({'type': 'row', 'data': row})
+
+            yield base.ndjson_line(pager.end_message(start_time))
+            completed = True
+
+        except Error as e:
+            log_error(f"流式查询失败: {e}")
+            yield base.ndjson_line({'type': 'error', 'error': f'数据库查询失败: {str(e)}'})
+        finally:
+            base.observe_query(plan['table'], 'stream', start_time, pager.returned)
+            record_slow_query(plan, execute_ms, pager.returned, 'stream')
+            if completed:
+                await cursor.close()
+            else:
+                # 结果集没读完，直接关闭连接
+                log_warning(f"流式查询中断: 表={plan['table']}, 已输出 {pager.returned} 行")
+                connection.close()
+            pool.release(connection)
+
+    return StreamingResponse(generate(), media_type='application/x-ndjson',
+                             headers={'X-Accel-Buffering': 'no', 'Cache-Control': 'no-cache'})
+
+
+async def compute_exact_row_count(table):
+    """后台任务：执行 COUNT(*) 并缓存结果"""
+    start_time = time.time()
+    try:
+        row = await fetch_one(f"SELECT COUNT(*) AS count FROM `{table}`")
+        base.record_exact_row_count(table, row['count'], start_time)
+    except Exception as e:
+        log_error(f"表 '{table}' 精确行数计算失败: {e}")
+    finally:
+        base.finish_exact_row_count(table)
+
+
+async def get_table_info(request):
+    """获取表的详细信息，参数和返回格式与 db_server_fixed.get_table_info 相同"""
+    if not cache['connected']:
+        return error_response('数据库未连接', 500)
+
+    table_name = request.path_params['table_name']
+    if table_name not in cache['table_columns']:
+        return error_response(f'表 {table_name} 不存在', 404)
+
+    table_info = cache['table_columns'][table_name]
+
+    want_exact = base.is_truthy(request.query_params.get('exact'))
+    exact_count, exact_status = base.get_exact_row_count(
+        table_name, schedule=want_exact,
+        submit=lambda table: asyncio.get_running_loop().create_task(compute_exact_row_count(table))
+    )
+
+    if exact_count is not None:
+        row_count = exact_count
+        estimated = False
+    else:
+        try:
+            row = await fetch_one(ESTIMATED_ROWS_SQL, (base.DB_CONFIG['database'], table_name))
+            row_count = int(row['table_rows'] or 0) if row else 0
+        except Error as e:
+            log_warning(f"表 '{table_name}' 估算行数获取失败: {e}")
+            row_count = 0
+        estimated = True
+
+    explain = None
+    if base.is_truthy(request.query_params.get('explain')):
+        sql = base.build_default_query_sql(table_name, table_info)
+        try:
+            async with pool.acquire() as connection:
+                async with connection.cursor() as cursor:
+                    await cursor.execute(f"EXPLAIN {sql}")
+                    explain = base.summarize_explain(sql, await cursor.fetchall())
+        except Error as e:
+            explain = {'error': str(e)}
+
+    return JSONResponse(base.table_info_payload(table_name, table_info, row_count, estimated,
+                                                exact_status, explain))
+
+
+async def fetch_tail_rows(plan, last_seen):
+    """异步版本的 base.fetch_tail_rows"""
+    order_column = plan['order_column']
+    sql, params = base.build_tail_sql(plan, last_seen)
+    async with pool.acquire() as connection:
+        async with connection.cursor() as cursor:
+            await cursor.execute(sql, params)
+            rows = await cursor.fetchall()
+            converters = base.build_converters(cursor)
+
+    if not rows:
+        return [], last_seen
+    last_value = rows[-1][order_column]
+    return base.convert_rows(list(rows), plan['columns'], converters), last_value
+
+
+async def fetch_tail_start(plan):
+    row = await fetch_one(f"SELECT MAX(`{plan['order_column']}`) AS last_seen FROM `{plan['table']}`")
+    return row['last_seen'] if row else None
+
+
+async def tail_table(request):
+    """实时追踪（SSE），参数和事件格式与 db_server_fixed.tail_table 相同；等待期间不占用线程"""
+    if not cache['connected']:
+        return error_response('数据库未连接', 500)
+
+    table_name = request.path_params['table_name']
+    try:
+        plan = base.prepare_tail(table_name, request.query_params, request.headers.get('last-event-id'))
+    except base.QueryError as e:
+        return error_response(str(e), e.status)
+
+    async def generate():
+        pushed = 0
+        order_column = plan['order_column']
+        log_info(f"开始实时追踪: 表={table_name}, 间隔={plan['interval']}s")
+        try:
+            last_seen = plan['after'] if plan['after'] is not None else await fetch_tail_start(plan)
+            yield f"retry: {int(plan['interval'] * 1000)}\n".encode('utf-8')
+            yield base.sse_event('meta', {'columns': plan['columns'], 'order_column': order_column})
+
+            deadline = time.time() + base.TAIL_CONFIG['max_duration']
+            while time.time() < deadline and not await request.is_disconnected():
+                # 空表（last_seen 为 None）时从最早的行开始读，第一批新行也会推送
+                rows, last_seen = await fetch_tail_rows(plan, last_seen)
+
+                if rows:
+                    pushed += len(rows)
+                    base.rows_returned.inc((table_name,), len(rows))
+                    rows.reverse()
+                    yield base.sse_event('rows', {'rows': rows},
+                                         base.encode_cursor(table_name, order_column, last_seen, 0))
+                    if len(rows) == base.TAIL_CONFIG['batch_rows']:
+                        continue
+                else:
+                    yield b': ping\n\n'
+                await asyncio.sleep(plan['interval'])
+
+        except Error as e:
+            log_error(f"实时追踪查询失败: {e}")
+            yield base.sse_event('db_error', {'error': f'数据库查询失败: {str(e)}'})
+        finally:
+            log_info(f"结束实时追踪: 表={table_name}, 共推送 {pushed} 行")
+
+    return StreamingResponse(generate(), media_type='text/event-stream',
+                             headers={'X-Accel-Buffering': 'no', 'Cache-Control': 'no-cache'})
+
+
+async def profile_table(request):
+    """列统计，参数和返回格式与 db_server_fixed.profile_table 相同（超时由 MAX_EXECUTION_TIME 提示终止）"""
+    if not cache['connected']:
+        return error_response('数据库未连接', 500)
+
+    table_name = request.path_params['table_name']
+    try:
+        plan = base.prepare_profile(table_name, request.query_params)
+    except base.QueryError as e:
+        return error_response(str(e), e.status)
+
+    if not base.is_truthy(request.query_params.get('refresh')):
+        payload = base.get_cached_profile(plan['cache_key'])
+        if payload is not None:
+            return JSONResponse(dict(payload, cached=True))
+
+    start_time = time.time()
+    try:
+        async with pool.acquire() as connection:
+            async with connection.cursor() as cursor:
+                await cursor.execute(base.build_profile_sql(plan), plan['params'])
+                stats_row = await cursor.fetchone()
+                sampled, columns = base.summarize_profile(plan, stats_row, base.build_converters(cursor))
+
+            indexes = base.low_cardinality_columns(sampled, columns)
+            if indexes:
+                try:
+                    async with connection.cursor() as cursor:
+                        await cursor.execute(base.build_top_values_sql(plan, indexes), plan['params'])
+                        base.attach_top_values(columns, indexes, list(await cursor.fetchall()),
+                                               base.build_converters(cursor))
+                except Error as e:
+                    if base.is_query_interrupted(e):
+                        raise
+                    base.top_values_failed(plan['table'], e)
+    except Error as e:
+        if base.is_query_interrupted(e):
+            log_warning(f"列统计中断: 表={table_name}, {e}")
+            return error_response(f"列统计超时（超过 {base.PROFILE_CONFIG['timeout_ms']}ms），请减小 sample", 504)
+        log_error(f"列统计失败: {e}")
+        return error_response(f'数据库查询失败: {str(e)}', 500)
+
+    payload = base.profile_payload(plan, sampled, columns, start_time)
+    base.store_profile(plan['cache_key'], payload)
+    return JSONResponse(dict(payload, cached=False))
+
+
+async def get_slow_queries(request):
+    """最近的慢查询及按表的汇总，参数和返回格式与 db_server_fixed.get_slow_queries 相同"""
+    try:
+        limit = int(request.query_params.get('limit', 50))
+    except ValueError:
+        return error_response('limit 必须是整数', 400)
+
+    queries = base.slow_query_log.list(request.query_params.get('table'), max(limit, 1))
+    return JSONResponse(dict(
+        base.slow_query_log.stats(),
+        success=True,
+        count=len(queries),
+        tables=base.slow_query_log.summary(),
+        queries=queries
+    ))
+
+
+def pool_stats():
+    """aiomysql 连接池统计，字段与 Flask 版本的连接池一致"""
+    if pool is None:
+        return None
+    return {
+        'max_size': pool.maxsize,
+        'size': pool.size,
+        'idle': pool.freesize,
+        'in_use': pool.size - pool.freesize
+    }
+
+
+async def metrics(request):
+    """Prometheus 指标，与 Flask 版本相同（HTTP 请求级别的指标只有 Flask 版本记录）"""
+    return PlainTextResponse(base.render_metrics(pool_stats(), query_flight.stats()),
+                             media_type='text/plain; version=0.0.4')
+
+
+async def health(request):
+    """健康检查"""
+
+    return JSONResponse({
+        'status': 'ok' if cache['connected'] else 'error',
+        'mode': 'async',
+        'connected': cache['connected'],
+        'tables_count': len(cache['tables']),
+        'pool': pool_stats(),
+        'result_cache': base.result_cache.stats(),
+        'shared_cache': base.shared_cache.stats() if base.shared_cache is not None else None,
+        'query_flight': query_flight.stats(),
+        'probe_flight': probe_flight.stats(),
+        'slow_queries': base.slow_query_log.stats(),
+        'error': cache['error_message'] if not cache['connected'] else None
+    })
+
+
+app = Starlette(
+    routes=[
+        Route('/', index),
+        Route('/app.js', app_js),
+        Route('/api/tables', get_tables, methods=['GET']),
+        Route('/api/query', query_data, methods=['POST']),
+        Route('/api/table-info/{table_name}', get_table_info, methods=['GET']),
+        Route('/api/tail/{table_name}', tail_table, methods=['GET']),
+        Route('/api/profile/{table_name}', profile_table, methods=['GET']),
+        Route('/api/slow-queries', get_slow_queries, methods=['GET']),
+        Route('/api/health', health, methods=['GET']),
+        Route('/metrics', metrics, methods=['GET'])
+    ],
+    middleware=[Middleware(CORSMiddleware, allow_origins=['*'], allow_methods=['*'], allow_headers=['*'])],
+    lifespan=lifespan
+)
+
+
+# ==================== 主函数 ====================
+
+if __name__ == '__main__':
+    import uvicorn
+
+    print("\n" + "=" * 60)
+    print("🚀 数据库查看工具（异步版本）启动中...")
+    print(f"✓ 服务器启动在 http://localhost:{SERVER_PORT}")
+    print(f"✓ aiomysql 连接池最多 {ASYNC_POOL_CONFIG['maxsize']} 个连接")
+    print("=" * 60 + "\n")
+
+    uvicorn.run(app, host='localhost', port=SERVER_PORT, log_level='warning')
@@ -5,30 +5,171 @@
 数据库查看工具 - Flask Web 服务
 连接腾讯云 MySQL 数据库，提供 Web 界面查看表数据
 修复版本：确保返回正确行数，所有表倒序输出
+本地压测: python gen_sqlite_data.py && DB_BACKEND=sqlite python db_server_fixed.py（不需要 MySQL）
 """
 
-from flask import Flask, jsonify, request, send_from_directory
+from flask import Flask, jsonify, request, send_from_directory, Response, stream_with_context, g
 from flask_cors import CORS
 import pymysql
 from pymysql import Error
+from pymysql.constants import FIELD_TYPE
+import os
+import re
 import json
-from datetime import datetime
+import base64
+import bisect
+import csv
+import io
+import gzip
+import hashlib
+from datetime import datetime, date
+from decimal import Decimal
 import time
+import threading
+import logging
+from logging.handlers import RotatingFileHandler
+import select
+import socket
+from collections import deque, OrderedDict
+from contextlib import contextmanager
+from concurrent.futures import ThreadPoolExecutor
+
+from db_backends import create_backend, sqlite_affinity
+from shared_cache import SharedCache, create_client as create_shared_cache_client
+
+try:
+    # 可选依赖：更快的 JSON 序列化
+    import orjson
+except ImportError:
+    orjson = None
+
+try:
+    # 可选依赖：brotli 压缩（没有安装时只用 gzip）
+    import brotli
+except ImportError:
+    brotli = None
+
+try:
+    # 可选依赖：Parquet / Arrow 格式导出
+    import pyarrow
+    import pyarrow.ipc
+    import pyarrow.parquet
+except ImportError:
+    pyarrow = None
 
 app = Flask(__name__, static_folder='.', static_url_path='')
+# 行数据量大时不需要对每行的键排序
+app.json.sort_keys = False
 CORS(app)
 
 # ==================== 数据库配置 ====================
+# 可以通过环境变量指向其他数据库（例如本地压测用的 MySQL）
 DB_CONFIG = {
-    'host': '43.153.71.169',
-    'port': 3306,
-    'user': 'root',
-    'password': '8ta6R',
-    'database': 'my_common_video_db',
+    'host': os.environ.get('DB_HOST', '43.153.71.169'),
+    'port': int(os.environ.get('DB_PORT', 3306)),
+    'user': os.environ.get('DB_USER', 'root'),
+    'password': os.environ.get('DB_PASSWORD', '8ta6R'),
+    'database': os.environ.get('DB_NAME', 'my_common_video_db'),
     'charset': 'utf8mb4',
     'cursorclass': pymysql.cursors.DictCursor
 }
 
+# ==================== 数据库后端配置 ====================
+# DB_BACKEND=sqlite 时改为读取本地 SQLite 文件（用 gen_sqlite_data.py 生成），不需要 MySQL 即可压测
+BACKEND_CONFIG = {
+    'name': os.environ.get('DB_BACKEND', 'mysql'),
+    'sqlite_path': os.environ.get('SQLITE_PATH', 'db_viewer.sqlite3')
+}
+
+# ==================== 连接池配置 ====================
+POOL_CONFIG = {
+    'max_size': 10,          # 最大连接数
+    'max_idle_time': 300,    # 空闲超过该秒数的连接直接关闭
+    'ping_interval': 30,     # 空闲超过该秒数的连接，取出时先 ping 一次
+    'acquire_timeout': 10    # 连接池满时等待空闲连接的最长秒数
+}
+
+# ==================== 结果缓存配置 ====================
+RESULT_CACHE_CONFIG = {
+    'max_bytes': 64 * 1024 * 1024,     # 缓存总字节上限
+    'max_entry_bytes': 16 * 1024 * 1024,  # 单个结果超过该大小不缓存
+    'ttl': 60,                          # 结果最长缓存秒数
+    'probe_interval': 2                 # 同一个表的变更探测结果复用秒数
+}
+
+# ==================== 共享缓存配置 ====================
+# 多个 worker 进程共享表结构和查询结果（Redis，见 shared_cache.py），默认关闭
+SHARED_CACHE_CONFIG = {
+    'mode': os.environ.get('REDIS_CACHE', ''),              # redis / fake，为空时不开启
+    'prefix': os.environ.get('REDIS_CACHE_PREFIX', 'dbviewer:'),
+    'schema_ttl': 300,      # 表结构缓存秒数（新建的表最迟在该时间后被其他进程看到）
+    'retry_interval': 10    # Redis 出错后暂停访问的秒数
+}
+
+# ==================== 响应压缩配置 ====================
+COMPRESSION_CONFIG = {
+    'min_bytes': 1024,     # 小于该大小的响应不压缩
+    'gzip_level': 6,       # gzip 压缩级别（1-9）
+    'brotli_quality': 5    # brotli 压缩质量（0-11），5 左右速度和压缩率比较均衡
+}
+
+# ==================== 行数统计配置 ====================
+COUNT_CONFIG = {
+    'exact_ttl': 300,   # 精确行数缓存秒数
+    'workers': 2        # 后台计算精确行数的线程数
+}
+
+# ==================== 查询超时配置 ====================
+QUERY_TIMEOUT_CONFIG = {
+    'default_ms': 15000,   # 默认单次查询最长执行时间
+    'max_ms': 60000,       # 请求参数 timeout_ms 的上限
+    'kill_grace_ms': 1000,  # MAX_EXECUTION_TIME 未生效时（如 MariaDB），超时后再等多久发 KILL QUERY
+    'check_interval': 0.2  # 看门狗检查间隔（秒）
+}
+
+# ==================== 数据导出配置 ====================
+EXPORT_CONFIG = {
+    'chunk_rows': 10000,       # 默认每段行数（每段一次按键范围的查询）
+    'max_chunk_rows': 100000   # 参数 chunk 的上限，决定导出时的内存上限
+}
+
+# ==================== 监控指标配置 ====================
+METRICS_CONFIG = {
+    # 耗时直方图的分桶上限（秒）
+    'latency_buckets': (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30, 60)
+}
+
+# ==================== 慢查询配置 ====================
+SLOW_QUERY_CONFIG = {
+    'threshold_ms': int(os.environ.get('SLOW_QUERY_MS', 1000)),  # 执行时间超过该毫秒数记为慢查询
+    'buffer_size': 200,              # 内存中保留最近多少条
+    'log_file': os.path.join(os.path.dirname(os.path.abspath(__file__)), 'slow_queries.jsonl'),
+    'max_bytes': 10 * 1024 * 1024,   # 日志文件超过该大小时轮转
+    'backup_count': 3,               # 保留的历史日志文件数
+    'explain': True                  # 是否自动执行 EXPLAIN FORMAT=JSON
+}
+
+# ==================== 实时追踪配置 ====================
+TAIL_CONFIG = {
+    'default_interval': 2,   # 默认轮询间隔（秒）
+    'min_interval': 0.5,
+    'max_interval': 60,
+    'batch_rows': 500,       # 每次最多推送的新行数（超过时立即再取一次）
+    'max_clients': 20,       # 同时追踪的客户端上限（每个客户端占用一个线程）
+    'max_duration': 3600     # 单个连接最长秒数，到期后浏览器会带上 Last-Event-ID 自动重连
+}
+
+# ==================== 列统计配置 ====================
+PROFILE_CONFIG = {
+    'sample_rows': 100000,       # 默认采样行数（按排序字段取最新的 N 行，只读索引一端）
+    'max_sample_rows': 1000000,  # 参数 sample 的上限
+    'ttl': 600,                  # 统计结果缓存秒数
+    'max_entries': 200,          # 最多缓存多少份统计结果
+    'low_cardinality': 50,       # 采样中不同值不超过该数的列才统计最常见的值
+    'top_values': 10,            # 每列返回的最常见值个数
+    'timeout_ms': 30000          # 统计查询最长执行时间
+}
+
 # ==================== 全局缓存 ====================
 cache = {
     'tables': [],
@@ -37,132 +178,2718 @@ cache = {
     'error_message': ''
 }
 
-# ==================== 日志函数 ====================
+# ==================== 日志函数 ====================
+
+def log_info(message: str):
+    """打印信息日志"""
+    print(f"ℹ️  {message}")
+
+
+def log_success(message: str):
+    """打印成功日志"""
+    print(f"✓ {message}")
+
+
+def log_error(message: str):
+    """打印错误日志"""
+    print(f"✗ {message}")
+
+
+def log_warning(message: str):
+    """打印警告日志"""
+    print(f"⚠️  {message}")
+
+
+# ==================== 数据库连接池 ====================
+
+class PoolTimeoutError(Error):
+    """等待空闲连接超时"""
+
+
+class ConnectionPool:
+    """
+    线程安全的数据库连接池
+    1. 连接数有上限，池满时阻塞等待，超时抛出 PoolTimeoutError
+    2. 空闲太久的连接直接关闭，空闲一段时间的连接取出前先 ping
+    3. connect 为建连函数（数据库后端的 connect），连接使用 autocommit，避免复用连接时读到旧的事务快照
+    """
+
+    def __init__(self, connect, max_size=10, max_idle_time=300, ping_interval=30, acquire_timeout=10):
+        self._connect = connect
+        self.max_size = max_size
+        self.max_idle_time = max_idle_time
+        self.ping_interval = ping_interval
+        self.acquire_timeout = acquire_timeout
+
+        self._idle = deque()  # (connection, 最后归还时间)
+        self._size = 0        # 已创建且未关闭的连接数（空闲 + 使用中）
+        self._cond = threading.Condition()
+        self._stats = {
+            'created': 0,
+            'reused': 0,
+            'evicted': 0,
+            'ping_failures': 0,
+            'discarded': 0,
+            'waits': 0,
+            'timeouts': 0
+        }
+
+    def _close_quietly(self, connection):
+        try:
+            connection.close()
+        except Exception:
+            pass
+
+    def _evict_expired(self, now):
+        """关闭空闲超时的连接（调用方需持有锁）"""
+        while self._idle and now - self._idle[0][1] > self.max_idle_time:
+            connection, _ = self._idle.popleft()
+            self._size -= 1
+            self._stats['evicted'] += 1
+            self._close_quietly(connection)
+
+    def _take(self, deadline):
+        """
+        取出一个空闲连接或一个新建名额
+        返回 (connection, 空闲秒数)，connection 为 None 表示调用方需新建连接
+        """
+        with self._cond:
+            waited = False
+            while True:
+                now = time.time()
+                self._evict_expired(now)
+
+                if self._idle:
+                    # 后进先出，优先复用刚归还的热连接，冷连接留给淘汰
+                    connection, last_used = self._idle.pop()
+                    return connection, now - last_used
+
+                if self._size < self.max_size:
+                    self._size += 1
+                    return None, 0
+
+                remaining = deadline - now
+                if remaining <= 0:
+                    self._stats['timeouts'] += 1
+                    raise PoolTimeoutError(f"等待数据库连接超时 ({self.acquire_timeout}s)")
+
+                if not waited:
+                    self._stats['waits'] += 1
+                    waited = True
+                self._cond.wait(remaining)
+
+    def acquire(self):
+        """获取连接（ping 和建连都在锁外进行）"""
+        deadline = time.time() + self.acquire_timeout
+        while True:
+            connection, idle_for = self._take(deadline)
+
+            if connection is None:
+                try:
+                    connection = self._connect()
+                except Exception:
+                    with self._cond:
+                        self._size -= 1
+                        self._cond.notify()
+                    raise
+                with self._cond:
+                    self._stats['created'] += 1
+                return connection
+
+            if idle_for >= self.ping_interval:
+                try:
+                    connection.ping(reconnect=False)
+                except Exception:
+                    with self._cond:
+                        self._stats['ping_failures'] += 1
+                    self.release(connection, discard=True)
+                    continue
+
+            with self._cond:
+                self._stats['reused'] += 1
+            return connection
+
+    def release(self, connection, discard=False):
+        """归还连接，discard=True 时直接关闭"""
+        with self._cond:
+            if discard or not connection.open:
+                self._size -= 1
+                self._stats['discarded'] += 1
+                self._close_quietly(connection)
+            else:
+                self._idle.append((connection, time.time()))
+            self._cond.notify()
+
+    @contextmanager
+    def connection(self):
+        """with db_pool.connection() as connection: ...，连接层错误时丢弃连接"""
+        connection = self.acquire()
+        broken = False
+        try:
+            yield connection
+        except (pymysql.err.OperationalError, pymysql.err.InterfaceError):
+            broken = True
+            raise
+        finally:
+            self.release(connection, discard=broken)
+
+    def close_all(self):
+        """关闭所有空闲连接"""
+        with self._cond:
+            while self._idle:
+                connection, _ = self._idle.popleft()
+                self._size -= 1
+                self._close_quietly(connection)
+            self._cond.notify_all()
+
+    def stats(self):
+        """连接池统计信息"""
+        with self._cond:
+            self._evict_expired(time.time())
+            idle = len(self._idle)
+            return dict(
+                self._stats,
+                max_size=self.max_size,
+                size=self._size,
+                idle=idle,
+                in_use=self._size - idle
+            )
+
+
+db_backend = create_backend(BACKEND_CONFIG['name'], DB_CONFIG, BACKEND_CONFIG['sqlite_path'])
+db_pool = ConnectionPool(db_backend.connect, **POOL_CONFIG)
+
+
+# ==================== 查询超时与取消 ====================
+
+# MySQL 错误码：超过 MAX_EXECUTION_TIME / 被 KILL QUERY 中断
+ER_QUERY_TIMEOUT = 3024
+ER_QUERY_INTERRUPTED = 1317
+
+
+def client_disconnected(client_socket):
+    """客户端是否已断开：socket 可读但读不到数据即对端已关闭"""
+    if client_socket is None:
+        return False
+    try:
+        readable, _, _ = select.select([client_socket], [], [], 0)
+        if not readable:
+            return False
+        return client_socket.recv(1, socket.MSG_PEEK) == b''
+    except (OSError, ValueError):
+        return True
+
+
+def kill_query(thread_id):
+    """终止另一个连接上的查询（MySQL 用独立连接执行 KILL QUERY，连接池满时也能执行）"""
+    db_backend.kill_query(thread_id)
+
+
+class WatchHandle:
+    """
+    一次被监控的查询，reason 为 timeout / disconnect 表示已被看门狗中断
+    被中断过的连接上可能还有没生效的 KILL QUERY，调用方归还连接时必须丢弃（见 killed）
+    """
+
+    def __init__(self, watchdog, thread_id, deadline, client_socket):
+        self.watchdog = watchdog
+        self.thread_id = thread_id
+        self.deadline = deadline
+        self.client_socket = client_socket
+        self.reason = None
+        self.kill_done = threading.Event()
+
+    @property
+    def killed(self):
+        """看门狗是否对这个连接执行过 KILL QUERY（归还连接时需要 discard）"""
+        return self.reason is not None
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.watchdog.unwatch(self)
+        return False
+
+
+class QueryWatchdog:
+    """
+    查询看门狗：一个后台线程定期检查所有正在执行的查询
+    超过截止时间或客户端已断开时执行 KILL QUERY，释放数据库线程
+    """
+
+    def __init__(self, check_interval):
+        self.check_interval = check_interval
+        self._handles = set()
+        self._lock = threading.Lock()
+        self._thread = None
+        self._stats = {'timeouts': 0, 'disconnects': 0, 'kill_failures': 0}
+
+    def watch(self, connection, timeout_ms, client_socket=None):
+        """开始监控连接上的查询，配合 with 使用"""
+        deadline = time.time() + (timeout_ms + QUERY_TIMEOUT_CONFIG['kill_grace_ms']) / 1000
+        handle = WatchHandle(self, connection.thread_id(), deadline, client_socket)
+        with self._lock:
+            self._handles.add(handle)
+            if self._thread is None:
+                self._thread = threading.Thread(target=self._run, name='query-watchdog', daemon=True)
+                self._thread.start()
+        return handle
+
+    def unwatch(self, handle):
+        """
+        结束监控；与看门狗的 _claim 互斥，两者只有一方能把 handle 移出
+        看门狗先移出时（已决定 KILL），等 KILL QUERY 执行完再返回，
+        调用方随后看到 handle.killed 并丢弃连接，KILL 不会落到下一个使用该连接的请求上
+        """
+        with self._lock:
+            if handle in self._handles:
+                self._handles.discard(handle)
+                return
+        if handle.reason is not None:
+            handle.kill_done.wait()
+
+    def _claim(self, handle, reason):
+        """确认 handle 仍在监控中并移出，返回 False 表示查询已经结束（调用方已 unwatch）"""
+        with self._lock:
+            if handle not in self._handles:
+                return False
+            self._handles.discard(handle)
+            handle.reason = reason
+            return True
+
+    def _run(self):
+        while True:
+            time.sleep(self.check_interval)
+            self.check()
+
+    def check(self, now=None):
+        """检查一遍所有查询，超时或客户端已断开的执行 KILL QUERY"""
+        now = now or time.time()
+        with self._lock:
+            handles = list(self._handles)
+
+        for handle in handles:
+            if now >= handle.deadline:
+                reason = 'timeout'
+            elif client_disconnected(handle.client_socket):
+                reason = 'disconnect'
+            else:
+                continue
+
+            # 快照之后查询可能已经结束并归还连接，必须在锁内确认后才能 KILL
+            if not self._claim(handle, reason):
+                continue
+            try:
+                self._kill(handle)
+            finally:
+                handle.kill_done.set()
+
+    def _kill(self, handle):
+        with self._lock:
+            self._stats['timeouts' if handle.reason == 'timeout' else 'disconnects'] += 1
+        log_warning(f"终止查询 (连接 {handle.thread_id}): "
+                    f"{'执行超时' if handle.reason == 'timeout' else '客户端已断开'}")
+        try:
+            kill_query(handle.thread_id)
+        except Exception as e:
+            with self._lock:
+                self._stats['kill_failures'] += 1
+            log_error(f"KILL QUERY {handle.thread_id} 失败: {e}")
+
+    def stats(self):
+        with self._lock:
+            return dict(self._stats, running=len(self._handles))
+
+
+query_watchdog = QueryWatchdog(QUERY_TIMEOUT_CONFIG['check_interval'])
+
+
+def is_query_interrupted(error, handle=None):
+    """查询是否因超时或取消而中断"""
+    if handle is not None and handle.reason is not None:
+        return True
+    code = error.args[0] if error.args else None
+    return code in (ER_QUERY_TIMEOUT, ER_QUERY_INTERRUPTED)
+
+
+def interrupted_response(error, handle, plan, start_time, record=True):
+    """
+    超时返回 504，客户端断开返回 408，附带耗时信息
+    record=False 时不记录慢查询（合并的请求共享同一次中断，只由执行者记录）
+    """
+    elapsed_ms = int((time.time() - start_time) * 1000)
+    reason = handle.reason if handle is not None and handle.reason else 'timeout'
+    log_warning(f"查询中断: 表={plan['table']}, 原因={reason}, 耗时={elapsed_ms}ms, {error}")
+    if record:
+        record_slow_query(plan, elapsed_ms, 0, 'stream' if plan['stream'] else 'query', interrupted=reason)
+
+    if reason == 'disconnect':
+        return jsonify({
+            'success': False,
+            'error': '客户端已断开，查询已取消',
+            'elapsed_ms': elapsed_ms
+        }), 408
+
+    return jsonify({
+        'success': False,
+        'error': f"查询超时（超过 {plan['timeout_ms']}ms），已终止",
+        'timeout_ms': plan['timeout_ms'],
+        'elapsed_ms': elapsed_ms,
+        'killed': handle is not None and handle.reason == 'timeout'
+    }), 504
+
+
+# ==================== 结果缓存 ====================
+
+class ResultCache:
+    """
+    查询结果缓存（TTL + LRU + 字节上限）
+    缓存的是序列化（并压缩）后的响应体，命中时不再访问数据库也不再序列化
+    每个条目记录写入时的表指纹，指纹变化（表有新数据或被修改）即失效
+    """
+
+    def __init__(self, max_bytes, max_entry_bytes, ttl):
+        self.max_bytes = max_bytes
+        self.max_entry_bytes = max_entry_bytes
+        self.ttl = ttl
+
+        self._entries = OrderedDict()  # key -> (body, encoding, rows, fingerprint, 写入时间)
+        self._bytes = 0
+        self._lock = threading.Lock()
+        self._stats = {
+            'hits': 0,
+            'misses': 0,
+            'invalidations': 0,
+            'evictions': 0,
+            'skipped': 0
+        }
+
+    def _remove(self, key):
+        """删除条目（调用方需持有锁）"""
+        body, _, _, _, _ = self._entries.pop(key)
+        self._bytes -= len(body)
+
+    def get(self, key, fingerprint):
+        """获取缓存的 (响应体, 压缩方式, 行数)，过期或表已变化时返回 None"""
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                self._stats['misses'] += 1
+                return None
+
+            body, encoding, rows, cached_fingerprint, created = entry
+            if cached_fingerprint != fingerprint or time.time() - created > self.ttl:
+                self._remove(key)
+                self._stats['invalidations'] += 1
+                self._stats['misses'] += 1
+                return None
+
+            self._entries.move_to_end(key)
+            self._stats['hits'] += 1
+            return body, encoding, rows
+
+    def put(self, key, fingerprint, body, encoding=None, rows=0):
+        """写入缓存，超出字节上限时按 LRU 淘汰；encoding 为响应体的压缩方式，rows 为响应中的行数"""
+        size = len(body)
+        with self._lock:
+            if size > self.max_entry_bytes or size > self.max_bytes:
+                self._stats['skipped'] += 1
+                return
+
+            if key in self._entries:
+                self._remove(key)
+
+            while self._entries and self._bytes + size > self.max_bytes:
+                oldest = next(iter(self._entries))
+                self._remove(oldest)
+                self._stats['evictions'] += 1
+
+            self._entries[key] = (body, encoding, rows, fingerprint, time.time())
+            self._bytes += size
+
+    def stats(self):
+        """缓存统计信息"""
+        with self._lock:
+            lookups = self._stats['hits'] + self._stats['misses']
+            return dict(
+                self._stats,
+                entries=len(self._entries),
+                bytes=self._bytes,
+                max_bytes=self.max_bytes,
+                hit_rate=round(self._stats['hits'] / lookups, 4) if lookups else 0
+            )
+
+
+result_cache = ResultCache(
+    RESULT_CACHE_CONFIG['max_bytes'],
+    RESULT_CACHE_CONFIG['max_entry_bytes'],
+    RESULT_CACHE_CONFIG['ttl']
+)
+
+
+def create_shared_cache():
+    """按配置创建 Redis 共享缓存，没有开启或依赖未安装时返回 None（只使用本进程的缓存）"""
+    if not SHARED_CACHE_CONFIG['mode']:
+        return None
+    client, reason = create_shared_cache_client(SHARED_CACHE_CONFIG['mode'])
+    if client is None:
+        log_warning(f"共享缓存未开启: {reason}")
+        return None
+    return SharedCache(
+        client,
+        prefix=SHARED_CACHE_CONFIG['prefix'],
+        schema_ttl=SHARED_CACHE_CONFIG['schema_ttl'],
+        result_ttl=RESULT_CACHE_CONFIG['ttl'],
+        max_entry_bytes=RESULT_CACHE_CONFIG['max_entry_bytes'],
+        retry_interval=SHARED_CACHE_CONFIG['retry_interval'],
+        on_error=lambda e: log_warning(f"共享缓存访问失败，{SHARED_CACHE_CONFIG['retry_interval']}s 内不再访问: {e}")
+    )
+
+
+shared_cache = create_shared_cache()
+
+# 表指纹探测结果：table -> (fingerprint, 探测时间)
+table_fingerprints = {}
+table_fingerprints_lock = threading.Lock()
+
+
+def get_table_fingerprint(table, order_column):
+    """
+    获取表的变更指纹：MAX(排序字段) + information_schema.TABLES.UPDATE_TIME
+    一次往返完成；排序字段有索引时 MAX 只读索引一端，开销很小
+    新增数据会改变 MAX，修改/删除会改变 UPDATE_TIME（MySQL 8 的探测连接关闭了统计信息缓存，见 db_backends.STATS_EXPIRY_SQL）
+    探测失败返回 None（调用方不使用缓存）
+    """
+    fingerprint = get_cached_fingerprint(table)
+    if fingerprint is not None:
+        return fingerprint
+
+    # 同一个表同时只探测一次
+    try:
+        row, _ = probe_flight.do(table, lambda: probe_table_fingerprint(table, order_column))
+    except Error as e:
+        log_warning(f"表 '{table}' 变更探测失败: {e}")
+        return None
+
+    return store_fingerprint(table, row)
+
+
+def probe_table_fingerprint(table, order_column):
+    """执行变更探测，返回 {'max_value', 'update_time'}"""
+    with db_pool.connection() as connection:
+        with connection.cursor() as cursor:
+            return db_backend.fingerprint(cursor, table, order_column)
+
+
+def get_cached_fingerprint(table):
+    """probe_interval 内探测过的指纹直接复用，没有则返回 None"""
+    with table_fingerprints_lock:
+        probed = table_fingerprints.get(table)
+        if probed and time.time() - probed[1] < RESULT_CACHE_CONFIG['probe_interval']:
+            return probed[0]
+    return None
+
+
+def store_fingerprint(table, row):
+    """记录探测结果，返回指纹"""
+    fingerprint = f"{row['max_value']}|{row['update_time']}"
+    with table_fingerprints_lock:
+        table_fingerprints[table] = (fingerprint, time.time())
+    return fingerprint
+
+
+# ==================== 请求合并 ====================
+
+class FlightCall:
+    """一次正在执行的调用"""
+
+    def __init__(self):
+        self.event = threading.Event()
+        self.result = None
+        self.error = None
+        self.waiters = 0
+
+
+class SingleFlight:
+    """
+    相同请求合并（single-flight）：同一个 key 同时只执行一次，
+    执行期间到达的相同请求等待这次执行，共享它的结果（或异常），不再访问数据库
+    """
+
+    def __init__(self):
+        self._calls = {}
+        self._lock = threading.Lock()
+        self._stats = {'executions': 0, 'shared': 0, 'retries': 0, 'wait_timeouts': 0}
+
+    def do(self, key, func, timeout=None, retry=None):
+        """
+        执行 func() 或等待正在执行的相同调用，返回 (结果, 是否共享了其他请求的执行)
+        timeout: 等待秒数，超时后自己执行（不再合并）
+        retry(error): 为 True 的异常只属于执行者本身（例如它的客户端断开），等待者重新执行
+        """
+        while True:
+            with self._lock:
+                call = self._calls.get(key)
+                if call is None:
+                    call = FlightCall()
+                    self._calls[key] = call
+                    self._stats['executions'] += 1
+                    leader = True
+                else:
+                    call.waiters += 1
+                    leader = False
+
+            if leader:
+                return self._run(key, call, func), False
+
+            if not call.event.wait(timeout):
+                with self._lock:
+                    self._stats['wait_timeouts'] += 1
+                return func(), False
+
+            if call.error is None:
+                with self._lock:
+                    self._stats['shared'] += 1
+                return call.result, True
+            if retry is not None and retry(call.error):
+                with self._lock:
+                    self._stats['retries'] += 1
+                continue
+            raise call.error
+
+    def _run(self, key, call, func):
+        try:
+            call.result = func()
+            return call.result
+        except Exception as e:
+            call.error = e
+            raise
+        finally:
+            with self._lock:
+                del self._calls[key]
+            call.event.set()
+
+    def stats(self):
+        """合并统计信息"""
+        with self._lock:
+            return dict(self._stats, in_flight=len(self._calls))
+
+
+query_flight = SingleFlight()
+# 变更探测单独合并，不计入 /api/query 的合并和执行统计
+probe_flight = SingleFlight()
+FLIGHT_COUNTER_KEYS = {'executions', 'shared', 'retries', 'wait_timeouts'}
+
+# 优化器提示（MAX_EXECUTION_TIME 等），合并键中单独使用 timeout_ms
+SQL_HINT_PATTERN = re.compile(r'/\*\+.*?\*/\s*')
+
+
+def normalize_sql(sql):
+    """去掉优化器提示并合并空白（值都通过参数绑定，SQL 中没有字符串常量）"""
+    return ' '.join(SQL_HINT_PATTERN.sub('', sql).split())
+
+
+def query_flight_key(plan):
+    """
+    /api/query 的合并键：规范化后的 SQL、参数，影响响应体的分页和格式，以及超时时间
+    （超时不同的请求不合并，否则等待者可能因为执行者的超时更短而收到 504）
+    """
+    return ('query', normalize_sql(plan['sql']), plan['params'], plan['format'], plan['limit'], plan['cursor_skip'],
+            plan['timeout_ms'])
+
+
+# ==================== 响应压缩与 ETag ====================
+
+def make_etag(cache_key, fingerprint):
+    """
+    强 ETag：由查询参数和表指纹计算，不需要先执行查询
+    表指纹不变时同一个查询的结果不变，客户端带上 If-None-Match 即可得到 304
+    """
+    digest = hashlib.sha1(repr((cache_key, fingerprint)).encode('utf-8')).hexdigest()
+    return f'"{digest[:24]}"'
+
+
+def encoded_etag(etag, encoding):
+    """不同压缩方式的响应体不同，强 ETag 需要区分（如 "abc-gzip"）"""
+    return f'"{etag.strip(chr(34))}-{encoding}"' if encoding else etag
+
+
+def etag_matches(if_none_match, etag):
+    """If-None-Match 中是否有与 etag 相同的值（忽略压缩方式后缀和 W/ 前缀）"""
+    if not if_none_match:
+        return False
+    expected = etag.strip('"')
+    for candidate in if_none_match.split(','):
+        candidate = candidate.strip()
+        if candidate.startswith('W/'):
+            candidate = candidate[2:]
+        candidate = candidate.strip('"')
+        if candidate == '*' or candidate.split('-')[0] == expected:
+            return True
+    return False
+
+
+def negotiate_encoding(accept_encoding):
+    """根据 Accept-Encoding 选择压缩方式：br（需要 brotli）或 gzip，都不接受时返回 None"""
+    weights = {}
+    for part in (accept_encoding or '').split(','):
+        name, _, params = part.partition(';')
+        name = name.strip().lower()
+        if not name:
+            continue
+        quality = 1.0
+        params = params.strip()
+        if params.startswith('q='):
+            try:
+                quality = float(params[2:])
+            except ValueError:
+                quality = 0.0
+        weights[name] = quality
+
+    candidates = (['br'] if brotli is not None else []) + ['gzip']
+    best = None
+    for encoding in candidates:
+        quality = weights.get(encoding, weights.get('*', 0.0))
+        if quality > 0 and (best is None or quality > best[1]):
+            best = (encoding, quality)
+    return best[0] if best else None
+
+
+def compress_body(body, encoding):
+    """
+    按 encoding 压缩响应体，返回 (body, 实际使用的 encoding)
+    响应体太小或不需要压缩时原样返回
+    """
+    if encoding is None or len(body) < COMPRESSION_CONFIG['min_bytes']:
+        return body, None
+    if encoding == 'br':
+        return brotli.compress(body, quality=COMPRESSION_CONFIG['brotli_quality']), 'br'
+    return gzip.compress(body, compresslevel=COMPRESSION_CONFIG['gzip_level']), 'gzip'
+
+
+def cached_response_headers(etag, encoding, cache_status):
+    """查询结果的响应头：ETag、压缩方式和缓存状态"""
+    headers = {
+        'X-Cache': cache_status,
+        'Vary': 'Accept-Encoding',
+        'Cache-Control': 'no-cache'
+    }
+    if etag:
+        headers['ETag'] = encoded_etag(etag, encoding)
+    if encoding:
+        headers['Content-Encoding'] = encoding
+    return headers
+
+
+# ==================== 监控指标 ====================
+
+def format_labels(names, values):
+    """Prometheus 标签：{name="value",...}"""
+    if not names:
+        return ''
+    pairs = []
+    for name, value in zip(names, values):
+        value = str(value).replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n')
+        pairs.append(f'{name}="{value}"')
+    return '{' + ','.join(pairs) + '}'
+
+
+def format_value(value):
+    """整数原样输出，浮点数用 repr 保留精度"""
+    if isinstance(value, float):
+        return repr(value) if value != int(value) else str(int(value))
+    return str(value)
+
+
+class Counter:
+    """计数器（只增不减），按标签分别计数"""
+
+    def __init__(self, name, documentation, labelnames=()):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = labelnames
+        self._values = {}
+        self._lock = threading.Lock()
+
+    def inc(self, labels=(), amount=1):
+        with self._lock:
+            self._values[labels] = self._values.get(labels, 0) + amount
+
+    def render(self):
+        with self._lock:
+            items = sorted(self._values.items())
+        lines = [f"# HELP {self.name} {self.documentation}", f"# TYPE {self.name} counter"]
+        for labels, value in items:
+            lines.append(f"{self.name}{format_labels(self.labelnames, labels)} {format_value(value)}")
+        return lines
+
+
+class Histogram:
+    """直方图：按标签记录每个分桶的次数、总和与总次数（输出时累加为 Prometheus 的 le 分桶）"""
+
+    def __init__(self, name, documentation, labelnames=(), buckets=METRICS_CONFIG['latency_buckets']):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = labelnames
+        self.buckets = tuple(buckets)
+        self._values = {}  # labels -> [各分桶次数（最后一个为 +Inf）, 总和, 总次数]
+        self._lock = threading.Lock()
+
+    def observe(self, labels, value):
+        index = bisect.bisect_left(self.buckets, value)
+        with self._lock:
+            entry = self._values.get(labels)
+            if entry is None:
+                entry = self._values[labels] = [[0] * (len(self.buckets) + 1), 0.0, 0]
+            entry[0][index] += 1
+            entry[1] += value
+            entry[2] += 1
+
+    def render(self):
+        with self._lock:
+            items = sorted((labels, (list(counts), total, count))
+                           for labels, (counts, total, count) in self._values.items())
+        lines = [f"# HELP {self.name} {self.documentation}", f"# TYPE {self.name} histogram"]
+        names = self.labelnames + ('le',)
+        for labels, (counts, total, count) in items:
+            cumulative = 0
+            for bound, bucket_count in zip(self.buckets + ('+Inf',), counts):
+                cumulative += bucket_count
+                le = bound if bound == '+Inf' else format_value(float(bound))
+                lines.append(f"{self.name}_bucket{format_labels(names, labels + (le,))} {cumulative}")
+            lines.append(f"{self.name}_sum{format_labels(self.labelnames, labels)} {format_value(total)}")
+            lines.append(f"{self.name}_count{format_labels(self.labelnames, labels)} {count}")
+        return lines
+
+
+def stats_metrics(prefix, documentation, stats, counter_keys):
+    """把各组件的 stats() 字典转换为指标：counter_keys 中的为计数器（加 _total 后缀），其余数值为 gauge"""
+    lines = []
+    for key, value in stats.items():
+        if isinstance(value, bool) or not isinstance(value, (int, float)):
+            continue
+        kind = 'counter' if key in counter_keys else 'gauge'
+        name = f"{prefix}_{key}_total" if kind == 'counter' else f"{prefix}_{key}"
+        lines.append(f"# HELP {name} {documentation} {key}")
+        lines.append(f"# TYPE {name} {kind}")
+        lines.append(f"{name} {format_value(value)}")
+    return lines
+
+
+http_requests = Counter('dbviewer_http_requests_total', 'HTTP 请求数', ('endpoint', 'method', 'status'))
+http_latency = Histogram('dbviewer_http_request_duration_seconds',
+                         'HTTP 请求耗时（流式响应只计到响应头发出）', ('endpoint',))
+query_latency = Histogram('dbviewer_query_duration_seconds',
+                          '/api/query 各阶段耗时：db 为执行查询并读取结果，serialize 为转换、序列化和压缩，'
+                          'total 为整个查询（流式查询到数据发送完）', ('table', 'stage'))
+query_responses = Counter('dbviewer_query_responses_total',
+                          '/api/query 响应数，cache 为 hit / redis / miss / shared / not_modified / stream',
+                          ('table', 'cache'))
+rows_returned = Counter('dbviewer_rows_returned_total', '/api/query 返回的行数（含缓存命中）', ('table',))
+rows_exported = Counter('dbviewer_rows_exported_total', '/api/export 导出的行数', ('table', 'format'))
+
+METRICS = [http_requests, http_latency, query_latency, query_responses, rows_returned, rows_exported]
+
+
+def observe_query(table, cache_status, start_time, rows=0):
+    """记录一次 /api/query 的总耗时、响应类型和行数"""
+    query_latency.observe((table, 'total'), time.time() - start_time)
+    query_responses.inc((table, cache_status))
+    if rows:
+        rows_returned.inc((table,), rows)
+
+
+# stats() 中累计的计数（其余为当前值）
+POOL_COUNTER_KEYS = {'created', 'reused', 'evicted', 'ping_failures', 'discarded', 'waits', 'timeouts'}
+CACHE_COUNTER_KEYS = {'hits', 'misses', 'invalidations', 'evictions', 'skipped'}
+WATCHDOG_COUNTER_KEYS = {'timeouts', 'disconnects', 'kill_failures'}
+SHARED_CACHE_COUNTER_KEYS = {'hits', 'misses', 'writes', 'skipped', 'errors'}
+
+
+def process_rss_bytes():
+    """当前进程的常驻内存（/proc/self/statm，Linux 以外的系统返回 None）"""
+    try:
+        with open('/proc/self/statm') as f:
+            return int(f.read().split()[1]) * os.sysconf('SC_PAGE_SIZE')
+    except (OSError, ValueError, IndexError):
+        return None
+
+
+def render_metrics(pool_stats, flight_stats=None):
+    """
+    Prometheus 文本格式的全部指标
+    pool_stats / flight_stats 为当前服务的连接池和请求合并统计（同步和异步版本不同，flight_stats 默认取 query_flight）
+    """
+    lines = []
+    for metric in METRICS:
+        lines.extend(metric.render())
+    if pool_stats:
+        lines.extend(stats_metrics('dbviewer_pool', '连接池', pool_stats, POOL_COUNTER_KEYS))
+    lines.extend(stats_metrics('dbviewer_result_cache', '结果缓存', result_cache.stats(), CACHE_COUNTER_KEYS))
+    if shared_cache is not None:
+        lines.extend(stats_metrics('dbviewer_shared_cache', '共享缓存', shared_cache.stats(),
+                                   SHARED_CACHE_COUNTER_KEYS))
+    lines.extend(stats_metrics('dbviewer_query_watchdog', '查询看门狗', query_watchdog.stats(), WATCHDOG_COUNTER_KEYS))
+    lines.extend(stats_metrics('dbviewer_slow_queries', '慢查询', slow_query_log.stats(), {'recorded'}))
+    lines.extend(stats_metrics('dbviewer_query_flight', '请求合并', flight_stats or query_flight.stats(),
+                               FLIGHT_COUNTER_KEYS))
+    lines.append('# HELP dbviewer_up 数据库是否已连接')
+    lines.append('# TYPE dbviewer_up gauge')
+    lines.append(f"dbviewer_up {1 if cache['connected'] else 0}")
+    rss = process_rss_bytes()
+    if rss is not None:
+        lines.append('# HELP process_resident_memory_bytes 进程常驻内存（字节）')
+        lines.append('# TYPE process_resident_memory_bytes gauge')
+        lines.append(f"process_resident_memory_bytes {rss}")
+    return '\n'.join(lines) + '\n'
+
+
+# ==================== 慢查询日志 ====================
+
+class SlowQueryLog:
+    """
+    慢查询记录：最近的记录保存在内存环形缓冲区（/api/slow-queries），
+    同时追加到按大小轮转的 JSONL 文件；EXPLAIN 在后台执行，完成后才写入文件
+    """
+
+    def __init__(self, threshold_ms, buffer_size, log_file, max_bytes, backup_count):
+        self.threshold_ms = threshold_ms
+        self.log_file = log_file
+        self.max_bytes = max_bytes
+        self.backup_count = backup_count
+
+        self._entries = deque(maxlen=buffer_size)
+        self._lock = threading.Lock()
+        self._logger = None
+        self._recorded = 0
+
+    def _get_logger(self):
+        """第一次写入时才创建日志文件"""
+        if self._logger is None:
+            logger = logging.getLogger('db_viewer.slow_queries')
+            logger.setLevel(logging.INFO)
+            logger.propagate = False
+            if not logger.handlers:
+                handler = RotatingFileHandler(self.log_file, maxBytes=self.max_bytes,
+                                              backupCount=self.backup_count, encoding='utf-8')
+                handler.setFormatter(logging.Formatter('%(message)s'))
+                logger.addHandler(handler)
+            self._logger = logger
+        return self._logger
+
+    def record(self, entry):
+        """加入环形缓冲区"""
+        with self._lock:
+            self._entries.append(entry)
+            self._recorded += 1
+        return entry
+
+    def write(self, entry):
+        """写入 JSONL 文件（一条记录一行）"""
+        if not self.log_file:
+            return
+        try:
+            self._get_logger().info(json.dumps(entry, ensure_ascii=False, default=str))
+        except OSError as e:
+            log_warning(f"慢查询日志写入失败: {e}")
+
+    def list(self, table=None, limit=None):
+        """最近的慢查询，最新的在前"""
+        with self._lock:
+            entries = list(self._entries)
+        entries.reverse()
+        if table:
+            entries = [entry for entry in entries if entry['table'] == table]
+        return entries[:limit] if limit else entries
+
+    def summary(self):
+        """按表汇总：次数、最大/平均耗时，以及 EXPLAIN 是否出现全表扫描或 filesort"""
+        tables = {}
+        for entry in self.list():
+            item = tables.setdefault(entry['table'], {
+                'count': 0, 'max_ms': 0, 'total_ms': 0, 'full_scan': False, 'uses_filesort': False
+            })
+            item['count'] += 1
+            item['max_ms'] = max(item['max_ms'], entry['elapsed_ms'])
+            item['total_ms'] += entry['elapsed_ms']
+            explain = entry.get('explain_summary') or {}
+            item['full_scan'] = item['full_scan'] or bool(explain.get('full_scan'))
+            item['uses_filesort'] = item['uses_filesort'] or bool(explain.get('uses_filesort'))
+
+        for item in tables.values():
+            item['avg_ms'] = int(item.pop('total_ms') / item['count'])
+        return tables
+
+    def stats(self):
+        with self._lock:
+            return {'recorded': self._recorded, 'buffered': len(self._entries), 'threshold_ms': self.threshold_ms}
+
+
+slow_query_log = SlowQueryLog(
+    SLOW_QUERY_CONFIG['threshold_ms'],
+    SLOW_QUERY_CONFIG['buffer_size'],
+    SLOW_QUERY_CONFIG['log_file'],
+    SLOW_QUERY_CONFIG['max_bytes'],
+    SLOW_QUERY_CONFIG['backup_count']
+)
+slow_query_executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix='slow-query-explain')
+
+
+def summarize_explain_json(doc):
+    """从 EXPLAIN FORMAT=JSON 中提取每个表的访问方式、使用的索引，以及是否有 filesort"""
+    tables = []
+    uses_filesort = False
+
+    def walk(node):
+        nonlocal uses_filesort
+        if isinstance(node, dict):
+            if node.get('using_filesort'):
+                uses_filesort = True
+            if 'table_name' in node and 'access_type' in node:
+                tables.append({
+                    'table': node['table_name'],
+                    'access_type': node['access_type'],
+                    'key': node.get('key'),
+                    'rows_examined_per_scan': node.get('rows_examined_per_scan', node.get('rows'))
+                })
+            for value in node.values():
+                walk(value)
+        elif isinstance(node, list):
+            for value in node:
+                walk(value)
+
+    walk(doc)
+    return {
+        'tables': tables,
+        'full_scan': any(table['access_type'] == 'ALL' for table in tables),
+        'uses_filesort': uses_filesort
+    }
+
+
+def finish_slow_query(entry, explain_doc=None, error=None):
+    """EXPLAIN 完成（或失败）后补全记录并写入日志文件"""
+    if explain_doc is not None:
+        entry['explain'] = explain_doc
+        entry['explain_summary'] = summarize_explain_json(explain_doc)
+    elif error is not None:
+        entry['explain'] = {'error': error}
+    slow_query_log.write(entry)
+
+
+def explain_slow_query(entry):
+    """后台任务：用连接池中的连接执行 EXPLAIN FORMAT=JSON"""
+    try:
+        with db_pool.connection() as connection:
+            with connection.cursor() as cursor:
+                cursor.execute(f"EXPLAIN FORMAT=JSON {entry['sql']}", entry['params'] or None)
+                row = cursor.fetchone()
+        finish_slow_query(entry, json.loads(list(row.values())[0]))
+    except Exception as e:
+        log_warning(f"慢查询 EXPLAIN 失败: {e}")
+        finish_slow_query(entry, error=str(e))
+
+
+def record_slow_query(plan, elapsed_ms, rows, kind, interrupted=None, submit=None):
+    """
+    执行时间超过阈值时记录慢查询；kind 为 query / stream
+    submit: 执行 EXPLAIN 的方式，默认交给后台线程（异步版本传入自己的实现）
+    """
+    if elapsed_ms < slow_query_log.threshold_ms:
+        return None
+
+    entry = slow_query_log.record({
+        'time': datetime.now().isoformat(timespec='seconds'),
+        'table': plan['table'],
+        'kind': kind,
+        'elapsed_ms': int(elapsed_ms),
+        'rows': rows,
+        'sql': plan['sql'],
+        'params': list(plan['params']) if plan['params'] else None,
+        'order_by': plan['order_by'],
+        'interrupted': interrupted
+    })
+    log_warning(f"慢查询: 表={plan['table']}, 耗时={int(elapsed_ms)}ms, 行数={rows}")
+
+    if not SLOW_QUERY_CONFIG['explain'] or not db_backend.supports_explain:
+        slow_query_log.write(entry)
+    elif submit is not None:
+        submit(entry)
+    else:
+        slow_query_executor.submit(explain_slow_query, entry)
+    return entry
+
+
+# ==================== 行数统计 ====================
+
+# 精确行数：table -> (count, 计算完成时间)
+exact_counts = {}
+# 正在后台计算精确行数的表
+pending_counts = set()
+counts_lock = threading.Lock()
+count_executor = ThreadPoolExecutor(max_workers=COUNT_CONFIG['workers'], thread_name_prefix='exact-count')
+
+
+def get_estimated_row_count(table):
+    """估算行数（MySQL 读取 information_schema.TABLES 的 InnoDB 统计信息，不扫描表）"""
+    with db_pool.connection() as connection:
+        with connection.cursor() as cursor:
+            return db_backend.estimated_row_count(cursor, table)
+
+
+def record_exact_row_count(table, count, start_time):
+    """保存精确行数"""
+    with counts_lock:
+        exact_counts[table] = (count, time.time())
+    log_success(f"表 '{table}' 精确行数: {count}, 耗时 {int((time.time() - start_time) * 1000)}ms")
+
+
+def finish_exact_row_count(table):
+    """精确行数计算结束（成功或失败）"""
+    with counts_lock:
+        pending_counts.discard(table)
+
+
+def compute_exact_row_count(table):
+    """后台线程：执行 COUNT(*) 并缓存结果"""
+    start_time = time.time()
+    try:
+        with db_pool.connection() as connection:
+            with connection.cursor() as cursor:
+                count = db_backend.count_rows(cursor, table)
+        record_exact_row_count(table, count, start_time)
+    except Exception as e:
+        log_error(f"表 '{table}' 精确行数计算失败: {e}")
+    finally:
+        finish_exact_row_count(table)
+
+
+def get_exact_row_count(table, schedule=False, submit=None):
+    """
+    获取缓存的精确行数，返回 (count, 状态)
+    状态: ready 已缓存 / pending 正在计算 / none 未计算
+    schedule=True 且没有可用结果时提交后台计算，不等待结果
+    submit(table) 用于替换默认的线程池提交方式（异步版本使用）
+    """
+    with counts_lock:
+        cached = exact_counts.get(table)
+        if cached and time.time() - cached[1] < COUNT_CONFIG['exact_ttl']:
+            return cached[0], 'ready'
+
+        if table in pending_counts:
+            return None, 'pending'
+
+        if not schedule:
+            return None, 'none'
+
+        pending_counts.add(table)
+
+    if submit is not None:
+        submit(table)
+    else:
+        count_executor.submit(compute_exact_row_count, table)
+    return None, 'pending'
+
+
+# ==================== 数据库初始化 ====================
+
+def get_order_by_column(table_name, table_schema):
+    """
+    智能获取排序字段（优先选择有索引的字段，避免 ORDER BY ... DESC LIMIT n 变成全表 filesort）
+    1. 主键的第一列
+    2. 有索引（作为索引第一列）的 id / create_at / update_at / create_time ... 字段
+    3. 其他索引的第一列（唯一索引优先）
+    4. 都没有索引时按名称选择：id, create_at, update_at, create_time ...，否则第一个字段
+    排序字段不唯一时追加主键作为第二排序字段，保证翻页顺序稳定
+    返回 (order_by, plan)，plan 描述选择结果
+    """
+    columns = table_schema['columns']
+    indexes = table_schema.get('indexes', {})
+    primary_key = table_schema.get('primary_key', [])
+
+    # 优先级顺序查找排序字段
+    priority_fields = ['id', 'create_at', 'update_at', 'create_time', 'update_time', 'created_at', 'updated_at']
+
+    # 每个列作为第一列的索引（唯一索引排在前面）
+    leading = {}
+    for index_name, index in sorted(indexes.items(), key=lambda item: not item[1]['unique']):
+        leading.setdefault(index['columns'][0], (index_name, index))
+
+    column, index_name, reason = None, None, None
+    if primary_key:
+        column, index_name, reason = primary_key[0], 'PRIMARY', '主键'
+    else:
+        for field in priority_fields:
+            if field in leading:
+                column, index_name, reason = field, leading[field][0], '有索引的常用排序字段'
+                break
+        else:
+            for field in columns:
+                if field in leading:
+                    column, index_name, reason = field, leading[field][0], '索引第一列'
+                    break
+
+    if column is None:
+        for field in priority_fields:
+            if field in columns:
+                column, reason = field, '常用排序字段（无索引）'
+                break
+        else:
+            if columns:
+                # 如果都没有，使用第一个字段倒序
+                column, reason = columns[0], '第一个字段（无索引）'
+
+    if column is None:
+        log_warning(f"表 '{table_name}' 没有可用的排序字段")
+        return None, None
+
+    index = indexes.get(index_name) or {}
+    unique = bool(index.get('unique')) and len(index['columns']) == 1
+    order_by = f"`{column}` DESC"
+
+    # 排序字段不唯一时追加主键，InnoDB 二级索引本身包含主键，不会额外 filesort
+    tiebreaker = None
+    if not unique and len(primary_key) == 1 and primary_key[0] != column:
+        tiebreaker = primary_key[0]
+        order_by += f", `{tiebreaker}` DESC"
+
+    if index_name is None:
+        log_warning(f"表 '{table_name}' 的排序字段 '{column}' 没有索引，查询会使用 filesort")
+
+    return order_by, {
+        'column': column,
+        'index': index_name,
+        'indexed': index_name is not None,
+        'unique': unique,
+        'tiebreaker': tiebreaker,
+        'reason': reason
+    }
+
+
+def build_schema(table_names, column_rows, index_rows):
+    """
+    把 information_schema 的查询结果按表分组
+    返回 {table: {'columns', 'column_types', 'primary_key', 'indexes'}}
+    """
+    schema = {table: {
+        'columns': [],
+        'column_types': {},
+        'primary_key': [],
+        'indexes': {}
+    } for table in table_names}
+
+    for row in column_rows:
+        table_schema = schema.get(row['table_name'])
+        if table_schema is None:
+            continue
+        table_schema['columns'].append(row['column_name'])
+        table_schema['column_types'][row['column_name']] = row['data_type'].lower()
+
+    for row in index_rows:
+        table_schema = schema.get(row['table_name'])
+        if table_schema is None:
+            continue
+        index = table_schema['indexes'].setdefault(row['index_name'], {
+            'columns': [],
+            'unique': not int(row['non_unique'])
+        })
+        index['columns'].append(row['column_name'])
+        if row['index_name'] == 'PRIMARY':
+            table_schema['primary_key'].append(row['column_name'])
+
+    return schema
+
+
+def load_schema(cursor, table_names):
+    """
+    一次性加载所有表的列、类型、主键和索引信息
+    MySQL 只查询 information_schema.COLUMNS 和 information_schema.STATISTICS 两次，
+    与表的数量无关（原来每个表要 DESCRIBE 两次）
+    """
+    return build_schema(table_names, *db_backend.schema_rows(cursor, table_names))
+
+
+def register_schema(schema):
+    """选择每个表的排序字段，写入 cache['table_columns']"""
+    for table, table_schema in schema.items():
+        columns = table_schema['columns']
+        if not columns:
+            log_error(f"表 '{table}' 列信息加载失败: 未找到列")
+            continue
+
+        # 获取排序字段
+        order_by, order_plan = get_order_by_column(table, table_schema)
+
+        cache['table_columns'][table] = dict(
+            table_schema,
+            order_by=order_by,
+            order_column=order_plan['column'] if order_plan else None,
+            order_plan=order_plan
+        )
+
+
+def init_database():
+    """初始化数据库连接和缓存"""
+    connection = None
+    try:
+        log_info("正在连接数据库...")
+        for line in db_backend.describe():
+            log_info(line)
+
+        # 从连接池获取连接（同时预热连接池）
+        connection = db_pool.acquire()
+        log_success("数据库连接成功！")
+
+        # 创建游标
+        cursor = connection.cursor()
+
+        # 其他 worker 进程已加载过的表结构直接从共享缓存读取
+        start_time = time.time()
+        shared_schema = shared_cache.get_schema() if shared_cache is not None else None
+        if shared_schema is not None:
+            table_names, schema = shared_schema
+            log_success("表结构来自共享缓存")
+        else:
+            # 获取所有表
+            table_names = db_backend.list_tables(cursor)
+            schema = None
+
+        cache['tables'] = table_names
+
+        log_success(f"找到 {len(cache['tables'])} 个表: {', '.join(cache['tables'])}")
+
+        # 一次性加载所有表的列信息（不预加载数据，改为实时查询）
+        if schema is None:
+            schema = load_schema(cursor, table_names)
+            if shared_cache is not None:
+                shared_cache.put_schema(table_names, schema)
+        register_schema(schema)
+
+        log_success(f"{len(cache['table_columns'])} 个表的列信息已加载，"
+                    f"耗时 {int((time.time() - start_time) * 1000)}ms")
+
+        cursor.close()
+        cache['connected'] = True
+        log_success("数据库初始化完成")
+
+    except Error as e:
+        error_msg = f"数据库连接失败: {e}"
+        log_error(error_msg)
+        cache['connected'] = False
+        cache['error_message'] = str(e)
+    except Exception as e:
+        error_msg = f"初始化失败: {e}"
+        log_error(error_msg)
+        cache['connected'] = False
+        cache['error_message'] = str(e)
+    finally:
+        if connection:
+            db_pool.release(connection)
+
+
+def build_default_query_sql(table, table_info, limit=1000):
+    """默认查询：ORDER BY 排序字段 DESC LIMIT n"""
+    order_by = table_info.get('order_by')
+    return f"SELECT * FROM `{table}`" + (f" ORDER BY {order_by}" if order_by else "") + f" LIMIT {limit}"
+
+
+def explain_default_query(table, table_info, limit=1000):
+    """对默认查询执行 EXPLAIN，返回摘要"""
+    sql = build_default_query_sql(table, table_info, limit)
+
+    with db_pool.connection() as connection:
+        with connection.cursor() as cursor:
+            cursor.execute(f"EXPLAIN {sql}")
+            rows = cursor.fetchall()
+
+    return summarize_explain(sql, rows)
+
+
+def summarize_explain(sql, rows):
+    """提取 EXPLAIN 结果中的关键字段"""
+    plan = [{
+        'table': row.get('table'),
+        'type': row.get('type'),
+        'key': row.get('key'),
+        'rows': row.get('rows'),
+        'extra': row.get('Extra')
+    } for row in rows]
+
+    return {
+        'sql': sql,
+        'plan': plan,
+        'uses_filesort': any('filesort' in (row['extra'] or '') for row in plan)
+    }
+
+
+# ==================== 查询条件 ====================
+
+# 支持的过滤操作符 -> SQL 模板
+FILTER_OPERATORS = {
+    'eq': '= %s',
+    'ne': '<> %s',
+    'lt': '< %s',
+    'lte': '<= %s',
+    'gt': '> %s',
+    'gte': '>= %s',
+    'between': 'BETWEEN %s AND %s',
+    'prefix': 'LIKE %s ESCAPE %s',  # 转义字符也走参数绑定，与 NO_BACKSLASH_ESCAPES 和 SQLite 无关
+    'in': 'IN ({placeholders})',
+    'is_null': 'IS NULL',
+    'not_null': 'IS NOT NULL'
+}
+
+MAX_FILTERS = 20
+MAX_IN_VALUES = 1000
+
+
+def is_truthy(value):
+    """查询字符串里的开关参数：1 / true / yes"""
+    return (value or '').lower() in ('1', 'true', 'yes')
+
+
+def is_scalar(value):
+    """过滤值只允许字符串、数字、布尔"""
+    return isinstance(value, (str, int, float, bool))
+
+
+def parse_projection(table_info, requested):
+    """
+    校验列投影，返回实际要查询的列
+    排序字段和第二排序字段始终包含在内（翻页游标需要）
+    """
+    if requested is None:
+        return list(table_info['columns'])
+
+    if not isinstance(requested, list) or not requested:
+        raise ValueError('columns 必须是非空的列名数组')
+
+    known = set(table_info['columns'])
+    selected = []
+    for column in requested:
+        if not isinstance(column, str) or column not in known:
+            raise ValueError(f'列 {column} 不存在')
+        if column not in selected:
+            selected.append(column)
+
+    # 排序字段和第二排序字段用于生成分页游标，总是查询
+    for column in (table_info.get('order_column'), order_tiebreaker(table_info)):
+        if column and column not in selected:
+            selected.append(column)
+    return selected
+
+
+def compile_filters(table_info, filters):
+    """
+    把过滤条件编译成参数化的 WHERE 子句
+    filters: [{"column": "device_id", "op": "eq", "value": "abc"}, ...]，多个条件之间为 AND
+    返回 (条件列表, 参数列表)；列名只能来自缓存的表结构，值全部走参数绑定
+    """
+    if not filters:
+        return [], []
+
+    if not isinstance(filters, list) or len(filters) > MAX_FILTERS:
+        raise ValueError(f'filters 必须是数组，且不超过 {MAX_FILTERS} 个条件')
+
+    known = set(table_info['columns'])
+    clauses = []
+    params = []
+
+    for item in filters:
+        if not isinstance(item, dict):
+            raise ValueError('过滤条件格式错误')
+
+        column = item.get('column')
+        op = item.get('op', 'eq')
+        value = item.get('value')
+
+        # 列名和操作符要先确认是字符串，列表 / 字典不能做集合和字典查找（unhashable）
+        if not isinstance(column, str):
+            raise ValueError('过滤条件的 column 必须是字符串')
+        if not isinstance(op, str):
+            raise ValueError('过滤条件的 op 必须是字符串')
+        if column not in known:
+            raise ValueError(f'列 {column} 不存在')
+        if op not in FILTER_OPERATORS:
+            raise ValueError(f'不支持的操作符 {op}，可选: {", ".join(FILTER_OPERATORS)}')
+
+        template = FILTER_OPERATORS[op]
+
+        if op in ('is_null', 'not_null'):
+            pass
+        elif op == 'between':
+            if not isinstance(value, list) or len(value) != 2 or not all(is_scalar(v) for v in value):
+                raise ValueError(f'列 {column} 的 between 条件需要 [最小值, 最大值]')
+            params.extend(value)
+        elif op == 'in':
+            if not isinstance(value, list) or not value or len(value) > MAX_IN_VALUES \
+                    or not all(is_scalar(v) for v in value):
+                raise ValueError(f'列 {column} 的 in 条件需要 1-{MAX_IN_VALUES} 个值')
+            template = template.format(placeholders=', '.join(['%s'] * len(value)))
+            params.extend(value)
+        elif op == 'prefix':
+            if not isinstance(value, str) or not value:
+                raise ValueError(f'列 {column} 的 prefix 条件需要非空字符串')
+            # 转义 LIKE 通配符，只做前缀匹配（可以使用索引）
+            escaped = value.replace('\\', '\\\\').replace('%', '\\%').replace('_', '\\_')
+            params.extend([escaped + '%', '\\'])
+        else:
+            if not is_scalar(value):
+                raise ValueError(f'列 {column} 的 {op} 条件需要一个值')
+            params.append(value)
+
+        clauses.append(f"`{column}` {template}")
+
+    return clauses, params
+
+
+def build_select_sql(table, select_columns, clauses, order_by, limit, max_execution_ms=None):
+    """
+    拼接 SELECT 语句（列名和表名都已校验，值通过参数绑定）
+    max_execution_ms: MySQL 加上 MAX_EXECUTION_TIME 提示（5.7.8+），超时由服务端终止
+    """
+    return db_backend.select_sql(table, select_columns, clauses, order_by, limit, max_execution_ms)
+
+
+# ==================== 分页游标 ====================
+
+# 游标中跳过数的上限：查询会多取 skip 行，防止伪造的游标让一次查询读取任意多行
+CURSOR_MAX_SKIP = 100000
+
+
+def order_tiebreaker(table_info):
+    """排序字段不唯一时追加的第二排序字段（单列主键），没有则返回 None"""
+    return (table_info.get('order_plan') or {}).get('tiebreaker')
+
+
+def uses_keyset(table_info):
+    """
+    排序字段唯一或有第二排序字段时使用严格的 keyset 分页：
+        排序字段唯一:     WHERE 排序字段 < 上一页最后的值
+        有第二排序字段:   WHERE (排序字段, 主键) < (上一页最后的值, 主键值)
+    否则回退为 WHERE 排序字段 <= 最后的值 并跳过已返回的同值行
+    """
+    plan = table_info.get('order_plan') or {}
+    return bool(plan.get('unique') or plan.get('tiebreaker'))
+
+
+def encode_cursor_value(value):
+    """游标中的值：二进制用 hex，日期和 DECIMAL 用字符串"""
+    if isinstance(value, (bytes, bytearray)):
+        return {'hex': value.hex()}
+    if isinstance(value, (datetime, date, Decimal)):
+        return str(value)
+    return value
+
+
+def decode_cursor_value(value):
+    if isinstance(value, dict):
+        return bytes.fromhex(value['hex'])
+    return value
+
+
+def encode_cursor(table, column, value, skip, tiebreaker_value=None):
+    """
+    生成分页游标（base64 编码的 JSON，对前端不透明）
+    value: 本页最后一行排序字段的原始值
+    skip: 已返回的、排序字段等于 value 的行数（keyset 分页时为 0，只在回退方式中用来跳过重复值）
+    tiebreaker_value: 本页最后一行第二排序字段的值（有第二排序字段时）
+    """
+    payload = {'t': table, 'c': column, 'v': encode_cursor_value(value), 'k': skip}
+    if tiebreaker_value is not None:
+        payload['i'] = encode_cursor_value(tiebreaker_value)
+    payload = json.dumps(payload, separators=(',', ':'))
+    return base64.urlsafe_b64encode(payload.encode('utf-8')).decode('ascii')
+
+
+def decode_cursor(token, table, column):
+    """解析分页游标，返回 (value, skip, tiebreaker_value)；游标无效或不属于该表时抛出 ValueError"""
+    try:
+        payload = json.loads(base64.urlsafe_b64decode(token.encode('ascii')).decode('utf-8'))
+        value = decode_cursor_value(payload['v'])
+        skip = int(payload['k'])
+        tiebreaker_value = decode_cursor_value(payload.get('i'))
+    except Exception:
+        raise ValueError('无效的分页游标')
+
+    if payload.get('t') != table or payload.get('c') != column or skip < 0:
+        raise ValueError('分页游标与当前表不匹配')
+    if skip > CURSOR_MAX_SKIP:
+        raise ValueError(f'分页游标的跳过行数超过上限 {CURSOR_MAX_SKIP}')
+    return value, skip, tiebreaker_value
+
+
+def cursor_clause(table_info, value, skip, tiebreaker_value):
+    """
+    游标对应的 WHERE 条件，返回 (条件, 参数)
+    keyset 游标的 skip 为 0；回退方式的游标 skip 至少为 1（本页末尾至少有一行等于最后的值）
+    """
+    order_column = table_info['order_column']
+    tiebreaker = order_tiebreaker(table_info)
+
+    if skip or not uses_keyset(table_info):
+        if tiebreaker_value is not None:
+            raise ValueError('分页游标与当前表不匹配')
+        return f"`{order_column}` <= %s", [value]
+
+    if tiebreaker is None:
+        if tiebreaker_value is not None:
+            raise ValueError('分页游标与当前表不匹配')
+        return f"`{order_column}` < %s", [value]
+
+    if tiebreaker_value is None:
+        raise ValueError('分页游标与当前表不匹配')
+    # 前一个条件让只认识单列范围的优化器（MySQL 5.7）也能走排序字段的索引
+    return (f"`{order_column}` <= %s AND (`{order_column}`, `{tiebreaker}`) < (%s, %s)",
+            [value, value, tiebreaker_value])
+
+
+def next_cursor_from_tail(plan, last_value, last_tiebreaker, tail, page_size):
+    """
+    根据本页最后一行生成下一页游标
+    last_tiebreaker: 最后一行第二排序字段的值
+    tail: 本页末尾与 last_value 相同的行数（回退方式使用）
+    page_size: 本页实际返回行数
+    """
+    if last_value is None:
+        # NULL 无法参与 < 比较，倒序时 NULL 排在最后，已无法继续翻页
+        return None
+
+    if plan['keyset']:
+        return encode_cursor(plan['table'], plan['order_column'], last_value, 0,
+                             last_tiebreaker if plan['tiebreaker'] else None)
+
+    skip = tail
+    # 整页都是同一个值并且与上一页游标相同，需要累加跳过数
+    prev_value = plan['cursor_value']
+    if tail == page_size and prev_value is not None and str(last_value) == str(prev_value):
+        skip += plan['cursor_skip']
+
+    return encode_cursor(plan['table'], plan['order_column'], last_value, skip)
+
+
+def build_next_cursor(plan, rows):
+    """根据本页数据生成下一页游标，rows 为未转换的原始行"""
+    column = plan['order_column']
+    last_value = rows[-1][column]
+    last_tiebreaker = rows[-1][plan['tiebreaker']] if plan['tiebreaker'] else None
+
+    # 统计本页末尾与最后一个值相同的行数
+    tail = 0
+    for row in reversed(rows):
+        if row[column] != last_value:
+            break
+        tail += 1
+
+    return next_cursor_from_tail(plan, last_value, last_tiebreaker, tail, len(rows))
+
+
+# ==================== 数据转换 ====================
+
+def convert_datetime(value):
+    """datetime / date -> ISO 字符串（'0000-00-00' 这类非法日期 pymysql 返回原字符串）"""
+    return value if isinstance(value, str) else value.isoformat()
+
+
+def convert_timedelta(value):
+    """TIME 列（pymysql 返回 timedelta）-> 'HH:MM:SS[.ffffff]'，支持负数和超过 24 小时"""
+    if isinstance(value, str):
+        return value
+    total = value.days * 86400 + value.seconds
+    sign = '-' if total < 0 else ''
+    total = abs(total)
+    text = f"{sign}{total // 3600:02d}:{total % 3600 // 60:02d}:{total % 60:02d}"
+    if value.microseconds:
+        text += f".{value.microseconds:06d}"
+    return text
+
+
+def convert_decimal(value):
+    """DECIMAL -> 字符串，保留精度"""
+    return str(value)
+
+
+def convert_binary(value):
+    """二进制数据 -> 十六进制字符串；BLOB/TEXT 共用类型码，文本列原样返回"""
+    if isinstance(value, (bytes, bytearray)):
+        return value.hex() if value else None
+    return value
+
+
+def convert_bit(value):
+    """BIT 列 -> 整数"""
+    if isinstance(value, (bytes, bytearray)):
+        return int.from_bytes(value, 'big')
+    return value
+
+
+# MySQL 字段类型码 -> 转换函数；不在表中的类型（整数、浮点、字符串）原样输出
+COLUMN_CONVERTERS = {
+    FIELD_TYPE.DATETIME: convert_datetime,
+    FIELD_TYPE.TIMESTAMP: convert_datetime,
+    FIELD_TYPE.DATE: convert_datetime,
+    FIELD_TYPE.NEWDATE: convert_datetime,
+    FIELD_TYPE.TIME: convert_timedelta,
+    FIELD_TYPE.DECIMAL: convert_decimal,
+    FIELD_TYPE.NEWDECIMAL: convert_decimal,
+    FIELD_TYPE.BIT: convert_bit,
+    FIELD_TYPE.TINY_BLOB: convert_binary,
+    FIELD_TYPE.MEDIUM_BLOB: convert_binary,
+    FIELD_TYPE.LONG_BLOB: convert_binary,
+    FIELD_TYPE.BLOB: convert_binary,
+    FIELD_TYPE.STRING: convert_binary,
+    FIELD_TYPE.VAR_STRING: convert_binary,
+    FIELD_TYPE.VARCHAR: convert_binary,
+    FIELD_TYPE.GEOMETRY: convert_binary
+}
+
+
+# 字符串和 BLOB 共用的类型码，只有二进制字符集（63）的列才需要转换
+BINARY_CAPABLE_TYPES = {
+    FIELD_TYPE.TINY_BLOB, FIELD_TYPE.MEDIUM_BLOB, FIELD_TYPE.LONG_BLOB, FIELD_TYPE.BLOB,
+    FIELD_TYPE.STRING, FIELD_TYPE.VAR_STRING, FIELD_TYPE.VARCHAR
+}
+BINARY_CHARSET = 63
+
+
+def build_converters(cursor):
+    """
+    根据 cursor.description 的类型码，每次查询生成一次转换表
+    只返回需要转换的列 [(列序号, 列名, 转换函数)]，其余列不做任何检查
+    pymysql 的字段信息里带字符集时，文本列（非 binary 字符集）也跳过
+    """
+    result = getattr(cursor, '_result', None)
+    fields = getattr(result, 'fields', None)
+
+    converters = []
+    for index, field in enumerate(cursor.description or ()):
+        converter = COLUMN_CONVERTERS.get(field[1])
+        if converter is None:
+            continue
+        if field[1] in BINARY_CAPABLE_TYPES and fields and index < len(fields) \
+                and getattr(fields[index], 'charsetnr', BINARY_CHARSET) != BINARY_CHARSET:
+            continue
+        converters.append((index, field[0], converter))
+    return converters
+
+
+def convert_rows(rows, columns, converters):
+    """
+    把行数据转换为可 JSON 序列化的字典列表
+    DictCursor 返回的字典直接原地修改，只处理需要转换的列
+    """
+    if rows and not isinstance(rows[0], dict):
+        # 普通游标需要转换
+        rows = [dict(zip(columns, row)) for row in rows]
+
+    for row in rows:
+        for _, name, converter in converters:
+            value = row[name]
+            if value is not None:
+                row[name] = converter(value)
+    return rows
+
+
+def convert_columnar(rows, columns, converters):
+    """
+    转换为列式结构：每列一个数组，列名只出现一次
+    宽表时可以省掉每行重复的列名，JSON 体积和编解码耗时都明显下降
+    """
+    if rows and not isinstance(rows[0], dict):
+        data = [[row[i] for row in rows] for i in range(len(columns))]
+    else:
+        data = [[row[col] for row in rows] for col in columns]
+
+    positions = {col: i for i, col in enumerate(columns)}
+    for _, name, converter in converters:
+        values = data[positions[name]]
+        data[positions[name]] = [converter(value) if value is not None else None for value in values]
+    return data
+
+
+def dumps_json(obj):
+    """序列化响应体（bytes）；安装了 orjson 时使用 orjson，否则使用 Flask 的 JSON"""
+    if orjson is not None:
+        return orjson.dumps(obj, default=str)
+    return app.json.dumps(obj).encode('utf-8')
+
+
+def ndjson_line(obj):
+    """序列化为一行 NDJSON"""
+    return dumps_json(obj) + b'\n'
+
+
+class StreamPager:
+    """
+    流式输出时逐行处理分页（Flask 和异步版本共用）
+    跳过上一页已经返回过的同值行，记录末尾同值行数，读到第 limit + 1 行时停止并生成下一页游标
+    """
+
+    SKIP, EMIT, STOP = 'skip', 'emit', 'stop'
+
+    def __init__(self, plan):
+        self.plan = plan
+        self.returned = 0
+        self.has_more = False
+        self._skipping = plan['cursor_skip'] > 0
+        self._skipped = 0
+        self._last_value = None
+        self._last_tiebreaker = None
+        self._tail = 0
+
+    def accept(self, row):
+        """返回 SKIP（丢弃该行）、EMIT（输出该行）或 STOP（已满一页）"""
+        plan = self.plan
+        order_column = plan['order_column']
+
+        # 跳过上一页已经返回过的同值行
+        if self._skipping:
+            if self._skipped < plan['cursor_skip'] and str(row[order_column]) == str(plan['cursor_value']):
+                self._skipped += 1
+                return self.SKIP
+            self._skipping = False
+
+        if self.returned >= plan['limit']:
+            self.has_more = True
+            return self.STOP
+
+        if order_column:
+            value = row[order_column]
+            self._tail = self._tail + 1 if self.returned and value == self._last_value else 1
+            self._last_value = value
+            if plan['tiebreaker']:
+                self._last_tiebreaker = row[plan['tiebreaker']]
+
+        self.returned += 1
+        return self.EMIT
+
+    def end_message(self, start_time):
+        """最后一行 {"type": "end"}"""
+        plan = self.plan
+        next_cursor = None
+        if self.has_more and plan['order_column']:
+            next_cursor = next_cursor_from_tail(plan, self._last_value, self._last_tiebreaker,
+                                                self._tail, self.returned)
+
+        query_time = int((time.time() - start_time) * 1000)
+        log_success(f"流式查询成功: 表={plan['table']}, 返回行数={self.returned}, 耗时={query_time}ms")
+
+        return {
+            'type': 'end',
+            'returned': self.returned,
+            'requested': plan['limit'],
+            'has_more': next_cursor is not None,
+            'next_cursor': next_cursor,
+            'query_time': query_time
+        }
+
+
+def stream_query(connection, plan, start_time):
+    """
+    流式查询：使用无缓冲的服务端游标（SSDictCursor），逐行输出 NDJSON
+    第一行 {"type": "meta"}，之后每行 {"type": "row"}，最后一行 {"type": "end"}
+    服务端内存只与单行大小有关，与查询行数无关
+    查询在返回响应前执行，SQL 错误仍以普通 JSON 错误返回
+    """
+    table, columns, limit = plan['table'], plan['columns'], plan['limit']
+
+    try:
+        cursor = connection.cursor(pymysql.cursors.SSDictCursor)
+        # 看门狗只监控执行阶段（拿到第一批数据之前），之后的读取速度取决于客户端
+        with query_watchdog.watch(connection, plan['timeout_ms'],
+                                  request.environ.get('werkzeug.socket')) as watch:
+            try:
+                execute_start = time.perf_counter()
+                cursor.execute(plan['sql'], plan['params'])
+                # 慢查询只计执行阶段，读取速度取决于客户端
+                execute_ms = (time.perf_counter() - execute_start) * 1000
+            except Error as e:
+                if is_query_interrupted(e, watch):
+                    db_pool.release(connection, discard=True)
+                    return interrupted_response(e, watch, plan, start_time)
+                raise
+    except Exception:
+        db_pool.release(connection, discard=True)
+        raise
+
+    converters = build_converters(cursor)
+
+    def generate():
+        pager = StreamPager(plan)
+        completed = False
+        try:
+            yield ndjson_line({'type': 'meta', 'columns': columns, 'requested': limit})
+
+            for row in cursor:
+                action = pager.accept(row)
+                if action == StreamPager.SKIP:
+                    continue
+                if action == StreamPager.STOP:
+                    break
+
+                convert_rows([row], columns, converters)
+                yield ndjson_line({'type': 'row', 'data': row})
+
+            yield ndjson_line(pager.end_message(start_time))
+            completed = True
+
+        except Error as e:
+            log_error(f"流式查询失败: {e}")
+            yield ndjson_line({'type': 'error', 'error': f'数据库查询失败: {str(e)}'})
+        finally:
+            observe_query(table, 'stream', start_time, pager.returned)
+            record_slow_query(plan, execute_ms, pager.returned, 'stream')
+            if completed:
+                # 读完剩余结果后连接可以复用（执行阶段被看门狗 KILL 过的除外）
+                cursor.close()
+                db_pool.release(connection, discard=watch.killed)
+            else:
+                # 客户端断开或出错：结果集没读完，直接丢弃连接，避免把剩余行读完
+                log_warning(f"流式查询中断: 表={table}, 已输出 {pager.returned} 行")
+                db_pool.release(connection, discard=True)
+
+    return Response(stream_with_context(generate()), mimetype='application/x-ndjson',
+                    headers={'X-Accel-Buffering': 'no', 'Cache-Control': 'no-cache'})
+
+
+# ==================== 查询计划 ====================
+
+class QueryError(Exception):
+    """查询参数错误，status 为返回的 HTTP 状态码"""
+
+    def __init__(self, message, status=400):
+        super().__init__(message)
+        self.status = status
+
+
+def prepare_query(data):
+    """
+    校验 /api/query 的请求参数并生成 SQL（Flask 和异步版本共用）
+    返回查询计划 dict；参数错误时抛出 QueryError
+    """
+    if not isinstance(data, dict):
+        raise QueryError('请求体必须是 JSON 对象')
+
+    table = data.get('table')
+    limit = data.get('limit', 1000)
+    page_cursor = data.get('cursor')
+    since = data.get('since')
+    stream = bool(data.get('stream', False))
+    data_format = data.get('format', 'rows')
+    timeout_ms = data.get('timeout_ms', QUERY_TIMEOUT_CONFIG['default_ms'])
+
+    # 验证输入
+    if not table or not isinstance(table, str):
+        raise QueryError('无效的表名')
+
+    if not isinstance(limit, int) or isinstance(limit, bool) or limit < 1 or limit > 10000:
+        raise QueryError('行数必须在 1-10000 之间')
+
+    if data_format not in ('rows', 'columnar'):
+        raise QueryError('format 只支持 rows 或 columnar')
+
+    if not isinstance(timeout_ms, int) or isinstance(timeout_ms, bool) \
+            or timeout_ms < 1 or timeout_ms > QUERY_TIMEOUT_CONFIG['max_ms']:
+        raise QueryError(f"timeout_ms 必须在 1-{QUERY_TIMEOUT_CONFIG['max_ms']} 之间")
+
+    # 防止 SQL 注入 - 只允许字母、数字、下划线
+    if not all(c.isalnum() or c == '_' for c in table):
+        raise QueryError('表名包含无效字符')
+
+    # 检查表是否存在
+    if table not in cache['table_columns']:
+        raise QueryError(f'表 {table} 不存在', 404)
+
+    # 获取表的列信息和排序字段
+    table_info = cache['table_columns'][table]
+    order_by = table_info.get('order_by')
+    order_column = table_info.get('order_column')
+
+    # 列投影和过滤条件
+    try:
+        columns = parse_projection(table_info, data.get('columns'))
+        clauses, params = compile_filters(table_info, data.get('filters'))
+    except ValueError as e:
+        raise QueryError(str(e))
+
+    # 解析分页游标
+    cursor_value, cursor_skip, cursor_clauses, cursor_params = None, 0, [], []
+    if page_cursor:
+        if not order_column:
+            raise QueryError(f'表 {table} 没有排序字段，不支持分页')
+        try:
+            cursor_value, cursor_skip, tiebreaker_value = decode_cursor(page_cursor, table, order_column)
+            clause, cursor_params = cursor_clause(table_info, cursor_value, cursor_skip, tiebreaker_value)
+            cursor_clauses = [clause]
+        except ValueError as e:
+            raise QueryError(str(e))
+
+    # 增量查询：只取排序字段大于 since 的新行（客户端本地缓存之后新增的数据）
+    if since is not None:
+        if not order_column:
+            raise QueryError(f'表 {table} 没有排序字段，不支持增量查询')
+        if page_cursor:
+            raise QueryError('since 和 cursor 不能同时使用')
+        if not is_scalar(since):
+            raise QueryError('since 必须是标量值')
+        clauses = clauses + [f"`{order_column}` > %s"]
+        params = params + [since]
+
+    # 构建 SQL 查询语句
+    # 流式查询边执行边发送，执行时间包含客户端读取时间，不加 MAX_EXECUTION_TIME（由看门狗兜底）
+    filter_key = json.dumps([clauses, params], default=str)
+    max_execution_ms = None if stream else timeout_ms
+    if order_by:
+        # 有排序字段，使用倒序；多取 1 行用于判断是否还有下一页
+        fetch_limit = limit + cursor_skip + 1
+        clauses = clauses + cursor_clauses
+        params = params + cursor_params
+        sql = build_select_sql(table, columns, clauses, order_by, fetch_limit, max_execution_ms)
+    else:
+        # 没有排序字段，直接限制数量（MySQL 默认顺序）
+        sql = build_select_sql(table, columns, clauses, None, limit, max_execution_ms)
+
+    return {
+        'table': table,
+        'limit': limit,
+        'columns': columns,
+        'order_by': order_by,
+        'order_column': order_column,
+        'tiebreaker': order_tiebreaker(table_info) if order_column else None,
+        'keyset': uses_keyset(table_info),
+        'cursor_value': cursor_value,
+        'cursor_skip': cursor_skip,
+        'since': since,
+        'stream': stream,
+        'format': data_format,
+        'timeout_ms': timeout_ms,
+        'sql': sql,
+        'params': tuple(params) or None,
+        'cache_key': (table, limit, order_by, tuple(columns), filter_key, data_format, page_cursor)
+    }
+
+
+def paginate_rows(rows, plan):
+    """
+    处理查询计划多取的行，返回 (本页行, has_more, next_cursor)
+    rows 为未转换的原始行
+    """
+    order_column = plan['order_column']
+    cursor_value, cursor_skip = plan['cursor_value'], plan['cursor_skip']
+
+    # 跳过上一页已经返回过的同值行
+    if cursor_skip:
+        skipped = 0
+        while skipped < cursor_skip and skipped < len(rows) \
+                and str(rows[skipped][order_column]) == str(cursor_value):
+            skipped += 1
+        rows = rows[skipped:]
+
+    # 生成下一页游标
+    has_more = False
+    next_cursor = None
+    if order_column:
+        has_more = len(rows) > plan['limit']
+        rows = rows[:plan['limit']]
+        if has_more and rows:
+            next_cursor = build_next_cursor(plan, rows)
+            has_more = next_cursor is not None
+
+    return rows, has_more, next_cursor
+
+
+def build_query_body(plan, rows, converters, has_more, next_cursor, start_time):
+    """转换数据并序列化 /api/query 的响应体"""
+    columns = plan['columns']
+
+    # 按列类型生成的转换表，只转换日期、DECIMAL、二进制等列
+    if plan['format'] == 'columnar':
+        # 列式结构
+        data_list = convert_columnar(rows, columns, converters)
+    else:
+        # 转换为字典列表（处理日期时间对象）
+        data_list = convert_rows(rows, columns, converters)
+
+    # 计算查询耗时
+    query_time = int((time.time() - start_time) * 1000)
+
+    log_success(f"查询成功: 表={plan['table']}, 返回行数={len(rows)}, 耗时={query_time}ms")
+
+    return dumps_json({
+        'success': True,
+        'columns': columns,
+        'format': plan['format'],
+        'order_column': plan['order_column'],
+        'data': data_list,
+        'returned': len(rows),
+        'requested': plan['limit'],
+        'has_more': has_more,
+        'next_cursor': next_cursor,
+        'query_time': query_time
+    })
+
+
+class ExecutionInterrupted(Exception):
+    """查询被看门狗终止（超时或客户端断开），合并的请求通过它拿到中断原因"""
+
+    def __init__(self, error, handle):
+        super().__init__(str(error))
+        self.error = error
+        self.handle = handle
+
+
+def interrupted_by_disconnect(error):
+    """执行者的客户端断开导致的中断，与等待的请求无关，它们应该重新执行"""
+    return isinstance(error, ExecutionInterrupted) and error.handle.reason == 'disconnect'
+
+
+def execute_query(plan, start_time, client_socket):
+    """
+    执行 /api/query 的查询并序列化（不压缩），返回 (响应体, 行数)
+    看门狗在超时或 client_socket 断开时 KILL QUERY，记录慢查询后抛出 ExecutionInterrupted
+    """
+    table = plan['table']
+    connection = db_pool.acquire()
+    cursor = None
+    watch = None
+    try:
+        cursor = connection.cursor()
+        with query_watchdog.watch(connection, plan['timeout_ms'], client_socket) as watch:
+            try:
+                db_start = time.perf_counter()
+                cursor.execute(plan['sql'], plan['params'])
+                rows = cursor.fetchall()
+                db_elapsed = time.perf_counter() - db_start
+                query_latency.observe((table, 'db'), db_elapsed)
+                record_slow_query(plan, db_elapsed * 1000, len(rows), 'query')
+            except Error as e:
+                if is_query_interrupted(e, watch):
+                    record_slow_query(plan, (time.time() - start_time) * 1000, 0, 'query',
+                                      interrupted=watch.reason or 'timeout')
+                    raise ExecutionInterrupted(e, watch)
+                raise
+
+        # 跳过上一页已返回的行，生成下一页游标，转换数据
+        serialize_start = time.perf_counter()
+        rows, has_more, next_cursor = paginate_rows(rows, plan)
+        body = build_query_body(plan, rows, build_converters(cursor), has_more, next_cursor, start_time)
+        query_latency.observe((table, 'serialize'), time.perf_counter() - serialize_start)
+        return body, len(rows)
+    finally:
+        if cursor:
+            cursor.close()
+        # 归还连接池（已断开或被看门狗 KILL 过的连接会被丢弃）
+        db_pool.release(connection, discard=watch is not None and watch.killed)
+
+
+# ==================== 数据导出 ====================
+
+# format 参数 -> (Content-Type, 文件扩展名)
+EXPORT_FORMATS = {
+    'csv': ('text/csv; charset=utf-8', 'csv'),
+    'parquet': ('application/vnd.apache.parquet', 'parquet'),
+    'arrow': ('application/vnd.apache.arrow.stream', 'arrows')
+}
+
+# 导出中途可能出现的错误：数据库错误，以及值与 Arrow 类型不符（类型不匹配、BIGINT UNSIGNED 溢出 int64 等）
+EXPORT_ERRORS = (Error,) + ((pyarrow.ArrowException,) if pyarrow is not None else ())
+
+# MySQL 类型 -> Arrow 类型名；不在表中的类型（字符串、DECIMAL、TIME、JSON 等）按字符串导出
+# information_schema.COLUMNS.DATA_TYPE 不带精度，DECIMAL 用字符串保留原值
+ARROW_TYPES = {
+    'tinyint': 'int64',
+    'smallint': 'int64',
+    'mediumint': 'int64',
+    'int': 'int64',
+    'integer': 'int64',
+    'bigint': 'int64',
+    'year': 'int64',
+    'bit': 'int64',
+    'float': 'float64',
+    'double': 'float64',
+    'real': 'float64',
+    'date': 'date32',
+    'datetime': 'timestamp',
+    'timestamp': 'timestamp',
+    'binary': 'binary',
+    'varbinary': 'binary',
+    'tinyblob': 'binary',
+    'blob': 'binary',
+    'mediumblob': 'binary',
+    'longblob': 'binary'
+}
+
+# SQLite 类型亲和性 -> Arrow 类型名（NUMERIC 亲和性的 DECIMAL / DATETIME 列里整数、小数和文本都可能出现，按字符串导出）
+SQLITE_ARROW_TYPES = {
+    'integer': 'int64',
+    'real': 'float64',
+    'text': 'string',
+    'numeric': 'string',
+    'blob': 'binary'
+}
+
+
+def get_export_key(table_info):
+    """分段导出用的键：单列主键，或排序字段上的单列唯一索引；都没有时返回 None（不能分段和续传）"""
+    if len(table_info.get('primary_key', [])) == 1:
+        return table_info['primary_key'][0]
+    plan = table_info.get('order_plan') or {}
+    if plan.get('unique'):
+        return plan['column']
+    return None
+
+
+# 下载文件名只保留这些字符，其他字符（引号、空白、非 ASCII 等）会破坏 Content-Disposition 头
+FILENAME_UNSAFE_PATTERN = re.compile(r'[^A-Za-z0-9_.-]')
+
+
+def export_filename(table_name, after, extension):
+    """导出文件名：表名，从断点续传时加上 _after_<起点>"""
+    filename = table_name if after is None else f"{table_name}_after_{after}"
+    return f"{FILENAME_UNSAFE_PATTERN.sub('_', filename)}.{extension}"
+
+
+def prepare_export(table_name, args):
+    """校验 /api/export 的参数，返回导出计划；参数错误抛出 QueryError"""
+    table_info = cache['table_columns'].get(table_name)
+    if table_info is None:
+        raise QueryError(f'表 {table_name} 不存在', 404)
+
+    export_format = args.get('format', 'csv')
+    if export_format not in EXPORT_FORMATS:
+        raise QueryError(f"format 只支持 {', '.join(EXPORT_FORMATS)}")
+    if export_format != 'csv' and pyarrow is None:
+        raise QueryError(f'{export_format} 格式需要安装 pyarrow')
+
+    try:
+        chunk_rows = int(args.get('chunk', EXPORT_CONFIG['chunk_rows']))
+    except ValueError:
+        raise QueryError('chunk 必须是整数')
+    if chunk_rows < 1 or chunk_rows > EXPORT_CONFIG['max_chunk_rows']:
+        raise QueryError(f"chunk 必须在 1-{EXPORT_CONFIG['max_chunk_rows']} 之间")
+
+    requested = args.get('columns')
+    try:
+        columns = parse_projection(table_info, requested.split(',') if requested else None)
+    except ValueError as e:
+        raise QueryError(str(e))
+
+    key = get_export_key(table_info)
+    after = args.get('after')
+    until = args.get('until')
+    if key is None and (after is not None or until is not None):
+        raise QueryError(f'表 {table_name} 没有单列唯一键，不支持 after / until')
+    if key is not None and key not in columns:
+        # 客户端需要键值才能续传
+        columns.insert(0, key)
+
+    return {
+        'table': table_name,
+        'format': export_format,
+        'columns': columns,
+        'column_types': table_info.get('column_types', {}),
+        'key': key,
+        'after': after,
+        'until': until,
+        'chunk_rows': chunk_rows
+    }
+
+
+def iter_export_chunks(connection, plan):
+    """
+    按键范围分段读取，每段执行一次
+        SELECT ... WHERE key > 上一段最后的键值 [AND key <= until] ORDER BY key LIMIT chunk
+    键上有索引，每段都是索引范围扫描，与导出进度无关；通过服务端游标（SSDictCursor）读取，
+    每次只有一段数据在内存中。没有唯一键的表退化为一次全表查询，仍然按段从游标读取
+    产出 (rows, converters)
+    """
+    key = plan['key']
+    columns_sql = ', '.join(f'`{col}`' for col in plan['columns'])
+    last_key = plan['after']
+
+    while True:
+        clauses = []
+        params = []
+        if key is None:
+            sql = f"SELECT {columns_sql} FROM `{plan['table']}`"
+        else:
+            if last_key is not None:
+                clauses.append(f"`{key}` > %s")
+                params.append(last_key)
+            if plan['until'] is not None:
+                clauses.append(f"`{key}` <= %s")
+                params.append(plan['until'])
+            sql = build_select_sql(plan['table'], plan['columns'], clauses, f"`{key}` ASC", plan['chunk_rows'])
+
+        # 中途中断时不关闭游标（关闭会读完剩余结果），由调用方直接关闭连接
+        cursor = connection.cursor(pymysql.cursors.SSDictCursor)
+        cursor.execute(sql, params or None)
+        converters = build_converters(cursor)
+        fetched = 0
+        while True:
+            rows = cursor.fetchmany(plan['chunk_rows'])
+            if not rows:
+                break
+            fetched += len(rows)
+            if key is not None:
+                # 转换会原地修改行数据，先记下原始键值
+                last_key = rows[-1][key]
+            yield rows, converters
+        cursor.close()
+
+        if key is None or fetched < plan['chunk_rows']:
+            return
 
-def log_info(message: str):
-    """打印信息日志"""
-    print(f"ℹ️  {message}")
 
+def export_csv(chunks, plan):
+    """CSV：第一行为列名（续传时不输出，方便直接追加到已下载的文件），值的格式与 JSON 接口一致"""
+    columns = plan['columns']
+    if plan['after'] is None:
+        yield (','.join(columns) + '\r\n').encode('utf-8')
 
-def log_success(message: str):
-    """打印成功日志"""
-    print(f"✓ {message}")
+    for rows, converters in chunks:
+        buffer = io.StringIO()
+        writer = csv.writer(buffer)
+        convert_rows(rows, columns, converters)
+        writer.writerows([row[col] for col in columns] for row in rows)
+        yield buffer.getvalue().encode('utf-8')
 
 
-def log_error(message: str):
-    """打印错误日志"""
-    print(f"✗ {message}")
+def arrow_type_name(column_type):
+    """
+    列导出为哪种 Arrow 类型：MySQL 按声明的类型（ARROW_TYPES）
+    后端返回的值与声明的类型不一致时（SQLite）按实际存储的类型亲和性（SQLITE_ARROW_TYPES）
+    """
+    if db_backend.typed_values:
+        return ARROW_TYPES.get(column_type, 'string')
+    return SQLITE_ARROW_TYPES[sqlite_affinity(column_type)]
 
 
-def log_warning(message: str):
-    """打印警告日志"""
-    print(f"⚠️  {message}")
+def arrow_schema(plan):
+    """根据缓存的列类型生成 Arrow schema，所有段使用同一个 schema"""
+    fields = []
+    for col in plan['columns']:
+        type_name = arrow_type_name(plan['column_types'].get(col))
+        arrow_type = pyarrow.timestamp('us') if type_name == 'timestamp' else getattr(pyarrow, type_name)()
+        fields.append(pyarrow.field(col, arrow_type))
+    return pyarrow.schema(fields)
 
 
-# ==================== 数据库初始化 ====================
+def arrow_converters(converters, schema):
+    """
+    从 JSON 转换表中挑出 Arrow 需要的转换：日期时间和二进制保留原生类型，
+    '0000-00-00' 这类非法日期（pymysql 返回字符串）写为 null；其余列转换为字符串
+    """
+    result = []
+    for index, name, converter in converters:
+        arrow_type = schema.field(name).type
+        if pyarrow.types.is_binary(arrow_type):
+            continue
+        if pyarrow.types.is_timestamp(arrow_type) or pyarrow.types.is_date(arrow_type):
+            converter = lambda value: None if isinstance(value, str) else value
+        result.append((index, name, converter))
+    return result
+
+
+def storage_converters(schema):
+    """
+    后端返回的值与声明的类型不一致时（SQLite）的 Arrow 转换：
+    NUMERIC / TEXT 亲和性的列里可能混有整数和小数，统一转换为字符串；REAL 列里的整数转换为浮点数；
+    没有声明类型（BLOB 亲和性）的列里的文本和数字按 UTF-8 编码
+    """
+    result = []
+    for index, field in enumerate(schema):
+        if pyarrow.types.is_string(field.type):
+            result.append((index, field.name, str))
+        elif pyarrow.types.is_floating(field.type):
+            result.append((index, field.name, float))
+        elif pyarrow.types.is_binary(field.type):
+            result.append((index, field.name,
+                           lambda value: value if isinstance(value, bytes) else str(value).encode('utf-8')))
+    return result
+
+
+class ChunkSink:
+    """只写的文件对象：pyarrow 写入的数据暂存在内存中，每写完一段取出来发送给客户端"""
+
+    def __init__(self):
+        self._parts = []
+        self._position = 0
+        self.closed = False
+
+    def write(self, data):
+        data = bytes(data)
+        self._parts.append(data)
+        self._position += len(data)
+        return len(data)
+
+    def tell(self):
+        return self._position
+
+    def flush(self):
+        pass
+
+    def close(self):
+        self.closed = True
+
+    def take(self):
+        """取出已写入的数据"""
+        data = b''.join(self._parts)
+        self._parts = []
+        return data
+
+
+def export_arrow(chunks, plan):
+    """
+    Parquet：每段写成一个 row group，写完立即发送（文件尾的元数据在最后发送）
+    Arrow：IPC 流格式，每段一个 record batch，可以边下载边读取
+    """
+    schema = arrow_schema(plan)
+    sink = ChunkSink()
+    if plan['format'] == 'parquet':
+        writer = pyarrow.parquet.ParquetWriter(sink, schema)
+    else:
+        writer = pyarrow.ipc.new_stream(sink, schema)
+
+    extra = storage_converters(schema) if not db_backend.typed_values else []
+    for rows, converters in chunks:
+        convert_rows(rows, plan['columns'], arrow_converters(converters, schema) + extra)
+        writer.write_batch(pyarrow.RecordBatch.from_pylist(rows, schema=schema))
+        yield sink.take()
+
+    writer.close()
+    yield sink.take()
+
+
+# ==================== 实时追踪 ====================
+
+tail_clients = 0
+tail_clients_lock = threading.Lock()
+
 
-def get_order_by_column(table_name, cursor):
+def prepare_tail(table_name, args, last_event_id):
     """
-    智能获取排序字段
-    优先使用：id DESC, create_at DESC, update_at DESC, create_time DESC
+    校验 /api/tail 的参数，返回追踪计划；参数错误抛出 QueryError
+    起点优先使用 Last-Event-ID（浏览器断线重连时自动带上），其次是参数 after，都没有时从当前最大值开始
     """
+    table_info = cache['table_columns'].get(table_name)
+    if table_info is None:
+        raise QueryError(f'表 {table_name} 不存在', 404)
+
+    order_column = table_info.get('order_column')
+    if not order_column:
+        raise QueryError(f'表 {table_name} 没有可用于追踪的排序字段')
+
     try:
-        # 获取表结构
-        cursor.execute(f"DESCRIBE {table_name}")
-        columns_info = cursor.fetchall()
+        interval = float(args.get('interval', TAIL_CONFIG['default_interval']))
+    except ValueError:
+        raise QueryError('interval 必须是数字')
+    if not TAIL_CONFIG['min_interval'] <= interval <= TAIL_CONFIG['max_interval']:
+        raise QueryError(f"interval 必须在 {TAIL_CONFIG['min_interval']}-{TAIL_CONFIG['max_interval']} 秒之间")
 
-        # 提取列名
-        if isinstance(columns_info[0], dict):
-            columns = [col['Field'] for col in columns_info]
-        else:
-            columns = [col[0] for col in columns_info]
+    requested = args.get('columns')
+    try:
+        columns = parse_projection(table_info, requested.split(',') if requested else None)
+        clauses, params = compile_filters(table_info, json.loads(args['filters']) if args.get('filters') else None)
+    except ValueError as e:
+        raise QueryError(str(e))
 
-        # 优先级顺序查找排序字段
-        priority_fields = ['id', 'create_at', 'update_at', 'create_time', 'update_time', 'created_at', 'updated_at']
+    after = args.get('after') or None
+    if last_event_id:
+        try:
+            after, _, _ = decode_cursor(last_event_id, table_name, order_column)
+        except ValueError as e:
+            raise QueryError(str(e))
 
-        for field in priority_fields:
-            if field in columns:
-                return f"{field} DESC"
+    return {
+        'table': table_name,
+        'columns': columns,
+        'order_column': order_column,
+        'clauses': clauses,
+        'params': params,
+        'interval': interval,
+        'after': after
+    }
 
-        # 如果都没有，使用第一个字段倒序
-        if columns:
-            return f"{columns[0]} DESC"
 
-        return None
-    except Exception as e:
-        log_warning(f"获取排序字段失败: {e}")
-        return None
+def build_tail_sql(plan, last_seen):
+    """
+    追踪查询：WHERE 排序字段 > 上次最后的值 ORDER BY 排序字段 ASC LIMIT batch_rows，返回 (sql, 参数)
+    last_seen 为 None（开始追踪时表是空的）时不加下界，从最早的行开始推送，第一批新行不会被跳过
+    """
+    order_column = plan['order_column']
+    clauses, params = list(plan['clauses']), tuple(plan['params'])
+    if last_seen is not None:
+        clauses.append(f"`{order_column}` > %s")
+        params += (last_seen,)
+    sql = build_select_sql(plan['table'], plan['columns'], clauses, f"`{order_column}` ASC", TAIL_CONFIG['batch_rows'])
+    return sql, params
 
 
-def init_database():
-    """初始化数据库连接和缓存"""
+def fetch_tail_rows(plan, last_seen):
+    """
+    一次索引范围探测（见 build_tail_sql）
+    返回 (转换后的行, 原始的最后一个值)；排序字段不唯一时，与 last_seen 相同且晚到的行不会被推送
+    """
+    order_column = plan['order_column']
+    sql, params = build_tail_sql(plan, last_seen)
+
+    with db_pool.connection() as connection:
+        with connection.cursor() as cursor:
+            cursor.execute(sql, params)
+            rows = cursor.fetchall()
+            converters = build_converters(cursor)
+
+    if not rows:
+        return [], last_seen
+    last_value = rows[-1][order_column]
+    return convert_rows(rows, plan['columns'], converters), last_value
+
+
+def fetch_tail_start(plan):
+    """没有指定起点时从当前最大值开始（MAX 在有索引的排序字段上只读索引一端）"""
+    with db_pool.connection() as connection:
+        with connection.cursor() as cursor:
+            cursor.execute(f"SELECT MAX(`{plan['order_column']}`) AS last_seen FROM `{plan['table']}`")
+            row = cursor.fetchone()
+    return row['last_seen'] if row else None
+
+
+def sse_event(event, data, event_id=None):
+    """Server-Sent Events 的一条消息"""
+    lines = []
+    if event_id is not None:
+        lines.append(f"id: {event_id}")
+    lines.append(f"event: {event}")
+    lines.append(f"data: {dumps_json(data).decode('utf-8')}")
+    return ('\n'.join(lines) + '\n\n').encode('utf-8')
+
+
+# ==================== 列统计 ====================
+
+# 只统计空值的类型（值太大或不能比较，MIN / MAX / COUNT(DISTINCT) 代价高且没有意义）
+PROFILE_NULLS_ONLY_TYPES = {
+    'tinyblob', 'blob', 'mediumblob', 'longblob', 'text', 'mediumtext', 'longtext', 'json',
+    'geometry', 'point', 'linestring', 'polygon', 'multipoint', 'multilinestring', 'multipolygon',
+    'geometrycollection'
+}
+
+# 统计项 -> 聚合表达式
+PROFILE_AGGREGATES = {
+    'nulls': 'SUM(`{column}` IS NULL)',
+    'min': 'MIN(`{column}`)',
+    'max': 'MAX(`{column}`)',
+    'distinct': 'COUNT(DISTINCT `{column}`)'
+}
+
+# 统计结果缓存：(表, 列, 采样行数, after, until) -> (计算时间, 结果)
+profile_cache = OrderedDict()
+profile_lock = threading.Lock()
+
+
+def prepare_profile(table_name, args):
+    """校验 /api/profile 的参数，返回统计计划；参数错误抛出 QueryError"""
+    table_info = cache['table_columns'].get(table_name)
+    if table_info is None:
+        raise QueryError(f'表 {table_name} 不存在', 404)
+
     try:
-        log_info("正在连接数据库...")
-        log_info(f"服务器: {DB_CONFIG['host']}:{DB_CONFIG['port']}")
-        log_info(f"用户: {DB_CONFIG['user']}")
-        log_info(f"数据库: {DB_CONFIG['database']}")
+        sample_rows = int(args.get('sample', PROFILE_CONFIG['sample_rows']))
+    except ValueError:
+        raise QueryError('sample 必须是整数')
+    if sample_rows < 1 or sample_rows > PROFILE_CONFIG['max_sample_rows']:
+        raise QueryError(f"sample 必须在 1-{PROFILE_CONFIG['max_sample_rows']} 之间")
 
-        # 建立连接
-        connection = pymysql.connect(**DB_CONFIG)
-        log_success("数据库连接成功！")
+    requested = args.get('columns')
+    try:
+        columns = parse_projection(table_info, requested.split(',') if requested else None)
+    except ValueError as e:
+        raise QueryError(str(e))
+
+    # after / until 限定排序字段的范围（不含 after，含 until），范围内仍然只取最新的 sample 行
+    order_column = table_info.get('order_column')
+    after = args.get('after') or None
+    until = args.get('until') or None
+    if order_column is None and (after is not None or until is not None):
+        raise QueryError(f'表 {table_name} 没有排序字段，不支持 after / until')
+
+    clauses, params = [], []
+    if after is not None:
+        clauses.append(f"`{order_column}` > %s")
+        params.append(after)
+    if until is not None:
+        clauses.append(f"`{order_column}` <= %s")
+        params.append(until)
+
+    column_types = table_info.get('column_types', {})
+    return {
+        'table': table_name,
+        'columns': columns,
+        'column_types': {col: column_types.get(col) for col in columns},
+        'order_by': table_info.get('order_by'),
+        'order_column': order_column,
+        'after': after,
+        'until': until,
+        'sample_rows': sample_rows,
+        'clauses': clauses,
+        'params': tuple(params) or None,
+        'cache_key': (table_name, tuple(columns), sample_rows, after, until)
+    }
 
-        # 创建游标
-        cursor = connection.cursor()
 
-        # 获取所有表
-        cursor.execute("SHOW TABLES")
-        tables = cursor.fetchall()
+def profile_stats(plan, column):
+    """列需要统计的项目"""
+    if plan['column_types'].get(column) in PROFILE_NULLS_ONLY_TYPES:
+        return ('nulls',)
+    return ('nulls', 'min', 'max', 'distinct')
 
-        # 提取表名
-        if isinstance(tables[0], dict):
-            table_names = [list(table.values())[0] for table in tables]
-        else:
-            table_names = [table[0] for table in tables]
 
-        cache['tables'] = table_names
+def build_profile_sample_sql(plan):
+    """采样子查询：范围内按排序字段最新的 sample_rows 行"""
+    return build_select_sql(plan['table'], plan['columns'], plan['clauses'], plan['order_by'], plan['sample_rows'])
 
-        log_success(f"找到 {len(cache['tables'])} 个表: {', '.join(cache['tables'])}")
 
-        # 预加载每个表的列信息（不预加载数据，改为实时查询）
-        for table in cache['tables']:
-            try:
-                # 获取表结构
-                cursor.execute(f"DESCRIBE {table}")
-                columns_info = cursor.fetchall()
+def build_profile_sql(plan):
+    """
+    一次聚合算出所有列的统计，采样只读一遍：
+        SELECT COUNT(*), SUM(c IS NULL), MIN(c), MAX(c), COUNT(DISTINCT c), ... FROM (采样) AS sample
+    别名使用列序号（c0_nulls），不受列名中特殊字符影响
+    """
+    select = ['COUNT(*) AS `sampled`']
+    for index, column in enumerate(plan['columns']):
+        for stat in profile_stats(plan, column):
+            select.append(f"{PROFILE_AGGREGATES[stat].format(column=column)} AS `c{index}_{stat}`")
+    return (f"SELECT /*+ MAX_EXECUTION_TIME({PROFILE_CONFIG['timeout_ms']}) */ {', '.join(select)} "
+            f"FROM ({build_profile_sample_sql(plan)}) AS sample")
 
-                if isinstance(columns_info[0], dict):
-                    columns = [col['Field'] for col in columns_info]
-                else:
-                    columns = [col[0] for col in columns_info]
 
-                # 获取排序字段
-                order_by = get_order_by_column(table, cursor)
+def build_top_values_sql(plan, indexes):
+    """
+    低基数列最常见的值：WITH 子句中的采样只物化一次，每列在它上面分组（需要 MySQL 8.0）
+    value 列的类型是各列 UNION 之后的合并类型（列类型不同时为字符串）
+    MySQL 5.7 不支持 WITH，查询失败时统计结果不包含 top_values（见 top_values_failed）
+    """
+    parts = []
+    for index in indexes:
+        column = plan['columns'][index]
+        parts.append(
+            f"SELECT * FROM (SELECT {index} AS `col`, `{column}` AS `value`, COUNT(*) AS `count` "
+            f"FROM sample GROUP BY `{column}` ORDER BY `count` DESC "
+            f"LIMIT {PROFILE_CONFIG['top_values']}) AS top{index}"
+        )
+    return (f"WITH sample AS ({build_profile_sample_sql(plan)}) "
+            f"SELECT /*+ MAX_EXECUTION_TIME({PROFILE_CONFIG['timeout_ms']}) */ `col`, `value`, `count` "
+            f"FROM ({' UNION ALL '.join(parts)}) AS top_values")
+
+
+def summarize_profile(plan, stats_row, converters):
+    """把聚合结果整理为 (采样行数, 每列的统计)"""
+    sampled = int(stats_row['sampled'] or 0)
+    # SUM / COUNT 返回 DECIMAL / 整数，转换前先取出
+    counts = {name: int(value or 0) for name, value in stats_row.items()
+              if name.endswith(('_nulls', '_distinct'))}
+    row = convert_rows([stats_row], list(stats_row), converters)[0]
+
+    columns = []
+    for index, column in enumerate(plan['columns']):
+        stats = profile_stats(plan, column)
+        nulls = counts[f'c{index}_nulls']
+        columns.append({
+            'name': column,
+            'type': plan['column_types'].get(column),
+            'nulls': nulls,
+            'null_ratio': round(nulls / sampled, 4) if sampled else 0,
+            'min': row[f'c{index}_min'] if 'min' in stats else None,
+            'max': row[f'c{index}_max'] if 'max' in stats else None,
+            'distinct': counts[f'c{index}_distinct'] if 'distinct' in stats else None,
+            'top_values': None
+        })
+    return sampled, columns
+
+
+def low_cardinality_columns(sampled, columns):
+    """采样中不同值个数不超过 low_cardinality 且有重复值的列序号（唯一列的最常见值没有意义）"""
+    return [index for index, column in enumerate(columns)
+            if column['distinct'] and column['distinct'] <= PROFILE_CONFIG['low_cardinality']
+            and column['distinct'] < sampled - column['nulls']]
+
+
+def top_values_failed(table, error):
+    """最常见值是可选的统计项，查询失败（如 MySQL 5.7 不支持 WITH）时只记录日志，各列的 top_values 保持 None"""
+    log_warning(f"表 '{table}' 最常见值统计失败，返回的统计不包含 top_values: {error}")
+
+
+def attach_top_values(columns, indexes, rows, converters):
+    """把最常见值的查询结果写入每列的 top_values"""
+    for index in indexes:
+        columns[index]['top_values'] = []
+    for row in convert_rows(rows, ['col', 'value', 'count'], converters):
+        columns[int(row['col'])]['top_values'].append({'value': row['value'], 'count': int(row['count'])})
+
+
+def profile_payload(plan, sampled, columns, start_time):
+    """/api/profile 的响应内容（Flask 和异步版本共用）"""
+    query_time = int((time.time() - start_time) * 1000)
+    log_success(f"列统计完成: 表={plan['table']}, 采样 {sampled} 行, {len(columns)} 列, 耗时={query_time}ms")
+    return {
+        'success': True,
+        'table': plan['table'],
+        'sample': {
+            'rows': sampled,
+            'limit': plan['sample_rows'],
+            # 采样不足 limit 行说明覆盖了整个范围，统计是精确值
+            'complete': sampled < plan['sample_rows'],
+            'order_column': plan['order_column'],
+            'after': plan['after'],
+            'until': plan['until']
+        },
+        'columns': columns,
+        'profiled_at': datetime.now().isoformat(timespec='seconds'),
+        'query_time': query_time
+    }
+
+
+def run_profile(connection, plan, start_time):
+    """执行统计查询（一次聚合，有低基数列时再查一次最常见值），返回响应内容"""
+    with connection.cursor() as cursor:
+        cursor.execute(build_profile_sql(plan), plan['params'])
+        stats_row = cursor.fetchone()
+        sampled, columns = summarize_profile(plan, stats_row, build_converters(cursor))
+
+    indexes = low_cardinality_columns(sampled, columns)
+    if indexes:
+        try:
+            with connection.cursor() as cursor:
+                cursor.execute(build_top_values_sql(plan, indexes), plan['params'])
+                attach_top_values(columns, indexes, cursor.fetchall(), build_converters(cursor))
+        except Error as e:
+            # 超时和取消仍然按中断处理
+            if is_query_interrupted(e):
+                raise
+            top_values_failed(plan['table'], e)
 
-                cache['table_columns'][table] = {
-                    'columns': columns,
-                    'order_by': order_by
-                }
+    return profile_payload(plan, sampled, columns, start_time)
 
-                log_success(f"表 '{table}' 列信息已加载 ({len(columns)} 列)")
 
-            except Error as e:
-                log_error(f"表 '{table}' 列信息加载失败: {e}")
+def get_cached_profile(key):
+    """TTL 内的统计结果，没有时返回 None"""
+    with profile_lock:
+        entry = profile_cache.get(key)
+        if entry is None:
+            return None
+        if time.time() - entry[0] >= PROFILE_CONFIG['ttl']:
+            del profile_cache[key]
+            return None
+        return entry[1]
 
-        cursor.close()
-        connection.close()
-        cache['connected'] = True
-        log_success("数据库初始化完成")
 
-    except Error as e:
-        error_msg = f"数据库连接失败: {e}"
-        log_error(error_msg)
-        cache['connected'] = False
-        cache['error_message'] = str(e)
-    except Exception as e:
-        error_msg = f"初始化失败: {e}"
-        log_error(error_msg)
-        cache['connected'] = False
-        cache['error_message'] = str(e)
+def store_profile(key, payload):
+    """缓存统计结果，超过 max_entries 时淘汰最早的"""
+    with profile_lock:
+        profile_cache[key] = (time.time(), payload)
+        profile_cache.move_to_end(key)
+        while len(profile_cache) > PROFILE_CONFIG['max_entries']:
+            profile_cache.popitem(last=False)
 
 
 # ==================== Flask 路由 ====================
@@ -206,9 +2933,14 @@ def get_tables():
 def query_data():
     """
     查询表数据 - 修复版本
-    1. 实时查询数据库（不使用缓存数据）
+    1. 实时查询数据库（结果缓存以表指纹校验，表变化后立即失效）
     2. 按倒序排序（最新的在前）
     3. 返回正确的行数（如果不足就全部返回）
+    4. 支持游标分页：传入上一页返回的 next_cursor，按 WHERE (col, 主键) < (值, 主键值) 继续向后取，
+       每页耗时与翻页深度无关（见 uses_keyset）
+    5. 传入 stream: true 时以 NDJSON 流式返回（见 stream_query）
+    6. 传入 format: "columnar" 时 data 为按列组织的数组（data[列序号][行序号]）
+    7. 传入 columns 只查询指定的列，传入 filters 在数据库端过滤（见 compile_filters）
     """
     if not cache['connected']:
         return jsonify({
@@ -220,116 +2952,97 @@ def query_data():
     start_time = time.time()
 
     try:
-        data = request.get_json()
-        table = data.get('table')
-        limit = data.get('limit', 1000)
-
-        # 验证输入
-        if not table or not isinstance(table, str):
-            return jsonify({
-                'success': False,
-                'error': '无效的表名'
-            }), 400
-
-        if not isinstance(limit, int) or limit < 1 or limit > 10000:
-            return jsonify({
-                'success': False,
-                'error': '行数必须在 1-10000 之间'
-            }), 400
-
-        # 防止 SQL 注入 - 只允许字母、数字、下划线
-        if not all(c.isalnum() or c == '_' for c in table):
-            return jsonify({
-                'success': False,
-                'error': '表名包含无效字符'
-            }), 400
-
-        # 检查表是否存在
-        if table not in cache['table_columns']:
+        # 验证输入并生成 SQL
+        try:
+            plan = prepare_query(request.get_json(silent=True))
+        except QueryError as e:
             return jsonify({
                 'success': False,
-                'error': f'表 {table} 不存在'
-            }), 404
-
-        # 获取表的列信息和排序字段
-        table_info = cache['table_columns'][table]
-        columns = table_info['columns']
-        order_by = table_info.get('order_by')
-
-        # 构建 SQL 查询语句
-        if order_by:
-            # 有排序字段，使用倒序
-            sql = f"SELECT * FROM `{table}` ORDER BY {order_by} LIMIT {limit}"
-        else:
-            # 没有排序字段，直接限制数量（MySQL 默认顺序）
-            sql = f"SELECT * FROM `{table}` LIMIT {limit}"
+                'error': str(e)
+            }), e.status
 
-        log_info(f"执行查询: {sql}")
+        table = plan['table']
+        log_info(f"执行查询: {plan['sql']}" + (f" 参数: {plan['params']}" if plan['params'] else ""))
 
-        # 实时查询数据库
-        connection = None
-        cursor = None
+        # 流式模式：连接由流式响应负责归还
+        if plan['stream']:
+            try:
+                connection = db_pool.acquire()
+                return stream_query(connection, plan, start_time)
+            except Error as e:
+                log_error(f"数据库查询失败: {e}")
+                return jsonify({
+                    'success': False,
+                    'error': f'数据库查询失败: {str(e)}'
+                }), 500
+
+        # 表指纹未变化时：客户端已有相同结果返回 304，否则返回缓存的响应体
+        # 缓存按压缩方式分别保存，命中时不需要再压缩
+        encoding = negotiate_encoding(request.headers.get('Accept-Encoding'))
+        cache_key = plan['cache_key'] + (encoding,)
+        etag = None
+        fingerprint = get_table_fingerprint(table, plan['order_column'])
+        if fingerprint is not None:
+            etag = make_etag(plan['cache_key'], fingerprint)
+            if etag_matches(request.headers.get('If-None-Match'), etag):
+                log_success(f"未变化 (304): 表={table}, 行数={plan['limit']}")
+                observe_query(table, 'not_modified', start_time)
+                return Response(status=304, headers=cached_response_headers(etag, None, 'NOT-MODIFIED'))
+
+            cached = result_cache.get(cache_key, fingerprint)
+            if cached is not None:
+                body, body_encoding, returned = cached
+                log_success(f"缓存命中: 表={table}, 行数={plan['limit']}")
+                observe_query(table, 'hit', start_time, returned)
+                return Response(body, mimetype='application/json',
+                                headers=cached_response_headers(etag, body_encoding, 'HIT'))
+
+            # 本进程未命中时查询共享缓存（其他 worker 进程的结果），命中后放入本进程缓存
+            cached = shared_cache.get_result(plan['cache_key'], fingerprint, encoding) \
+                if shared_cache is not None else None
+            if cached is not None:
+                body, body_encoding, returned = cached
+                result_cache.put(cache_key, fingerprint, body, body_encoding, returned)
+                log_success(f"共享缓存命中: 表={table}, 行数={plan['limit']}")
+                observe_query(table, 'redis', start_time, returned)
+                return Response(body, mimetype='application/json',
+                                headers=cached_response_headers(etag, body_encoding, 'REDIS'))
+
+        # 实时查询数据库；同时到达的相同查询只执行一次，共享序列化后的响应体
+        # 执行者的客户端断开时查询被终止，等待的请求会重新执行
+        client_socket = request.environ.get('werkzeug.socket')
+        wait_timeout = (plan['timeout_ms'] + QUERY_TIMEOUT_CONFIG['kill_grace_ms']) / 1000 + 5
         try:
-            connection = pymysql.connect(**DB_CONFIG)
-            cursor = connection.cursor()
-
-            # 执行查询
-            cursor.execute(sql)
-            rows = cursor.fetchall()
-
-            # 转换为字典列表（处理日期时间对象）
-            data_list = []
-            for row in rows:
-                if isinstance(row, dict):
-                    # DictCursor 已经是字典
-                    row_dict = {}
-                    for key, value in row.items():
-                        if isinstance(value, datetime):
-                            row_dict[key] = value.isoformat()
-                        elif isinstance(value, (bytes, bytearray)):
-                            # 处理二进制数据
-                            row_dict[key] = value.hex() if value else None
-                        else:
-                            row_dict[key] = value
-                    data_list.append(row_dict)
-                else:
-                    # 普通游标需要转换
-                    row_dict = {}
-                    for i, col in enumerate(columns):
-                        value = row[i]
-                        if isinstance(value, datetime):
-                            row_dict[col] = value.isoformat()
-                        elif isinstance(value, (bytes, bytearray)):
-                            row_dict[col] = value.hex() if value else None
-                        else:
-                            row_dict[col] = value
-                    data_list.append(row_dict)
-
-            # 计算查询耗时
-            query_time = int((time.time() - start_time) * 1000)
-
-            log_success(f"查询成功: 表={table}, 返回行数={len(data_list)}, 耗时={query_time}ms")
-
-            return jsonify({
-                'success': True,
-                'columns': columns,
-                'data': data_list,
-                'returned': len(data_list),
-                'requested': limit,
-                'query_time': query_time
-            })
-
+            (body, returned), shared = query_flight.do(
+                query_flight_key(plan),
+                lambda: execute_query(plan, start_time, client_socket),
+                timeout=wait_timeout,
+                retry=interrupted_by_disconnect
+            )
+        except ExecutionInterrupted as e:
+            # 慢查询已由执行者记录，合并的请求不重复记录
+            return interrupted_response(e.error, e.handle, plan, start_time, record=False)
         except Error as e:
             log_error(f"数据库查询失败: {e}")
             return jsonify({
                 'success': False,
                 'error': f'数据库查询失败: {str(e)}'
             }), 500
-        finally:
-            if cursor:
-                cursor.close()
-            if connection:
-                connection.close()
+
+        # 每个请求按自己的 Accept-Encoding 压缩
+        body, body_encoding = compress_body(body, encoding)
+        cache_status = 'SHARED' if shared else 'MISS'
+        if shared:
+            log_success(f"合并查询: 表={table}, 行数={plan['limit']}")
+        observe_query(table, cache_status.lower(), start_time, returned)
+
+        if fingerprint is not None:
+            result_cache.put(cache_key, fingerprint, body, body_encoding, returned)
+            if shared_cache is not None:
+                shared_cache.put_result(plan['cache_key'], fingerprint, encoding, body, body_encoding, returned)
+
+        return Response(body, mimetype='application/json',
+                        headers=cached_response_headers(etag, body_encoding, cache_status))
 
     except Exception as e:
         log_error(f"查询失败: {e}")
@@ -348,13 +3061,26 @@ def health():
         'status': 'ok' if cache['connected'] else 'error',
         'connected': cache['connected'],
         'tables_count': len(cache['tables']),
+        'pool': db_pool.stats(),
+        'result_cache': result_cache.stats(),
+        'shared_cache': shared_cache.stats() if shared_cache is not None else None,
+        'query_watchdog': query_watchdog.stats(),
+        'query_flight': query_flight.stats(),
+        'probe_flight': probe_flight.stats(),
+        'slow_queries': slow_query_log.stats(),
+        'tail_clients': tail_clients,
         'error': cache['error_message'] if not cache['connected'] else None
     })
 
 
 @app.route('/api/table-info/<table_name>', methods=['GET'])
 def get_table_info(table_name):
-    """获取表的详细信息"""
+    """
+    获取表的详细信息
+    行数默认取 information_schema 中的估算值（row_count_estimated=true），不会全表扫描
+    传入 ?exact=1 时在后台计算精确行数，算好后（TTL 内）的请求直接返回精确值
+    传入 ?explain=1 时附带默认查询的 EXPLAIN 摘要
+    """
     if not cache['connected']:
         return jsonify({
             'success': False,
@@ -369,31 +3095,333 @@ def get_table_info(table_name):
 
     table_info = cache['table_columns'][table_name]
 
-    # 获取实际行数
-    connection = None
-    cursor = None
-    try:
-        connection = pymysql.connect(**DB_CONFIG)
-        cursor = connection.cursor()
-        cursor.execute(f"SELECT COUNT(*) as count FROM `{table_name}`")
-        result = cursor.fetchone()
-        row_count = result['count'] if isinstance(result, dict) else result[0]
-    except:
-        row_count = 0
-    finally:
-        if cursor:
-            cursor.close()
-        if connection:
-            connection.close()
+    # 获取行数：优先使用缓存的精确值，否则返回估算值
+    want_exact = is_truthy(request.args.get('exact'))
+    exact_count, exact_status = get_exact_row_count(table_name, schedule=want_exact)
 
-    return jsonify({
+    if exact_count is not None:
+        row_count = exact_count
+        estimated = False
+    else:
+        try:
+            row_count = get_estimated_row_count(table_name)
+        except Error as e:
+            log_warning(f"表 '{table_name}' 估算行数获取失败: {e}")
+            row_count = 0
+        estimated = True
+
+    explain = None
+    if is_truthy(request.args.get('explain')) and not db_backend.supports_explain:
+        explain = {'error': '当前数据库后端不支持 EXPLAIN'}
+    elif is_truthy(request.args.get('explain')):
+        try:
+            explain = explain_default_query(table_name, table_info)
+        except Error as e:
+            explain = {'error': str(e)}
+
+    return jsonify(table_info_payload(table_name, table_info, row_count, estimated, exact_status, explain))
+
+
+def table_info_payload(table_name, table_info, row_count, estimated, exact_status, explain):
+    """/api/table-info 的响应内容（Flask 和异步版本共用）"""
+    return {
         'success': True,
         'table': table_name,
         'columns': table_info['columns'],
+        'order_plan': table_info.get('order_plan'),
+        'explain': explain,
         'row_count': row_count,
+        'row_count_estimated': estimated,
+        'exact_count_status': exact_status,
         'column_count': len(table_info['columns']),
         'order_by': table_info.get('order_by', '无')
-    })
+    }
+
+
+@app.route('/api/export/<table_name>', methods=['GET'])
+def export_table(table_name):
+    """
+    导出整表（不受 10000 行的限制），流式返回，内存占用与表大小无关
+    参数:
+        format: csv（默认）/ parquet / arrow（后两种需要安装 pyarrow）
+        columns: 逗号分隔的列名，默认全部列
+        chunk: 每段行数
+        after: 只导出键值大于该值的行（断点续传：传入已收到的最后一个键值）
+        until: 只导出键值不大于该值的行（与 after 一起可以按范围并行导出）
+    响应头 X-Export-Key 为分段使用的键（没有单列唯一键的表不能续传）
+    """
+    if not cache['connected']:
+        return jsonify({
+            'success': False,
+            'error': '数据库未连接'
+        }), 500
+
+    try:
+        plan = prepare_export(table_name, request.args)
+    except QueryError as e:
+        return jsonify({
+            'success': False,
+            'error': str(e)
+        }), e.status
+
+    try:
+        # 导出可能持续很久，使用独立连接，不占用连接池
+        # 连接不开启 autocommit，InnoDB 表的各段查询在同一个事务内，读到的是同一个快照
+        connection = db_backend.connect(autocommit=False)
+    except Error as e:
+        log_error(f"数据库连接失败: {e}")
+        return jsonify({
+            'success': False,
+            'error': f'数据库连接失败: {str(e)}'
+        }), 500
+
+    content_type, extension = EXPORT_FORMATS[plan['format']]
+    writer = export_csv if plan['format'] == 'csv' else export_arrow
+    log_info(f"开始导出: 表={table_name}, 格式={plan['format']}, 键={plan['key']}, "
+             f"范围=({plan['after']}, {plan['until']}]")
+
+    def generate():
+        start_time = time.time()
+        exported = 0
+
+        def counted(chunks):
+            nonlocal exported
+            for rows, converters in chunks:
+                exported += len(rows)
+                yield rows, converters
+
+        completed = False
+        try:
+            yield from writer(counted(iter_export_chunks(connection, plan)), plan)
+            completed = True
+        except EXPORT_ERRORS as e:
+            # 响应头已经发出，只能中断数据流；客户端用最后收到的键值续传
+            log_error(f"导出失败: 表={table_name}, 已导出 {exported} 行: {e}")
+        finally:
+            connection.close()
+            rows_exported.inc((table_name, plan['format']), exported)
+            elapsed = time.time() - start_time
+            if completed:
+                log_success(f"导出完成: 表={table_name}, {exported} 行, 耗时 {elapsed:.1f}s")
+            else:
+                log_warning(f"导出中断: 表={table_name}, 已导出 {exported} 行, 耗时 {elapsed:.1f}s")
+
+    headers = {
+        'Content-Disposition': f'attachment; filename="{export_filename(table_name, plan["after"], extension)}"',
+        'X-Accel-Buffering': 'no',
+        'Cache-Control': 'no-cache'
+    }
+    if plan['key']:
+        headers['X-Export-Key'] = plan['key']
+    return Response(stream_with_context(generate()), content_type=content_type, headers=headers)
+
+
+@app.route('/api/tail/<table_name>', methods=['GET'])
+def tail_table(table_name):
+    """
+    实时追踪表的新数据（Server-Sent Events）
+    每隔 interval 秒执行一次 WHERE 排序字段 > 上次最后的值，只推送新行：
+        event: meta  列名和排序字段
+        event: rows  新行（最新的在前），id 为续传位置
+        event: db_error  查询失败（连接随后关闭，浏览器会自动重连）
+        : ping       没有新行时的心跳
+    参数: interval 轮询秒数，columns 逗号分隔的列名，filters JSON 格式的过滤条件，after 起始值（不含）
+    """
+    global tail_clients
+
+    if not cache['connected']:
+        return jsonify({
+            'success': False,
+            'error': '数据库未连接'
+        }), 500
+
+    try:
+        plan = prepare_tail(table_name, request.args, request.headers.get('Last-Event-ID'))
+    except QueryError as e:
+        return jsonify({
+            'success': False,
+            'error': str(e)
+        }), e.status
+
+    with tail_clients_lock:
+        if tail_clients >= TAIL_CONFIG['max_clients']:
+            return jsonify({
+                'success': False,
+                'error': '实时追踪的客户端过多，请稍后再试'
+            }), 503
+        tail_clients += 1
+
+    def generate():
+        pushed = 0
+        order_column = plan['order_column']
+        log_info(f"开始实时追踪: 表={table_name}, 间隔={plan['interval']}s")
+        try:
+            last_seen = plan['after'] if plan['after'] is not None else fetch_tail_start(plan)
+            yield f"retry: {int(plan['interval'] * 1000)}\n".encode('utf-8')
+            yield sse_event('meta', {'columns': plan['columns'], 'order_column': order_column})
+
+            deadline = time.time() + TAIL_CONFIG['max_duration']
+            while time.time() < deadline:
+                # 空表（last_seen 为 None）时从最早的行开始读，第一批新行也会推送
+                rows, last_seen = fetch_tail_rows(plan, last_seen)
+
+                if rows:
+                    pushed += len(rows)
+                    rows_returned.inc((table_name,), len(rows))
+                    rows.reverse()
+                    yield sse_event('rows', {'rows': rows}, encode_cursor(table_name, order_column, last_seen, 0))
+                    if len(rows) == TAIL_CONFIG['batch_rows']:
+                        # 还有积压的新行，立即继续
+                        continue
+                else:
+                    yield b': ping\n\n'
+                time.sleep(plan['interval'])
+
+        except Error as e:
+            # 结束连接，浏览器会按 retry 间隔带上 Last-Event-ID 重连
+            log_error(f"实时追踪查询失败: {e}")
+            yield sse_event('db_error', {'error': f'数据库查询失败: {str(e)}'})
+        finally:
+            log_info(f"结束实时追踪: 表={table_name}, 共推送 {pushed} 行")
+
+    def release_client():
+        # 响应关闭时执行（即使生成器还没有开始运行）
+        global tail_clients
+        with tail_clients_lock:
+            tail_clients -= 1
+
+    response = Response(stream_with_context(generate()), mimetype='text/event-stream',
+                        headers={'X-Accel-Buffering': 'no', 'Cache-Control': 'no-cache'})
+    response.call_on_close(release_client)
+    return response
+
+
+@app.route('/api/profile/<table_name>', methods=['GET'])
+def profile_table(table_name):
+    """
+    列统计：在有限的采样上用一次聚合查询算出每列的空值数、最小值、最大值和不同值个数，
+    再对低基数列统计最常见的值，不需要把数据导出到本地分析
+    结果缓存 PROFILE_CONFIG['ttl'] 秒
+    参数: sample 采样行数（默认按排序字段最新的 10 万行），columns 逗号分隔的列名，
+          after / until 排序字段范围，refresh=1 忽略缓存重新计算
+    """
+    if not cache['connected']:
+        return jsonify({
+            'success': False,
+            'error': '数据库未连接'
+        }), 500
+
+    try:
+        plan = prepare_profile(table_name, request.args)
+    except QueryError as e:
+        return jsonify({
+            'success': False,
+            'error': str(e)
+        }), e.status
+
+    if not is_truthy(request.args.get('refresh')):
+        payload = get_cached_profile(plan['cache_key'])
+        if payload is not None:
+            return jsonify(dict(payload, cached=True))
+
+    start_time = time.time()
+    connection = None
+    watch = None
+    discard = False
+    try:
+        connection = db_pool.acquire()
+        with query_watchdog.watch(connection, PROFILE_CONFIG['timeout_ms'],
+                                  request.environ.get('werkzeug.socket')) as watch:
+            try:
+                payload = run_profile(connection, plan, start_time)
+            except Error as e:
+                if is_query_interrupted(e, watch):
+                    discard = True
+                    log_warning(f"列统计中断: 表={table_name}, {e}")
+                    if watch.reason == 'disconnect':
+                        return jsonify({
+                            'success': False,
+                            'error': '客户端已断开，查询已取消'
+                        }), 408
+                    return jsonify({
+                        'success': False,
+                        'error': f"列统计超时（超过 {PROFILE_CONFIG['timeout_ms']}ms），请减小 sample"
+                    }), 504
+                raise
+    except Error as e:
+        log_error(f"列统计失败: {e}")
+        return jsonify({
+            'success': False,
+            'error': f'数据库查询失败: {str(e)}'
+        }), 500
+    finally:
+        if connection:
+            db_pool.release(connection, discard=discard or (watch is not None and watch.killed))
+
+    store_profile(plan['cache_key'], payload)
+    return jsonify(dict(payload, cached=False))
+
+
+@app.route('/api/slow-queries', methods=['GET'])
+def get_slow_queries():
+    """
+    最近的慢查询（最新的在前）及按表的汇总
+    参数: table 只看某个表，limit 返回条数（默认 50）
+    """
+    try:
+        limit = int(request.args.get('limit', 50))
+    except ValueError:
+        return jsonify({
+            'success': False,
+            'error': 'limit 必须是整数'
+        }), 400
+
+    queries = slow_query_log.list(request.args.get('table'), max(limit, 1))
+    return jsonify(dict(
+        slow_query_log.stats(),
+        success=True,
+        count=len(queries),
+        tables=slow_query_log.summary(),
+        queries=queries
+    ))
+
+
+@app.route('/metrics', methods=['GET'])
+def metrics():
+    """Prometheus 指标（文本格式）"""
+    return Response(render_metrics(db_pool.stats()), mimetype='text/plain; version=0.0.4')
+
+
+@app.before_request
+def start_request_timer():
+    g.request_start = time.perf_counter()
+
+
+@app.after_request
+def record_request_metrics(response):
+    """按路由记录请求数和耗时（用路由规则而不是实际路径，避免标签数量无限增长）"""
+    start = g.pop('request_start', None)
+    endpoint = request.url_rule.rule if request.url_rule else 'unmatched'
+    http_requests.inc((endpoint, request.method, response.status_code))
+    if start is not None:
+        http_latency.observe((endpoint,), time.perf_counter() - start)
+    return response
+
+
+@app.after_request
+def compress_api_response(response):
+    """按 Accept-Encoding 压缩其他较大的 JSON 响应（/api/query 自己处理压缩和缓存，流式响应不压缩）"""
+    if response.direct_passthrough or response.is_streamed or response.mimetype != 'application/json' \
+            or 'Content-Encoding' in response.headers:
+        return response
+
+    encoding = negotiate_encoding(request.headers.get('Accept-Encoding'))
+    body, body_encoding = compress_body(response.get_data(), encoding)
+    if body_encoding:
+        response.set_data(body)
+        response.headers['Content-Encoding'] = body_encoding
+        response.vary.add('Accept-Encoding')
+    return response
 
 
 # ==================== 错误处理 ====================
@@ -416,6 +3444,23 @@ def internal_error(error):
     }), 500
 
 
+# ==================== 多进程部署 ====================
+
+app_init_lock = threading.Lock()
+
+
+def create_app():
+    """
+    WSGI 入口：每个 worker 进程导入模块后初始化一次数据库和表结构，重复调用不会重复初始化
+    多个 worker 之间通过共享缓存（REDIS_CACHE=redis，见 shared_cache.py）复用表结构和查询结果：
+        REDIS_CACHE=redis gunicorn -w 4 -k gthread --threads 16 -b localhost:8888 'db_server_fixed:create_app()'
+    """
+    with app_init_lock:
+        if not cache['connected']:
+            init_database()
+    return app
+
+
 # ==================== 主函数 ====================
 
 if __name__ == '__main__':
@@ -434,12 +3479,13 @@ if __name__ == '__main__':
         print("  - 所有表数据按倒序输出（最新的在前）")
         print("  - 实时查询数据库，返回正确的行数")
         print("  - 如果数据不足，返回全部数据")
+        print(f"  - 连接池复用数据库连接 (最大 {POOL_CONFIG['max_size']} 个)")
     else:
         print("✗ 数据库连接失败，请检查配置")
         print(f"✗ 错误信息: {cache['error_message']}")
     print("="*60 + "\n")
 
     # 启动 Flask 服务
-    app.run(host='localhost', port=8888, debug=False)
+    app.run(host='localhost', port=8888, debug=False, threaded=True)
 
 
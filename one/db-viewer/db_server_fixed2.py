@@ -4,14 +4,21 @@
 """
 数据库查看工具 - Flask Web 服务
 连接腾讯云 MySQL 数据库，提供 Web 界面查看表数据
+启动后在后台并行预加载每个表的前 1000 行，缓存总大小有上限，过期的表在后台刷新
 """
 
-from flask import Flask, jsonify, request, send_from_directory
+from flask import Flask, jsonify, request, send_from_directory, Response
 from flask_cors import CORS
 import pymysql
 from pymysql import Error
+import os
+import sys
 import json
-from datetime import datetime
+import time
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+from db_backends import SCHEMA_COLUMNS_SQL, ESTIMATED_ROWS_SQL
 
 app = Flask(__name__, static_folder='.', static_url_path='')
 CORS(app)
@@ -27,10 +34,21 @@ DB_CONFIG = {
     'cursorclass': pymysql.cursors.DictCursor
 }
 
+# ==================== 预加载缓存配置 ====================
+WARM_CACHE_CONFIG = {
+    'max_bytes': int(os.environ.get('WARM_CACHE_MB', 256)) * 1024 * 1024,  # 缓存总大小上限
+    'preload_rows': 1000,      # 每个表预加载的行数
+    'workers': 4,              # 并行加载的线程数（每个线程一个数据库连接）
+    'refresh_interval': 300,   # 缓存超过该秒数后在后台重新加载
+    'check_interval': 30,      # 后台检查过期缓存的间隔（秒）
+    # 表的优先级："video:10,user:5"，越大越先加载、越晚淘汰，未配置的表为 0
+    'priorities': os.environ.get('WARM_CACHE_PRIORITIES', '')
+}
+
 # ==================== 全局缓存 ====================
 cache = {
     'tables': [],
-    'table_data': {},
+    'table_columns': {},  # table -> 列名列表（启动时从 information_schema 一次加载）
     'connected': False,
     'error_message': ''
 }
@@ -57,6 +75,275 @@ def log_warning(message: str):
     print(f"⚠️  {message}")
 
 
+# ==================== 预加载缓存 ====================
+
+# 每行缓存为序列化后的 JSON（bytes），大小按 bytes 对象实际占用的内存计算
+ROW_OVERHEAD = sys.getsizeof(b'')
+
+
+def parse_priorities(text):
+    """解析 "table:priority,..." 格式的优先级配置"""
+    priorities = {}
+    for item in text.split(','):
+        table, _, priority = item.strip().partition(':')
+        if not table:
+            continue
+        try:
+            priorities[table] = int(priority or 0)
+        except ValueError:
+            log_warning(f"忽略无效的优先级配置: {item}")
+    return priorities
+
+
+def json_default(value):
+    """日期时间转为 ISO 字符串，其他无法序列化的类型（DECIMAL、二进制等）转为字符串"""
+    if hasattr(value, 'isoformat'):
+        return value.isoformat()
+    if isinstance(value, (bytes, bytearray)):
+        return value.hex()
+    return str(value)
+
+
+def serialize_row(row):
+    """一行数据序列化为 JSON bytes"""
+    return json.dumps(row, default=json_default, ensure_ascii=False).encode('utf-8')
+
+
+class WarmCache:
+    """
+    预加载的表数据缓存，总大小不超过 max_bytes
+    空间不足时先淘汰优先级低、最久没有访问的表；只能淘汰优先级不高于新表的条目，
+    腾不出空间时不缓存新表（查询时直接读数据库）
+    """
+
+    def __init__(self, max_bytes):
+        self.max_bytes = max_bytes
+        self._entries = {}  # table -> {'columns', 'rows', 'truncated', 'bytes', 'priority', 'loaded_at', 'used_at'}
+        self._bytes = 0
+        self._lock = threading.Lock()
+        self._stats = {
+            'hits': 0,
+            'misses': 0,
+            'evictions': 0,
+            'rejected': 0
+        }
+
+    def get(self, table):
+        """获取缓存的表数据，没有时返回 None"""
+        with self._lock:
+            entry = self._entries.get(table)
+            if entry is None:
+                self._stats['misses'] += 1
+                return None
+            self._stats['hits'] += 1
+            entry['used_at'] = time.time()
+            return entry
+
+    def put(self, table, columns, rows, truncated, priority):
+        """写入表数据，放不下时返回 False"""
+        size = sum(len(row) + ROW_OVERHEAD for row in rows) + sum(len(col) for col in columns)
+        now = time.time()
+
+        with self._lock:
+            old = self._entries.get(table)
+            available = self.max_bytes - self._bytes + (old['bytes'] if old else 0)
+
+            # 按优先级从低到高、最近访问从旧到新选出需要淘汰的表，腾不出空间就放弃，不淘汰任何表
+            victims = []
+            if size > available:
+                candidates = sorted(
+                    (item for item in self._entries.items() if item[0] != table and item[1]['priority'] <= priority),
+                    key=lambda item: (item[1]['priority'], item[1]['used_at'])
+                )
+                for name, entry in candidates:
+                    victims.append(name)
+                    available += entry['bytes']
+                    if size <= available:
+                        break
+            if size > available:
+                self._stats['rejected'] += 1
+                return False
+
+            for name in victims:
+                self._bytes -= self._entries.pop(name)['bytes']
+                self._stats['evictions'] += 1
+            if old:
+                self._bytes -= old['bytes']
+
+            self._entries[table] = {
+                'columns': columns,
+                'rows': rows,
+                'truncated': truncated,
+                'bytes': size,
+                'priority': priority,
+                'loaded_at': now,
+                'used_at': old['used_at'] if old else now
+            }
+            self._bytes += size
+
+        for name in victims:
+            log_info(f"预加载缓存已满，淘汰表 '{name}'")
+        return True
+
+    def stale_tables(self, max_age):
+        """加载时间超过 max_age 秒的表，按优先级从高到低"""
+        now = time.time()
+        with self._lock:
+            stale = [(entry['priority'], table) for table, entry in self._entries.items()
+                     if now - entry['loaded_at'] >= max_age]
+        return [table for _, table in sorted(stale, reverse=True)]
+
+    def stats(self):
+        """缓存统计信息"""
+        with self._lock:
+            return dict(
+                self._stats,
+                entries=len(self._entries),
+                bytes=self._bytes,
+                max_bytes=self.max_bytes
+            )
+
+
+warm_cache = WarmCache(WARM_CACHE_CONFIG['max_bytes'])
+table_priorities = parse_priorities(WARM_CACHE_CONFIG['priorities'])
+preload_executor = ThreadPoolExecutor(max_workers=WARM_CACHE_CONFIG['workers'], thread_name_prefix='preload')
+pending_loads = set()
+pending_lock = threading.Lock()
+oversized_tables = {}  # 超出缓存上限的表 -> 被拒绝的时间，refresh_interval 秒内查询时不再尝试加载
+worker_local = threading.local()
+preload_stats = {'loads': 0, 'failures': 0, 'refreshes': 0}
+
+
+def get_priority(table):
+    return table_priorities.get(table, 0)
+
+
+def connect():
+    """新建数据库连接（autocommit，复用连接刷新时也能读到最新数据）"""
+    return pymysql.connect(**DB_CONFIG, autocommit=True)
+
+
+def get_worker_connection():
+    """预加载线程各自复用一个数据库连接"""
+    connection = getattr(worker_local, 'connection', None)
+    if connection is None or not connection.open:
+        connection = connect()
+        worker_local.connection = connection
+    else:
+        connection.ping(reconnect=True)
+    return connection
+
+
+def count_preload(key):
+    with pending_lock:
+        preload_stats[key] += 1
+
+
+def fetch_table(connection, table, limit):
+    """查询表的前 limit 行，返回 (列名, 序列化后的行)"""
+    with connection.cursor() as cursor:
+        cursor.execute(f"SELECT * FROM `{table}` LIMIT {int(limit)}")
+        columns = [field[0] for field in cursor.description]
+        rows = [serialize_row(row) for row in cursor.fetchall()]
+    return columns, rows
+
+
+def load_table(connection, table):
+    """加载表的前 preload_rows 行并写入缓存，返回 (列名, 行, 是否被截断)"""
+    start_time = time.time()
+    limit = WARM_CACHE_CONFIG['preload_rows']
+    columns, rows = fetch_table(connection, table, limit)
+    truncated = len(rows) >= limit
+    count_preload('loads')
+
+    if warm_cache.put(table, columns, rows, truncated, get_priority(table)):
+        with pending_lock:
+            oversized_tables.pop(table, None)
+        log_success(f"表 '{table}' 已加载 ({len(rows)} 行), 耗时 {int((time.time() - start_time) * 1000)}ms")
+    else:
+        with pending_lock:
+            oversized_tables[table] = time.time()
+        log_warning(f"表 '{table}' 超出预加载缓存上限，不缓存")
+    return columns, rows, truncated
+
+
+def run_load(table):
+    """后台加载任务"""
+    try:
+        load_table(get_worker_connection(), table)
+    except Exception as e:
+        count_preload('failures')
+        log_error(f"表 '{table}' 加载失败: {e}")
+    finally:
+        with pending_lock:
+            pending_loads.discard(table)
+
+
+def schedule_load(table):
+    """提交后台加载（同一个表同时只加载一次）"""
+    with pending_lock:
+        if table in pending_loads:
+            return False
+        pending_loads.add(table)
+    preload_executor.submit(run_load, table)
+    return True
+
+
+def preload_tables(tables):
+    """按优先级从高到低并行预加载所有表"""
+    for table in sorted(tables, key=get_priority, reverse=True):
+        schedule_load(table)
+
+
+def is_oversized(table):
+    """表最近一次加载因超出缓存上限被拒绝（refresh_interval 秒后允许再试，期间可能有其他表被淘汰）"""
+    with pending_lock:
+        rejected_at = oversized_tables.get(table)
+    return rejected_at is not None and time.time() - rejected_at < WARM_CACHE_CONFIG['refresh_interval']
+
+
+def refresh_loop():
+    """后台线程：定期重新加载过期的表（刷新期间查询仍然使用旧数据）"""
+    while True:
+        time.sleep(WARM_CACHE_CONFIG['check_interval'])
+        for table in warm_cache.stale_tables(WARM_CACHE_CONFIG['refresh_interval']):
+            if schedule_load(table):
+                count_preload('refreshes')
+
+
+def get_table_rows(table, limit):
+    """
+    获取表的前 limit 行，返回 (列名, 行, 可用的总行数, 是否来自缓存)
+    缓存没有（还在预加载、被淘汰）时只查询 limit 行直接返回，并提交后台加载（不阻塞当前请求）；
+    最近因超出上限被拒绝的表不再提交加载；limit 超过缓存的行数且缓存被截断时直接查询数据库
+    """
+    entry = warm_cache.get(table)
+    if entry is not None and (limit <= len(entry['rows']) or not entry['truncated']):
+        return entry['columns'], entry['rows'][:limit], len(entry['rows']), True
+
+    if entry is None and not is_oversized(table):
+        schedule_load(table)
+
+    connection = connect()
+    try:
+        columns, rows = fetch_table(connection, table, limit)
+        return columns, rows, len(rows), False
+    finally:
+        connection.close()
+
+
+def estimated_row_count(table):
+    """information_schema.TABLES 中的估算行数（InnoDB 统计信息，不扫描表）"""
+    connection = connect()
+    try:
+        with connection.cursor() as cursor:
+            cursor.execute(ESTIMATED_ROWS_SQL, (DB_CONFIG['database'], table))
+            result = cursor.fetchone()
+    finally:
+        connection.close()
+    return int(result['table_rows'] or 0) if result else 0
+
+
 # ==================== 数据库初始化 ====================
 
 def init_database():
@@ -90,61 +377,23 @@ def init_database():
         
         log_success(f"找到 {len(cache['tables'])} 个表: {', '.join(cache['tables'])}")
         
-        # 预加载每个表的数据（前1000行）
-        for table in cache['tables']:
-            try:
-                # 获取表结构
-                cursor.execute(f"DESCRIBE {table}")
-                columns_info = cursor.fetchall()
-                
-                if isinstance(columns_info[0], dict):
-                    # DictCursor
-                    columns = [col['Field'] for col in columns_info]
-                else:
-                    # 普通游标
-                    columns = [col[0] for col in columns_info]
-                
-                # 查询表数据
-                cursor.execute(f"SELECT * FROM {table} LIMIT 1000")
-                rows = cursor.fetchall()
-                
-                # 转换为字典列表（处理日期时间对象）
-                data = []
-                for row in rows:
-                    if isinstance(row, dict):
-                        # DictCursor 已经是字典
-                        row_dict = {}
-                        for key, value in row.items():
-                            if isinstance(value, datetime):
-                                row_dict[key] = value.isoformat()
-                            else:
-                                row_dict[key] = value
-                        data.append(row_dict)
-                    else:
-                        # 普通游标需要转换
-                        row_dict = {}
-                        for i, col in enumerate(columns):
-                            value = row[i]
-                            if isinstance(value, datetime):
-                                row_dict[col] = value.isoformat()
-                            else:
-                                row_dict[col] = value
-                        data.append(row_dict)
-                
-                cache['table_data'][table] = {
-                    'columns': columns,
-                    'data': data,
-                    'count': len(data)
-                }
-                log_success(f"表 '{table}' 已加载 ({len(data)} 行)")
-                
-            except Error as e:
-                log_error(f"表 '{table}' 加载失败: {e}")
+        # 所有表的列名，一次查询完成（/api/table-info 不用再查询表数据）
+        cursor.execute(SCHEMA_COLUMNS_SQL, (DB_CONFIG['database'],))
+        table_columns = {table: [] for table in table_names}
+        for row in cursor.fetchall():
+            if row['table_name'] in table_columns:
+                table_columns[row['table_name']].append(row['column_name'])
+        cache['table_columns'] = table_columns
         
         cursor.close()
         connection.close()
         cache['connected'] = True
-        log_success("所有数据已缓存到内存")
+        
+        # 后台并行预加载每个表的数据（前1000行），不阻塞启动；还没加载好的表查询时直接读数据库
+        preload_tables(cache['tables'])
+        threading.Thread(target=refresh_loop, name='preload-refresh', daemon=True).start()
+        log_success(f"开始后台预加载 ({WARM_CACHE_CONFIG['workers']} 个线程, "
+                    f"缓存上限 {WARM_CACHE_CONFIG['max_bytes'] // (1024 * 1024)}MB)")
         
     except Error as e:
         error_msg = f"数据库连接失败: {e}"
@@ -230,28 +479,32 @@ def query_data():
                 'error': '表名包含无效字符'
             }), 400
         
-        # 从缓存获取数据
-        if table not in cache['table_data']:
+        if table not in cache['tables']:
             return jsonify({
                 'success': False,
                 'error': f'表 {table} 不存在'
             }), 404
         
-        table_info = cache['table_data'][table]
-        columns = table_info['columns']
-        all_data = table_info['data']
+        # 优先从缓存获取数据
+        columns, rows, total, cached = get_table_rows(table, limit)
         
-        # 返回指定数量的数据
-        limited_data = all_data[:limit]
-        
-        return jsonify({
+        # 行已经是序列化好的 JSON，直接拼接响应体
+        head = json.dumps({
             'success': True,
             'columns': columns,
-            'data': limited_data,
-            'total': len(all_data),
-            'returned': len(limited_data)
-        })
+            'total': total,
+            'returned': len(rows),
+            'cached': cached
+        }, ensure_ascii=False)
+        body = head[:-1].encode('utf-8') + b', "data": [' + b','.join(rows) + b']}'
+        return Response(body, mimetype='application/json')
         
+    except Error as e:
+        log_error(f"数据库查询失败: {e}")
+        return jsonify({
+            'success': False,
+            'error': f'数据库查询失败: {str(e)}'
+        }), 500
     except Exception as e:
         log_error(f"查询失败: {e}")
         return jsonify({
@@ -267,6 +520,8 @@ def health():
         'status': 'ok' if cache['connected'] else 'error',
         'connected': cache['connected'],
         'tables_count': len(cache['tables']),
+        'warm_cache': dict(warm_cache.stats(), **preload_stats, pending=len(pending_loads),
+                           oversized=len(oversized_tables)),
         'error': cache['error_message'] if not cache['connected'] else None
     })
 
@@ -280,20 +535,30 @@ def get_table_info(table_name):
             'error': '数据库未连接'
         }), 500
     
-    if table_name not in cache['table_data']:
+    if table_name not in cache['tables']:
         return jsonify({
             'success': False,
             'error': f'表 {table_name} 不存在'
         }), 404
     
-    table_info = cache['table_data'][table_name]
+    # 列名来自启动时加载的表结构，行数使用 information_schema 的估算值（不扫描表，也不读取表数据）
+    columns = cache['table_columns'].get(table_name, [])
+    try:
+        row_count = estimated_row_count(table_name)
+    except Error as e:
+        log_error(f"数据库查询失败: {e}")
+        return jsonify({
+            'success': False,
+            'error': f'数据库查询失败: {str(e)}'
+        }), 500
     
     return jsonify({
         'success': True,
         'table': table_name,
-        'columns': table_info['columns'],
-        'row_count': table_info['count'],
-        'column_count': len(table_info['columns'])
+        'columns': columns,
+        'row_count': row_count,
+        'row_count_estimated': True,
+        'column_count': len(columns)
     })
 
 
@@ -0,0 +1,148 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+"""
+生成 SQLite 压测数据
+建两张表：video（默认 100 万行，列与 bench_serialize.py 的视频表一致）和 device（设备表）
+video 的主键为 id，device_id、create_at 上有索引，与线上表的查询方式（按 id / 时间倒序分页、按设备过滤）相同
+使用固定的随机种子，相同参数生成的数据完全一样，便于对比多次压测结果
+
+用法:
+    python gen_sqlite_data.py --rows 5000000
+    DB_BACKEND=sqlite SQLITE_PATH=db_viewer.sqlite3 python db_server_fixed.py
+"""
+
+import argparse
+import hashlib
+import os
+import random
+import sqlite3
+import time
+from datetime import datetime, timedelta
+
+SCHEMA = [
+    """CREATE TABLE device (
+        id INTEGER PRIMARY KEY,
+        device_id VARCHAR(64) NOT NULL UNIQUE,
+        name VARCHAR(128) NOT NULL,
+        platform VARCHAR(16) NOT NULL,
+        create_at DATETIME NOT NULL
+    )""",
+    """CREATE TABLE video (
+        id INTEGER PRIMARY KEY,
+        device_id VARCHAR(64) NOT NULL,
+        title VARCHAR(255) NOT NULL,
+        url VARCHAR(512) NOT NULL,
+        duration INT NOT NULL,
+        size BIGINT NOT NULL,
+        price DECIMAL(10, 2) NOT NULL,
+        status TINYINT NOT NULL,
+        md5 CHAR(32) NOT NULL,
+        create_at DATETIME NOT NULL,
+        update_at DATETIME NOT NULL
+    )"""
+]
+
+# 数据写完后再建索引，比边插入边维护索引快很多
+INDEXES = [
+    "CREATE INDEX idx_video_device_id ON video (device_id)",
+    "CREATE INDEX idx_video_create_at ON video (create_at)"
+]
+
+PLATFORMS = ['android', 'ios', 'web', 'tv']
+START_TIME = datetime(2024, 1, 1)
+TIME_FORMAT = '%Y-%m-%d %H:%M:%S'
+
+
+def device_rows(count, rng):
+    """设备表数据"""
+    for i in range(1, count + 1):
+        yield (
+            i,
+            f"device_{i}",
+            f"设备 {i}",
+            rng.choice(PLATFORMS),
+            (START_TIME - timedelta(days=rng.randint(1, 365))).strftime(TIME_FORMAT)
+        )
+
+
+def video_rows(start, count, devices, rng):
+    """id 从 start 开始的 count 行视频数据，create_at 随 id 递增（与线上只追加的写入方式一致）"""
+    for i in range(start, start + count):
+        create_at = START_TIME + timedelta(seconds=i * 3)
+        yield (
+            i,
+            f"device_{rng.randint(1, devices)}",
+            f"video title {i}",
+            f"https://example.com/video/{i}.mp4",
+            rng.randint(1, 3600),
+            rng.randint(1, 1 << 32),
+            rng.randint(0, 99999) / 100,
+            rng.randint(0, 3),
+            hashlib.md5(str(i).encode('ascii')).hexdigest(),
+            create_at.strftime(TIME_FORMAT),
+            (create_at + timedelta(seconds=rng.randint(0, 86400))).strftime(TIME_FORMAT)
+        )
+
+
+def generate(path, rows, devices, seed, batch):
+    """生成数据库文件"""
+    rng = random.Random(seed)
+    connection = sqlite3.connect(path)
+    try:
+        connection.execute("PRAGMA journal_mode = WAL")
+        connection.execute("PRAGMA synchronous = OFF")
+        for statement in SCHEMA:
+            connection.execute(statement)
+
+        with connection:
+            connection.executemany("INSERT INTO device VALUES (?, ?, ?, ?, ?)", device_rows(devices, rng))
+
+        start_time = time.time()
+        for start in range(1, rows + 1, batch):
+            count = min(batch, rows + 1 - start)
+            with connection:
+                connection.executemany("INSERT INTO video VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)",
+                                       video_rows(start, count, devices, rng))
+            inserted = start + count - 1
+            elapsed = time.time() - start_time
+            print(f"\r  video: {inserted}/{rows} 行，{inserted / elapsed if elapsed else 0:,.0f} 行/s",
+                  end='', flush=True)
+        print()
+
+        print("  创建索引...")
+        for statement in INDEXES:
+            connection.execute(statement)
+        # 更新统计信息，查询计划才会用上新建的索引
+        connection.execute("ANALYZE")
+        connection.execute("PRAGMA wal_checkpoint(TRUNCATE)")
+    finally:
+        connection.close()
+
+
+def main():
+    parser = argparse.ArgumentParser(description='生成 db-viewer 压测用的 SQLite 数据库')
+    parser.add_argument('--path', default=os.environ.get('SQLITE_PATH', 'db_viewer.sqlite3'), help='数据库文件路径')
+    parser.add_argument('--rows', type=int, default=1000000, help='video 表行数')
+    parser.add_argument('--devices', type=int, default=500, help='device 表行数（video.device_id 的取值范围）')
+    parser.add_argument('--seed', type=int, default=42, help='随机种子')
+    parser.add_argument('--batch', type=int, default=50000, help='每个事务插入的行数')
+    parser.add_argument('--force', action='store_true', help='文件已存在时覆盖')
+    args = parser.parse_args()
+
+    if os.path.exists(args.path):
+        if not args.force:
+            parser.error(f"{args.path} 已存在，使用 --force 覆盖")
+        for suffix in ('', '-wal', '-shm'):
+            if os.path.exists(args.path + suffix):
+                os.remove(args.path + suffix)
+
+    print(f"\n生成 {args.path}: video {args.rows} 行，device {args.devices} 行，种子 {args.seed}")
+    start_time = time.time()
+    generate(args.path, args.rows, args.devices, args.seed, args.batch)
+    size_mb = os.path.getsize(args.path) / 1024 / 1024
+    print(f"完成，耗时 {time.time() - start_time:.1f}s，文件大小 {size_mb:.1f} MB\n")
+
+
+if __name__ == '__main__':
+    main()
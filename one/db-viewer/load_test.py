@@ -0,0 +1,370 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+"""
+数据库查看工具 - 并发压测
+对同步版本（db_server_fixed.py，默认 8888 端口）和异步版本（db_server_async.py，默认 8889 端口）
+按相同的比例混合发送 /api/tables、/api/query（不同 limit）和 /api/table-info 请求，
+统计吞吐量、各接口的 p50/p95/p99 延迟，以及压测期间服务端进程的常驻内存（RSS）变化
+结果保存为 JSON 文件，用 --baseline 指定上一次的结果文件即可对比改动前后的数据
+
+建议两个服务都连接本地数据库，避免远程网络抖动影响结果：
+    docker run -d -p 3306:3306 -e MYSQL_ROOT_PASSWORD=root -e MYSQL_DATABASE=my_common_video_db mysql:8
+    DB_HOST=127.0.0.1 DB_PASSWORD=root python db_server_fixed.py
+    DB_HOST=127.0.0.1 DB_PASSWORD=root python db_server_async.py
+    python load_test.py --table video --concurrency 200 --requests 2000
+不需要 MySQL 时可以用 SQLite（只支持同步版本）：
+    python gen_sqlite_data.py && DB_BACKEND=sqlite python db_server_fixed.py
+    python load_test.py --targets sync=http://localhost:8888 --output before.json
+    （修改代码并重启服务后）
+    python load_test.py --targets sync=http://localhost:8888 --output after.json --baseline before.json
+
+只压测其中一个服务: python load_test.py --targets async=http://localhost:8889
+RSS 从服务的 /metrics（process_resident_memory_bytes）读取；没有 /metrics 的服务（如 db_server_fixed2.py）
+在同一台机器上时可以用 --pid name=进程号 从 /proc 读取
+"""
+
+import argparse
+import http.client
+import json
+import random
+import re
+import threading
+import time
+import urllib.request
+import urllib.error
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime
+
+DEFAULT_TARGETS = [
+    'sync=http://localhost:8888',
+    'async=http://localhost:8889'
+]
+
+# 默认请求比例：接口=权重
+DEFAULT_MIX = 'tables=1,query=6,info=2'
+ENDPOINTS = ('tables', 'query', 'info')
+
+RSS_METRIC_PATTERN = re.compile(r'^process_resident_memory_bytes\s+([0-9.e+]+)\s*$', re.MULTILINE)
+
+
+def percentile(sorted_values, percent):
+    """已排序列表的百分位数"""
+    if not sorted_values:
+        return 0
+    index = min(len(sorted_values) - 1, int(round(percent / 100 * (len(sorted_values) - 1))))
+    return sorted_values[index]
+
+
+def parse_mix(text):
+    """'tables=1,query=6,info=2' -> {'tables': 1, 'query': 6, 'info': 2}"""
+    mix = {}
+    for item in text.split(','):
+        name, _, weight = item.partition('=')
+        name = name.strip()
+        if name not in ENDPOINTS:
+            raise argparse.ArgumentTypeError(f"未知接口 {name}（可选 {', '.join(ENDPOINTS)}）")
+        try:
+            mix[name] = float(weight or 1)
+        except ValueError:
+            raise argparse.ArgumentTypeError(f"权重必须是数字: {item}")
+    if not any(weight > 0 for weight in mix.values()):
+        raise argparse.ArgumentTypeError('至少要有一个接口的权重大于 0')
+    return mix
+
+
+def parse_limits(text):
+    """'20,100,1000' -> [20, 100, 1000]"""
+    try:
+        limits = [int(value) for value in text.split(',') if value.strip()]
+    except ValueError:
+        raise argparse.ArgumentTypeError(f"limit 必须是整数: {text}")
+    if not limits or min(limits) < 1:
+        raise argparse.ArgumentTypeError('limit 必须大于 0')
+    return limits
+
+
+def fetch_tables(base_url, timeout):
+    """从 /api/tables 读取表名"""
+    with urllib.request.urlopen(f"{base_url}/api/tables", timeout=timeout) as response:
+        return json.loads(response.read()).get('tables', [])
+
+
+def build_plan(args, tables):
+    """
+    生成请求序列 [(接口, 表, limit)]
+    使用固定的随机种子，每个服务、每次运行收到的请求完全相同
+    """
+    rng = random.Random(args.seed)
+    names = [name for name in ENDPOINTS if args.mix.get(name, 0) > 0]
+    weights = [args.mix[name] for name in names]
+
+    plan = []
+    for endpoint in rng.choices(names, weights=weights, k=args.requests):
+        table = rng.choice(tables) if endpoint != 'tables' else None
+        limit = rng.choice(args.limits) if endpoint == 'query' else None
+        plan.append((endpoint, table, limit))
+    return plan
+
+
+def send_request(base_url, item, timeout):
+    """发送一次请求，返回 (接口, 是否成功, 耗时毫秒, 响应字节数)"""
+    endpoint, table, limit = item
+    if endpoint == 'query':
+        request = urllib.request.Request(
+            f"{base_url}/api/query",
+            data=json.dumps({'table': table, 'limit': limit}).encode('utf-8'),
+            headers={'Content-Type': 'application/json'},
+            method='POST'
+        )
+    elif endpoint == 'info':
+        request = urllib.request.Request(f"{base_url}/api/table-info/{urllib.request.quote(table)}")
+    else:
+        request = urllib.request.Request(f"{base_url}/api/tables")
+
+    start = time.perf_counter()
+    size = 0
+    try:
+        with urllib.request.urlopen(request, timeout=timeout) as response:
+            size = len(response.read())
+            ok = response.status == 200
+    except (urllib.error.URLError, http.client.HTTPException, OSError):
+        ok = False
+    return endpoint, ok, (time.perf_counter() - start) * 1000, size
+
+
+def read_rss_from_metrics(base_url):
+    """从服务的 /metrics 读取 process_resident_memory_bytes，没有该指标时返回 None"""
+    try:
+        with urllib.request.urlopen(f"{base_url}/metrics", timeout=5) as response:
+            match = RSS_METRIC_PATTERN.search(response.read().decode('utf-8', 'replace'))
+    except (urllib.error.URLError, http.client.HTTPException, OSError):
+        return None
+    return int(float(match.group(1))) if match else None
+
+
+def read_rss_from_proc(pid):
+    """从 /proc/<pid>/status 读取 VmRSS（只能读取本机进程）"""
+    try:
+        with open(f"/proc/{pid}/status") as f:
+            for line in f:
+                if line.startswith('VmRSS:'):
+                    return int(line.split()[1]) * 1024
+    except (OSError, ValueError, IndexError):
+        pass
+    return None
+
+
+class RssSampler:
+    """后台线程：压测期间每隔 interval 秒记录一次服务端 RSS"""
+
+    def __init__(self, base_url, pid, interval):
+        self.base_url = base_url
+        self.pid = pid
+        self.interval = interval
+        self.samples = []  # [(距离开始的秒数, RSS 字节)]
+
+        self._stop = threading.Event()
+        self._thread = None
+        self._start = None
+
+    def read(self):
+        if self.pid is not None:
+            return read_rss_from_proc(self.pid)
+        return read_rss_from_metrics(self.base_url)
+
+    def _sample(self):
+        rss = self.read()
+        if rss is not None:
+            self.samples.append((round(time.perf_counter() - self._start, 2), rss))
+
+    def _run(self):
+        while not self._stop.wait(self.interval):
+            self._sample()
+
+    def start(self):
+        self._start = time.perf_counter()
+        self._sample()
+        if self.interval > 0:
+            self._thread = threading.Thread(target=self._run, name='rss-sampler', daemon=True)
+            self._thread.start()
+
+    def stop(self):
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join()
+        self._sample()
+
+    def summary(self):
+        """RSS 的起始值、峰值和结束值（MB），以及完整的采样序列"""
+        if not self.samples:
+            return None
+        values = [rss for _, rss in self.samples]
+        to_mb = lambda value: round(value / 1024 / 1024, 1)
+        return {
+            'source': f"/proc/{self.pid}" if self.pid is not None else '/metrics',
+            'start_mb': to_mb(values[0]),
+            'peak_mb': to_mb(max(values)),
+            'end_mb': to_mb(values[-1]),
+            'samples': [[elapsed, to_mb(rss)] for elapsed, rss in self.samples]
+        }
+
+
+def latency_summary(results, elapsed):
+    """一组请求的数量、错误数、吞吐量和延迟百分位"""
+    latencies = sorted(ms for _, ok, ms, _ in results if ok)
+    return {
+        'requests': len(results),
+        'errors': sum(1 for _, ok, _, _ in results if not ok),
+        'throughput_rps': round(len(latencies) / elapsed, 1) if elapsed else 0,
+        'p50_ms': round(percentile(latencies, 50), 1),
+        'p95_ms': round(percentile(latencies, 95), 1),
+        'p99_ms': round(percentile(latencies, 99), 1),
+        'max_ms': round(latencies[-1], 1) if latencies else 0,
+        'bytes': sum(size for _, ok, _, size in results if ok)
+    }
+
+
+def run_target(name, base_url, plan, args, pid=None):
+    """对一个服务按 plan 发送请求，并发数 args.concurrency"""
+    print(f"\n▶ {name}: {base_url}  并发 {args.concurrency}，共 {len(plan)} 个请求")
+
+    if args.warmup:
+        # 预热：建立连接池、加载表结构缓存，不计入结果
+        with ThreadPoolExecutor(max_workers=args.concurrency) as executor:
+            list(executor.map(lambda item: send_request(base_url, item, args.timeout), plan[:args.warmup]))
+
+    sampler = RssSampler(base_url, pid, args.rss_interval)
+    sampler.start()
+    start = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=args.concurrency) as executor:
+        results = list(executor.map(lambda item: send_request(base_url, item, args.timeout), plan))
+    elapsed = time.perf_counter() - start
+    sampler.stop()
+
+    summary = dict({'target': name, 'url': base_url, 'elapsed_s': round(elapsed, 2)},
+                   **latency_summary(results, elapsed))
+    summary['endpoints'] = {
+        endpoint: latency_summary([result for result in results if result[0] == endpoint], elapsed)
+        for endpoint in ENDPOINTS if any(result[0] == endpoint for result in results)
+    }
+    summary['rss'] = sampler.summary()
+
+    print(f"  吞吐量 {summary['throughput_rps']} req/s，错误 {summary['errors']}，"
+          f"p50 {summary['p50_ms']}ms / p95 {summary['p95_ms']}ms / p99 {summary['p99_ms']}ms")
+    for endpoint, stats in summary['endpoints'].items():
+        print(f"    {endpoint:<8}{stats['requests']:>7} 次  错误 {stats['errors']:<5}"
+              f"p50 {stats['p50_ms']}ms / p95 {stats['p95_ms']}ms / p99 {stats['p99_ms']}ms")
+    if summary['rss']:
+        rss = summary['rss']
+        print(f"  RSS {rss['start_mb']}MB -> 峰值 {rss['peak_mb']}MB -> {rss['end_mb']}MB"
+              f"（{len(rss['samples'])} 个采样，来源 {rss['source']}）")
+    else:
+        print("  RSS 未采集（服务没有 /metrics 时用 --pid 指定进程号）")
+    return summary
+
+
+def format_change(current, previous, lower_is_better):
+    """当前值相对基准的变化百分比，带方向标记"""
+    if not previous:
+        return '-'
+    change = (current - previous) / previous * 100
+    better = change < 0 if lower_is_better else change > 0
+    return f"{change:+.1f}%{' ✓' if better and abs(change) >= 1 else ''}"
+
+
+def print_comparison(summaries, baseline_path):
+    """与上一次的结果文件对比（按服务名称匹配）"""
+    with open(baseline_path, encoding='utf-8') as f:
+        baseline = {summary['target']: summary for summary in json.load(f)['targets']}
+
+    print(f"\n对比基准: {baseline_path}")
+    print(f"{'服务':<10}{'req/s':>12}{'p50':>12}{'p95':>12}{'p99':>12}{'RSS 峰值':>12}")
+    for summary in summaries:
+        previous = baseline.get(summary['target'])
+        if previous is None:
+            print(f"{summary['target']:<10}  （基准中没有该服务）")
+            continue
+        peak = (summary.get('rss') or {}).get('peak_mb', 0)
+        previous_peak = (previous.get('rss') or {}).get('peak_mb', 0)
+        print(f"{summary['target']:<10}"
+              f"{format_change(summary['throughput_rps'], previous['throughput_rps'], False):>12}"
+              f"{format_change(summary['p50_ms'], previous['p50_ms'], True):>12}"
+              f"{format_change(summary['p95_ms'], previous['p95_ms'], True):>12}"
+              f"{format_change(summary['p99_ms'], previous['p99_ms'], True):>12}"
+              f"{format_change(peak, previous_peak, True):>12}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description='数据库查看工具并发压测（同步 vs 异步）')
+    parser.add_argument('--table', action='append',
+                        help='要查询的表，可以传多次；默认使用 /api/tables 返回的全部表')
+    parser.add_argument('--limits', type=parse_limits, default=[20, 100, 1000],
+                        help='/api/query 的 limit，逗号分隔，每次随机选一个')
+    parser.add_argument('--mix', type=parse_mix, default=parse_mix(DEFAULT_MIX),
+                        help=f"各接口的请求比例（默认 {DEFAULT_MIX}）")
+    parser.add_argument('--concurrency', type=int, default=200, help='并发数')
+    parser.add_argument('--requests', type=int, default=2000, help='每个服务的请求总数')
+    parser.add_argument('--warmup', type=int, default=0, help='正式计时前先发送的请求数（不计入结果）')
+    parser.add_argument('--timeout', type=float, default=60, help='单个请求超时秒数')
+    parser.add_argument('--seed', type=int, default=42, help='请求序列的随机种子')
+    parser.add_argument('--rss-interval', type=float, default=1.0, help='RSS 采样间隔秒数，0 为只在开始和结束时采样')
+    parser.add_argument('--pid', nargs='+', default=[], help='name=进程号，从 /proc 读取该服务的 RSS')
+    parser.add_argument('--targets', nargs='+', default=DEFAULT_TARGETS, help='name=url，可以传多个')
+    parser.add_argument('--output', default=f"load_test_{datetime.now():%Y%m%d_%H%M%S}.json", help='结果 JSON 文件')
+    parser.add_argument('--baseline', help='上一次的结果 JSON 文件，输出与它的对比')
+    args = parser.parse_args()
+
+    pids = {}
+    for item in args.pid:
+        name, _, pid = item.partition('=')
+        pids[name] = int(pid)
+
+    summaries = []
+    for target in args.targets:
+        name, _, url = target.partition('=')
+        url = url.rstrip('/')
+        try:
+            tables = args.table or fetch_tables(url, args.timeout)
+        except (urllib.error.URLError, http.client.HTTPException, OSError, ValueError) as e:
+            print(f"\n✗ {name}: 无法获取表列表: {e}")
+            continue
+        if not tables:
+            print(f"\n✗ {name}: 没有可查询的表")
+            continue
+        summaries.append(run_target(name, url, build_plan(args, tables), args, pids.get(name)))
+
+    if not summaries:
+        return
+
+    print("\n" + "=" * 70)
+    print(f"{'服务':<10}{'req/s':>10}{'p50':>10}{'p95':>10}{'p99':>10}{'错误':>8}{'RSS 峰值':>12}")
+    for summary in summaries:
+        peak = f"{summary['rss']['peak_mb']}MB" if summary['rss'] else '-'
+        print(f"{summary['target']:<10}{summary['throughput_rps']:>10}{summary['p50_ms']:>10}"
+              f"{summary['p95_ms']:>10}{summary['p99_ms']:>10}{summary['errors']:>8}{peak:>12}")
+    print("=" * 70)
+
+    result = {
+        'created_at': datetime.now().isoformat(timespec='seconds'),
+        'config': {
+            'tables': args.table,
+            'limits': args.limits,
+            'mix': args.mix,
+            'concurrency': args.concurrency,
+            'requests': args.requests,
+            'warmup': args.warmup,
+            'seed': args.seed
+        },
+        'targets': summaries
+    }
+    with open(args.output, 'w', encoding='utf-8') as f:
+        json.dump(result, f, ensure_ascii=False, indent=2)
+    print(f"\n结果已保存: {args.output}")
+
+    if args.baseline:
+        print_comparison(summaries, args.baseline)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,223 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+"""
+多进程共享缓存（Redis）
+多个 worker 进程各自有一份 cache 和 ResultCache，表结构加载和查询结果缓存都会重复
+开启后表结构和 /api/query 的响应体额外保存到 Redis，其他进程直接读取：
+    表结构: {prefix}schema:tables（表名列表）+ 每个表一个键，读取时用 pipeline 一次取回
+    查询结果: {prefix}result:<sha1(查询, 表指纹, 压缩方式)>，表指纹变化后自然不再命中，旧键按 TTL 过期
+本进程的 ResultCache 仍然是第一级缓存，Redis 只在本地未命中时访问
+Redis 不可用时只记录错误并按未命中处理，retry_interval 秒内不再访问，请求不受影响
+
+依赖: pip install redis（进程内模拟: pip install fakeredis）
+开启: REDIS_CACHE=redis python db_server_fixed.py（REDIS_HOST / REDIS_PORT / REDIS_DB 指定服务器）
+ 或: REDIS_CACHE=fake python db_server_fixed.py（fakeredis，只在当前进程内有效，用于本地调试）
+多进程: REDIS_CACHE=redis gunicorn -w 4 -k gthread --threads 16 -b localhost:8888 'db_server_fixed:create_app()'
+   或: REDIS_CACHE=redis uvicorn db_server_async:app --workers 4 --port 8889
+"""
+
+import os
+import json
+import zlib
+import struct
+import hashlib
+import threading
+import time
+
+try:
+    import redis
+except ImportError:
+    redis = None
+
+try:
+    import fakeredis
+except ImportError:
+    fakeredis = None
+
+# 连接参数与 utils/test_redis.py 相同；响应体是二进制（可能已压缩），不能使用 decode_responses
+REDIS_CONFIG = {
+    'host': os.environ.get('REDIS_HOST', 'localhost'),
+    'port': int(os.environ.get('REDIS_PORT', 6379)),
+    'db': int(os.environ.get('REDIS_DB', 0)),
+    'decode_responses': False,
+    'socket_timeout': 5,
+}
+
+# 响应体压缩方式 -> 头部中的编号
+ENCODINGS = (None, 'gzip', 'br')
+# 结果头部：压缩方式编号 + 行数
+RESULT_HEADER = struct.Struct('!BI')
+
+
+def create_client(mode, config=None):
+    """
+    mode: redis 连接 Redis 服务器，fake 使用进程内的 fakeredis
+    依赖没有安装时返回 (None, 原因)
+    """
+    if mode == 'fake':
+        if fakeredis is None:
+            return None, '未安装 fakeredis'
+        return fakeredis.FakeRedis(), None
+    if mode == 'redis':
+        if redis is None:
+            return None, '未安装 redis'
+        return redis.Redis(**(config or REDIS_CONFIG)), None
+    return None, f"不支持的共享缓存类型: {mode}（可选 redis / fake）"
+
+
+class SharedCache:
+    """
+    Redis 共享缓存
+    所有方法在 Redis 出错时返回未命中（None），不抛出异常
+    """
+
+    def __init__(self, client, prefix='dbviewer:', schema_ttl=300, result_ttl=60,
+                 max_entry_bytes=16 * 1024 * 1024, retry_interval=10, on_error=None):
+        self.client = client
+        self.prefix = prefix
+        self.schema_ttl = schema_ttl
+        self.result_ttl = result_ttl
+        self.max_entry_bytes = max_entry_bytes
+        self.retry_interval = retry_interval
+        self.on_error = on_error
+
+        self._lock = threading.Lock()
+        self._down_until = 0  # Redis 出错后在该时间之前不再访问
+        self._stats = {
+            'hits': 0,
+            'misses': 0,
+            'writes': 0,
+            'skipped': 0,
+            'errors': 0
+        }
+
+    def _count(self, key, amount=1):
+        with self._lock:
+            self._stats[key] += amount
+
+    def _available(self):
+        return time.time() >= self._down_until
+
+    def _failed(self, error):
+        """记录错误，retry_interval 秒内不再访问 Redis"""
+        with self._lock:
+            self._stats['errors'] += 1
+            self._down_until = time.time() + self.retry_interval
+        if self.on_error is not None:
+            self.on_error(error)
+
+    def _errors(self):
+        """需要捕获的 Redis 异常（fakeredis 也抛出 redis 的异常类型）"""
+        errors = (ConnectionError, TimeoutError, OSError)
+        if redis is not None:
+            errors += (redis.RedisError,)
+        return errors
+
+    # ---------- 表结构 ----------
+
+    def _schema_key(self, table):
+        return f"{self.prefix}schema:table:{table}"
+
+    def get_schema(self):
+        """读取 (表名列表, {table: schema})，没有缓存或不完整时返回 None"""
+        if not self._available():
+            return None
+        try:
+            names = self.client.get(f"{self.prefix}schema:tables")
+            if names is None:
+                self._count('misses')
+                return None
+            table_names = json.loads(zlib.decompress(names))
+            values = self.get_many([self._schema_key(table) for table in table_names])
+        except self._errors() as e:
+            self._failed(e)
+            return None
+
+        if any(value is None for value in values):
+            # 部分表的键已过期（或正在被其他进程重写），重新从数据库加载
+            self._count('misses')
+            return None
+        self._count('hits')
+        return table_names, {table: json.loads(zlib.decompress(value)) for table, value in zip(table_names, values)}
+
+    def put_schema(self, table_names, schema):
+        """写入表名列表和每个表的结构（一个 pipeline，所有键使用相同的 TTL）"""
+        if not self._available():
+            return
+        try:
+            pipeline = self.client.pipeline(transaction=False)
+            for table in table_names:
+                pipeline.set(self._schema_key(table), self._pack_json(schema.get(table)), ex=self.schema_ttl)
+            # 表名列表最后写入，读到它时各个表的键都已存在
+            pipeline.set(f"{self.prefix}schema:tables", self._pack_json(table_names), ex=self.schema_ttl)
+            pipeline.execute()
+            self._count('writes')
+        except self._errors() as e:
+            self._failed(e)
+
+    @staticmethod
+    def _pack_json(obj):
+        return zlib.compress(json.dumps(obj, ensure_ascii=False, separators=(',', ':')).encode('utf-8'))
+
+    # ---------- 查询结果 ----------
+
+    def result_key(self, cache_key, fingerprint, encoding):
+        """键中包含表指纹，表变化后旧结果不会再被读到"""
+        digest = hashlib.sha1(repr((cache_key, fingerprint, encoding)).encode('utf-8')).hexdigest()
+        return f"{self.prefix}result:{digest}"
+
+    def get_result(self, cache_key, fingerprint, encoding):
+        """读取缓存的 (响应体, 压缩方式, 行数)，没有则返回 None"""
+        if not self._available():
+            return None
+        try:
+            value = self.client.get(self.result_key(cache_key, fingerprint, encoding))
+        except self._errors() as e:
+            self._failed(e)
+            return None
+
+        if value is None:
+            self._count('misses')
+            return None
+        self._count('hits')
+        encoding_code, rows = RESULT_HEADER.unpack_from(value)
+        return value[RESULT_HEADER.size:], ENCODINGS[encoding_code], rows
+
+    def put_result(self, cache_key, fingerprint, encoding, body, body_encoding, rows):
+        """
+        写入查询结果；encoding 为请求的压缩方式（键的一部分），body_encoding 为响应体实际的压缩方式
+        （响应体太小时不压缩，两者可能不同）
+        """
+        if len(body) > self.max_entry_bytes:
+            self._count('skipped')
+            return
+        if not self._available():
+            return
+        value = RESULT_HEADER.pack(ENCODINGS.index(body_encoding), rows) + body
+        try:
+            self.client.set(self.result_key(cache_key, fingerprint, encoding), value, ex=self.result_ttl)
+            self._count('writes')
+        except self._errors() as e:
+            self._failed(e)
+
+    # ---------- 通用 ----------
+
+    def get_many(self, keys, batch=500):
+        """pipeline 批量 MGET，keys 很多时分批发送，返回与 keys 顺序一致的值列表（异常由调用方处理）"""
+        if not keys:
+            return []
+        pipeline = self.client.pipeline(transaction=False)
+        for start in range(0, len(keys), batch):
+            pipeline.mget(keys[start:start + batch])
+        return [value for values in pipeline.execute() for value in values]
+
+    def stats(self):
+        """缓存统计信息"""
+        with self._lock:
+            lookups = self._stats['hits'] + self._stats['misses']
+            return dict(
+                self._stats,
+                available=self._available(),
+                hit_rate=round(self._stats['hits'] / lookups, 4) if lookups else 0
+            )
@@ -0,0 +1,37 @@
+# -*- coding: utf-8 -*-
+
+import os
+import sys
+
+import pytest
+
+# db-viewer 的模块都是单文件脚本，测试时从上一级目录导入
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import db_server_fixed as server
+import gen_sqlite_data
+from db_backends import SQLiteBackend
+
+# gen_sqlite_data.py 生成的测试数据行数
+VIDEO_ROWS = 500
+DEVICES = 20
+
+
+@pytest.fixture
+def sqlite_client(tmp_path, monkeypatch):
+    """连接到临时 SQLite 数据库（video / device 两张表）并完成初始化的 Flask 测试客户端"""
+    path = str(tmp_path / 'viewer.sqlite3')
+    gen_sqlite_data.generate(path, VIDEO_ROWS, DEVICES, seed=1, batch=200)
+
+    backend = SQLiteBackend(path)
+    monkeypatch.setattr(server, 'db_backend', backend)
+    monkeypatch.setattr(server, 'db_pool', server.ConnectionPool(backend.connect, max_size=2))
+    monkeypatch.setattr(server, 'shared_cache', None)
+    monkeypatch.setattr(server, 'result_cache', server.ResultCache(1 << 24, 1 << 22, 60))
+    monkeypatch.setattr(server, 'table_fingerprints', {})
+    monkeypatch.setitem(server.cache, 'tables', [])
+    monkeypatch.setitem(server.cache, 'table_columns', {})
+    monkeypatch.setitem(server.cache, 'connected', False)
+    server.init_database()
+    assert server.cache['connected']
+    return server.app.test_client()
@@ -0,0 +1,100 @@
+# -*- coding: utf-8 -*-
+
+"""分页游标：格式错误或跳过数过大的游标返回 ValueError（接口返回 400）；三种分页方式都能不重不漏地翻完整个表"""
+
+import base64
+import json
+
+import pytest
+
+import db_server_fixed as server
+from conftest import VIDEO_ROWS
+
+
+def make_token(payload):
+    return base64.urlsafe_b64encode(json.dumps(payload).encode('utf-8')).decode('ascii')
+
+
+def test_round_trip():
+    token = server.encode_cursor('video', 'id', b'\x01\x02', 3)
+    assert server.decode_cursor(token, 'video', 'id') == (b'\x01\x02', 3, None)
+    token = server.encode_cursor('video', 'device_id', 'device_1', 0, 42)
+    assert server.decode_cursor(token, 'video', 'device_id') == ('device_1', 0, 42)
+
+
+@pytest.mark.parametrize('value', [{}, {'hex': 'zz'}, {'hex': 1}])
+def test_bad_binary_value(value):
+    with pytest.raises(ValueError):
+        server.decode_cursor(make_token({'t': 'video', 'c': 'id', 'v': value, 'k': 0}), 'video', 'id')
+
+
+def test_skip_limit():
+    token = make_token({'t': 'video', 'c': 'id', 'v': 1, 'k': server.CURSOR_MAX_SKIP + 1})
+    with pytest.raises(ValueError):
+        server.decode_cursor(token, 'video', 'id')
+
+
+def test_query_endpoint_returns_400(sqlite_client):
+    token = make_token({'t': 'video', 'c': 'id', 'v': {}, 'k': 0})
+    response = sqlite_client.post('/api/query', json={'table': 'video', 'limit': 5, 'cursor': token})
+    assert response.status_code == 400
+    assert response.get_json()['success'] is False
+
+
+def order_video_by(column, tiebreaker):
+    """把 video 的排序字段换成不唯一的 device_id（20 个取值），tiebreaker 为第二排序字段"""
+    table_info = server.cache['table_columns']['video']
+    order_by = f"`{column}` DESC" + (f", `{tiebreaker}` DESC" if tiebreaker else '')
+    table_info.update(order_by=order_by, order_column=column, order_plan=dict(
+        table_info['order_plan'], column=column, unique=False, tiebreaker=tiebreaker))
+
+
+def page_through(client, stream=False, limit=7):
+    """翻完整个表，返回 (所有行的 id, 每页使用的游标)"""
+    ids, cursors, cursor = [], [], None
+    while True:
+        body = {'table': 'video', 'limit': limit, 'columns': ['id', 'title'], 'stream': stream}
+        if cursor:
+            body['cursor'] = cursor
+        response = client.post('/api/query', json=body)
+        assert response.status_code == 200
+        if stream:
+            lines = [json.loads(line) for line in response.data.splitlines()]
+            ids.extend(line['data']['id'] for line in lines if line['type'] == 'row')
+            cursor = lines[-1]['next_cursor']
+        else:
+            data = response.get_json()
+            ids.extend(row['id'] for row in data['data'])
+            cursor = data['next_cursor']
+        if cursor is None:
+            return ids, cursors
+        cursors.append(server.decode_cursor(cursor, 'video', server.cache['table_columns']['video']['order_column']))
+
+
+@pytest.mark.parametrize('stream', [False, True])
+def test_unique_order_column_uses_keyset(sqlite_client, stream):
+    ids, cursors = page_through(sqlite_client, stream)
+    assert ids == list(range(VIDEO_ROWS, 0, -1))
+    assert all(skip == 0 and tiebreaker is None for _, skip, tiebreaker in cursors)
+
+
+@pytest.mark.parametrize('stream', [False, True])
+def test_compound_keyset(sqlite_client, stream):
+    order_video_by('device_id', 'id')
+    ids, cursors = page_through(sqlite_client, stream)
+    assert sorted(ids) == list(range(1, VIDEO_ROWS + 1))
+    assert all(skip == 0 and tiebreaker is not None for _, skip, tiebreaker in cursors)
+
+
+def test_skip_fallback_without_tiebreaker(sqlite_client):
+    order_video_by('device_id', None)
+    ids, cursors = page_through(sqlite_client)
+    assert sorted(ids) == list(range(1, VIDEO_ROWS + 1))
+    assert all(skip > 0 for _, skip, _ in cursors)
+
+
+def test_compound_cursor_rejected_without_tiebreaker(sqlite_client):
+    order_video_by('device_id', None)
+    token = server.encode_cursor('video', 'device_id', 'device_1', 0, 42)
+    response = sqlite_client.post('/api/query', json={'table': 'video', 'limit': 5, 'cursor': token})
+    assert response.status_code == 400
@@ -0,0 +1,62 @@
+# -*- coding: utf-8 -*-
+
+"""compile_filters：格式错误的过滤条件返回 400，而不是 500；prefix 只做字面量前缀匹配"""
+
+import sqlite3
+
+import pytest
+
+import db_server_fixed as server
+
+
+@pytest.mark.parametrize('bad_filter', [
+    {'column': ['id'], 'op': 'eq', 'value': 1},
+    {'column': {'name': 'id'}, 'op': 'eq', 'value': 1},
+    {'column': 'id', 'op': ['eq'], 'value': 1},
+    {'column': 'id', 'op': {'eq': 1}, 'value': 1},
+])
+def test_unhashable_column_or_op_is_rejected(bad_filter):
+    with pytest.raises(ValueError):
+        server.compile_filters({'columns': ['id']}, [bad_filter])
+
+
+def test_query_endpoint_returns_400(sqlite_client):
+    response = sqlite_client.post('/api/query', json={
+        'table': 'video', 'limit': 5, 'filters': [{'column': ['id'], 'op': 'eq', 'value': 1}]
+    })
+    assert response.status_code == 400
+    assert response.get_json()['success'] is False
+
+
+def query_ids(client, table, column, op, value):
+    response = client.post('/api/query', json={
+        'table': table, 'limit': 1000, 'filters': [{'column': column, 'op': op, 'value': value}]
+    })
+    assert response.status_code == 200
+    data = response.get_json()
+    return sorted(row[data['columns'].index('id')] if isinstance(row, list) else row['id'] for row in data['data'])
+
+
+def test_prefix_matches_like_eq(sqlite_client):
+    eq = query_ids(sqlite_client, 'device', 'device_id', 'eq', 'device_1')
+    prefix = query_ids(sqlite_client, 'device', 'device_id', 'prefix', 'device_1')
+    assert eq == [1]
+    # device_1、device_10 ~ device_19
+    assert prefix == [1] + list(range(10, 20))
+
+
+@pytest.mark.parametrize('value, expected', [
+    ('a_b', [901]),
+    ('a%b', [903]),
+    ('a\\b', [905]),
+])
+def test_prefix_escapes_wildcards(sqlite_client, value, expected):
+    with sqlite3.connect(server.db_backend.path) as connection:
+        connection.executemany("INSERT INTO device VALUES (?, ?, ?, ?, ?)", [
+            (901, 'a_b1', 'x', 'web', '2024-01-01 00:00:00'),
+            (902, 'axb1', 'x', 'web', '2024-01-01 00:00:00'),
+            (903, 'a%b1', 'x', 'web', '2024-01-01 00:00:00'),
+            (904, 'azzb1', 'x', 'web', '2024-01-01 00:00:00'),
+            (905, 'a\\b1', 'x', 'web', '2024-01-01 00:00:00'),
+        ])
+    assert query_ids(sqlite_client, 'device', 'device_id', 'prefix', value) == expected
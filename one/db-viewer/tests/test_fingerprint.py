@@ -0,0 +1,55 @@
+# -*- coding: utf-8 -*-
+
+"""MySQL 变更探测：每个连接第一次探测前关闭 information_schema 的统计信息缓存"""
+
+import pymysql
+
+from db_backends import MySQLBackend, STATS_EXPIRY_SQL
+
+
+class FakeConnection:
+    pass
+
+
+class FakeCursor:
+    def __init__(self, connection, unknown_variable=False):
+        self.connection = connection
+        self.unknown_variable = unknown_variable
+        self.executed = []
+
+    def execute(self, sql, params=None):
+        self.executed.append(sql)
+        if sql == STATS_EXPIRY_SQL and self.unknown_variable:
+            raise pymysql.err.InternalError(1193, "Unknown system variable 'information_schema_stats_expiry'")
+
+    def fetchone(self):
+        return {'max_value': 1, 'update_time': None}
+
+
+def make_backend():
+    return MySQLBackend({'host': 'localhost', 'port': 3306, 'user': 'root', 'database': 'test'})
+
+
+def test_stats_expiry_set_once_per_connection():
+    backend = make_backend()
+    connection = FakeConnection()
+    first, second = FakeCursor(connection), FakeCursor(connection)
+    backend.fingerprint(first, 'video', 'id')
+    backend.fingerprint(second, 'video', 'id')
+    assert first.executed[0] == STATS_EXPIRY_SQL and len(first.executed) == 2
+    assert STATS_EXPIRY_SQL not in second.executed
+
+    other = FakeCursor(FakeConnection())
+    backend.fingerprint(other, 'video', 'id')
+    assert other.executed[0] == STATS_EXPIRY_SQL
+
+
+def test_mysql57_skips_stats_expiry():
+    backend = make_backend()
+    cursor = FakeCursor(FakeConnection(), unknown_variable=True)
+    assert backend.fingerprint(cursor, 'video', 'id') == {'max_value': 1, 'update_time': None}
+    assert not backend.stats_expiry_supported
+
+    cursor = FakeCursor(FakeConnection())
+    backend.fingerprint(cursor, 'video', 'id')
+    assert STATS_EXPIRY_SQL not in cursor.executed
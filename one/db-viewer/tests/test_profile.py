@@ -0,0 +1,22 @@
+# -*- coding: utf-8 -*-
+
+"""列统计：最常见值查询失败（如 MySQL 5.7 不支持 WITH）时仍返回其他统计项"""
+
+import db_server_fixed as server
+
+
+def test_top_values(sqlite_client):
+    response = sqlite_client.get('/api/profile/video?refresh=1')
+    assert response.status_code == 200
+    columns = {column['name']: column for column in response.get_json()['columns']}
+    assert columns['status']['top_values']
+
+
+def test_top_values_failure_keeps_profile(sqlite_client, monkeypatch):
+    monkeypatch.setattr(server, 'build_top_values_sql', lambda plan, indexes: 'WITH broken')
+    response = sqlite_client.get('/api/profile/video?refresh=1')
+    assert response.status_code == 200
+    data = response.get_json()
+    assert data['success'] is True
+    assert all(column['top_values'] is None for column in data['columns'])
+    assert next(column for column in data['columns'] if column['name'] == 'id')['nulls'] == 0
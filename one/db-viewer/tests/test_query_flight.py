@@ -0,0 +1,24 @@
+# -*- coding: utf-8 -*-
+
+"""请求合并：超时不同的查询不合并；变更探测不计入 /api/query 的合并统计"""
+
+import db_server_fixed as server
+
+
+def test_flight_key_includes_timeout(sqlite_client):
+    short = server.prepare_query({'table': 'video', 'limit': 10, 'timeout_ms': 100})
+    long = server.prepare_query({'table': 'video', 'limit': 10, 'timeout_ms': 30000})
+    assert server.query_flight_key(short) != server.query_flight_key(long)
+    assert server.query_flight_key(long) == server.query_flight_key(
+        server.prepare_query({'table': 'video', 'limit': 10, 'timeout_ms': 30000}))
+
+
+def test_probe_not_counted_as_query(sqlite_client):
+    before_query = server.query_flight.stats()['executions']
+    before_probe = server.probe_flight.stats()['executions']
+
+    response = sqlite_client.post('/api/query', json={'table': 'video', 'limit': 10})
+    assert response.status_code == 200
+
+    assert server.query_flight.stats()['executions'] - before_query == 1
+    assert server.probe_flight.stats()['executions'] - before_probe == 1
@@ -0,0 +1,112 @@
+# -*- coding: utf-8 -*-
+
+"""QueryWatchdog：决定 KILL 和 unwatch 互斥，KILL 不会落到已归还的连接上"""
+
+import threading
+import time
+
+import db_server_fixed as server
+
+
+class FakeConnection:
+    def __init__(self, thread_id):
+        self._thread_id = thread_id
+
+    def thread_id(self):
+        return self._thread_id
+
+
+def test_unwatch_between_snapshot_and_kill_skips_kill(monkeypatch):
+    """快照之后、KILL 之前查询结束并 unwatch：不能再 KILL 这个连接"""
+    watchdog = server.QueryWatchdog(check_interval=3600)
+    handle = server.WatchHandle(watchdog, 42, time.time() + 60, client_socket=object())
+    watchdog._handles.add(handle)
+
+    killed = []
+    monkeypatch.setattr(server, 'kill_query', killed.append)
+
+    def disconnected_after_owner_finished(client_socket):
+        # 看门狗已经拿到快照，这时请求线程执行完查询并 unwatch
+        watchdog.unwatch(handle)
+        return True
+
+    monkeypatch.setattr(server, 'client_disconnected', disconnected_after_owner_finished)
+    watchdog.check()
+
+    assert killed == []
+    assert not handle.killed
+    assert watchdog.stats()['disconnects'] == 0
+
+
+def test_unwatch_waits_for_kill_and_marks_connection(monkeypatch):
+    """看门狗先认领：请求线程的 unwatch 等 KILL 执行完才返回，并且要丢弃连接"""
+    watchdog = server.QueryWatchdog(check_interval=3600)
+    handle = server.WatchHandle(watchdog, 7, time.time() - 1, client_socket=None)
+    watchdog._handles.add(handle)
+
+    kill_started = threading.Event()
+    release_kill = threading.Event()
+    killed = []
+
+    def slow_kill(thread_id):
+        kill_started.set()
+        release_kill.wait(5)
+        killed.append(thread_id)
+
+    monkeypatch.setattr(server, 'kill_query', slow_kill)
+    checker = threading.Thread(target=watchdog.check)
+    checker.start()
+    assert kill_started.wait(5)
+
+    unwatched = threading.Event()
+    owner = threading.Thread(target=lambda: (watchdog.unwatch(handle), unwatched.set()))
+    owner.start()
+    # KILL 还没执行完，请求线程不能归还连接
+    assert not unwatched.wait(0.2)
+
+    release_kill.set()
+    owner.join(5)
+    checker.join(5)
+    assert unwatched.is_set()
+    assert killed == [7]
+    assert handle.killed and handle.reason == 'timeout'
+
+
+def test_execute_query_discards_connection_killed_by_watchdog(monkeypatch):
+    """查询正常返回但看门狗已经 KILL 过：连接不能放回连接池"""
+    released = []
+
+    class Cursor:
+        description = ()
+
+        def execute(self, sql, params):
+            # 执行期间看门狗认领并 KILL，查询本身仍然正常返回
+            server.query_watchdog.check(now=time.time() + 3600)
+
+        def fetchall(self):
+            return []
+
+        def close(self):
+            pass
+
+    class Connection(FakeConnection):
+        def cursor(self, *args):
+            return Cursor()
+
+    class Pool:
+        def acquire(self):
+            return Connection(99)
+
+        def release(self, connection, discard=False):
+            released.append(discard)
+
+    monkeypatch.setattr(server, 'db_pool', Pool())
+    monkeypatch.setattr(server, 'kill_query', lambda thread_id: None)
+    monkeypatch.setattr(server, 'record_slow_query', lambda *args, **kwargs: None)
+
+    plan = {'table': 't', 'sql': 'SELECT 1', 'params': None, 'timeout_ms': 1000}
+    monkeypatch.setattr(server, 'paginate_rows', lambda rows, plan: (rows, False, None))
+    monkeypatch.setattr(server, 'build_query_body', lambda *args: b'{}')
+    server.execute_query(plan, time.time(), None)
+
+    assert released == [True]
@@ -0,0 +1,94 @@
+# -*- coding: utf-8 -*-
+
+"""共享缓存：两个 worker 进程通过 Redis 共享表结构和查询结果"""
+
+import json
+import os
+import subprocess
+import sys
+import threading
+
+import pytest
+
+import gen_sqlite_data
+from conftest import VIDEO_ROWS, DEVICES
+from shared_cache import SharedCache
+
+fakeredis = pytest.importorskip('fakeredis')
+pytest.importorskip('redis')
+
+VIEWER_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+# 一个 worker 进程：按 WSGI 方式初始化（create_app），发送一次查询
+WORKER_SCRIPT = '''
+import json
+import db_server_fixed as server
+app = server.create_app()
+assert server.create_app() is app
+response = app.test_client().post('/api/query', json={'table': 'video', 'limit': 5},
+                                  headers={'Accept-Encoding': 'gzip'})
+print(json.dumps({
+    'status': response.status_code,
+    'x_cache': response.headers['X-Cache'],
+    'tables': server.cache['tables'],
+    'shared_cache': server.shared_cache.stats()
+}))
+'''
+
+
+@pytest.fixture
+def redis_server():
+    """进程外可以访问的 Redis（fakeredis 的 TCP 服务）"""
+    server = fakeredis.TcpFakeServer(('127.0.0.1', 0))
+    thread = threading.Thread(target=server.serve_forever, daemon=True)
+    thread.start()
+    yield server.server_address[1]
+    server.shutdown()
+    server.server_close()
+
+
+def run_worker(port, sqlite_path):
+    env = dict(os.environ, DB_BACKEND='sqlite', SQLITE_PATH=sqlite_path,
+               REDIS_CACHE='redis', REDIS_PORT=str(port))
+    output = subprocess.run([sys.executable, '-c', WORKER_SCRIPT], cwd=VIEWER_DIR, env=env,
+                            capture_output=True, text=True, timeout=60, check=True).stdout
+    return json.loads(output.strip().splitlines()[-1])
+
+
+def test_workers_share_schema_and_results(tmp_path, redis_server):
+    path = str(tmp_path / 'viewer.sqlite3')
+    gen_sqlite_data.generate(path, VIDEO_ROWS, DEVICES, seed=1, batch=200)
+
+    first = run_worker(redis_server, path)
+    assert first['status'] == 200 and first['x_cache'] == 'MISS'
+    assert first['shared_cache']['writes'] == 2  # 表结构 + 查询结果
+
+    # 第二个进程的本地缓存是空的：表结构和查询结果都来自第一个进程写入的 Redis
+    second = run_worker(redis_server, path)
+    assert second['status'] == 200 and second['x_cache'] == 'REDIS'
+    assert second['tables'] == first['tables']
+    assert second['shared_cache']['hits'] == 2 and second['shared_cache']['writes'] == 0
+
+
+def test_redis_errors_are_misses():
+    """Redis 不可用时按未命中处理，retry_interval 内不再访问"""
+    import redis
+    errors = []
+    cache = SharedCache(redis.Redis(host='127.0.0.1', port=1, socket_timeout=0.2),
+                        retry_interval=60, on_error=errors.append)
+
+    assert cache.get_result(('t',), 'fp', 'gzip') is None
+    assert cache.get_schema() is None
+    cache.put_result(('t',), 'fp', 'gzip', b'{}', None, 0)
+
+    assert len(errors) == 1
+    assert cache.stats()['errors'] == 1 and not cache.stats()['available']
+
+
+def test_result_round_trip():
+    cache = SharedCache(fakeredis.FakeRedis())
+    cache.put_result(('t', 5), 'fp1', 'gzip', b'body', 'gzip', 5)
+
+    assert cache.get_result(('t', 5), 'fp1', 'gzip') == (b'body', 'gzip', 5)
+    # 表指纹变化后不再命中
+    assert cache.get_result(('t', 5), 'fp2', 'gzip') is None
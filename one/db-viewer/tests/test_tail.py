@@ -0,0 +1,31 @@
+# -*- coding: utf-8 -*-
+
+"""实时追踪：开始时表是空的，第一批写入的行也要推送"""
+
+import sqlite3
+
+import db_server_fixed as server
+
+
+def test_empty_table_pushes_first_rows(sqlite_client):
+    path = server.db_backend.path
+    with sqlite3.connect(path) as connection:
+        connection.execute("DELETE FROM device")
+
+    plan = server.prepare_tail('device', {}, None)
+    last_seen = server.fetch_tail_start(plan)
+    assert last_seen is None
+
+    rows, last_seen = server.fetch_tail_rows(plan, last_seen)
+    assert rows == [] and last_seen is None
+
+    with sqlite3.connect(path) as connection:
+        connection.executemany("INSERT INTO device VALUES (?, ?, ?, ?, ?)",
+                               [(i, f"device_{i}", f"设备 {i}", 'web', '2024-01-01 00:00:00') for i in (1, 2, 3)])
+
+    rows, last_seen = server.fetch_tail_rows(plan, last_seen)
+    assert len(rows) == 3
+    assert last_seen == 3
+
+    rows, last_seen = server.fetch_tail_rows(plan, last_seen)
+    assert rows == [] and last_seen == 3